@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+"""
+Generate seeded synthetic chat logs in the loader's CSV format.
+
+Example: 1,000 contacts x ~1,000 messages into data/synthetic/raw/
+    python data/synthetic/generate_synthetic_data.py --contacts 1000 --messages-per-contact 1000
+Point config data.raw_data_path (or run_pipeline's raw_data_path) at the output directory.
+"""
+import sys
+import os
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.data_generation.generator import generate_dataset
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out-dir", default="data/synthetic/raw/")
+    parser.add_argument("--contacts", type=int, default=20)
+    parser.add_argument("--messages-per-contact", type=int, default=200, help="Mean messages per contact")
+    parser.add_argument("--activity-skew", type=float, default=0.8,
+                        help="Log-normal spread of messages across contacts (0 = equal)")
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--start", default="2026-01-01")
+    parser.add_argument("--user-name", default="Rahul")
+    parser.add_argument("--question-rate", type=float, default=0.15)
+    parser.add_argument("--commitment-rate", type=float, default=0.08)
+    parser.add_argument("--reply-prob", type=float, default=0.8)
+    parser.add_argument("--latency-median", type=float, default=20.0, help="Median reply latency (minutes)")
+    parser.add_argument("--latency-sigma", type=float, default=1.5, help="Log-normal sigma of reply latency")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    total = generate_dataset(args.out_dir,
+                             n_contacts=args.contacts,
+                             messages_per_contact=args.messages_per_contact,
+                             activity_skew=args.activity_skew,
+                             seed=args.seed,
+                             user_name=args.user_name,
+                             start=args.start,
+                             days=args.days,
+                             question_rate=args.question_rate,
+                             commitment_rate=args.commitment_rate,
+                             reply_prob=args.reply_prob,
+                             latency_median_minutes=args.latency_median,
+                             latency_sigma=args.latency_sigma)
+    print(f"Wrote {total} messages for {args.contacts} contacts to {args.out_dir}")
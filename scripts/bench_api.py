@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""
+Load-test the query API: concurrent keep-alive clients issue a mix of
+contact, urgent, actions and (optionally) ingest requests and report
+throughput and latency percentiles per endpoint.
+
+    python scripts/bench_api.py --clients 8 --seconds 10             # in-process server on the sample data
+    python scripts/bench_api.py --contacts 1000 --messages-per-contact 200   # synthetic data
+    python scripts/bench_api.py --url http://127.0.0.1:8765          # an already running server
+"""
+import sys
+import os
+import argparse
+import http.client
+import json
+import logging
+import random
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse, quote
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+
+def client_loop(host, port, contacts, mix, deadline, seed, results, ingest_rate):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    endpoints, weights = zip(*mix.items())
+    while time.perf_counter() < deadline:
+        endpoint = rng.choices(endpoints, weights)[0]
+        body = None
+        if endpoint == 'contact':
+            method, path = "GET", f"/contacts/{quote(rng.choice(contacts))}"
+        elif endpoint == 'urgent':
+            method, path = "GET", "/urgent?n=10"
+        elif endpoint == 'actions':
+            method, path = "GET", "/actions"
+        else:
+            if rng.random() > ingest_rate:
+                continue
+            contact = rng.choice(contacts)
+            method, path = "POST", "/ingest"
+            body = json.dumps({'messages': [{'timestamp': time.strftime("%Y-%m-%d %H:%M:%S"), 'sender': contact,
+                                             'receiver': 'Rahul', 'message': 'Load test ping?'}]})
+        start = time.perf_counter()
+        conn.request(method, path, body=body, headers={'Content-Type': 'application/json'} if body else {})
+        response = conn.getresponse()
+        response.read()
+        results.append((endpoint, time.perf_counter() - start, response.status))
+    conn.close()
+
+
+def run_load_test(host, port, contacts, clients, seconds, mix, ingest_rate, seed):
+    results = []
+    deadline = time.perf_counter() + seconds
+    threads = [threading.Thread(target=client_loop,
+                                args=(host, port, contacts, mix, deadline, seed + i, results, ingest_rate))
+               for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def print_report(results, seconds):
+    print(f"{len(results)} requests in {seconds:.1f}s ({len(results) / seconds:.0f} req/s)")
+    print(f"{'endpoint':<10}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}")
+    by_endpoint = {}
+    for endpoint, latency, status in results:
+        by_endpoint.setdefault(endpoint, []).append((latency, status))
+    for endpoint, rows in sorted(by_endpoint.items()):
+        latencies = np.array([latency for latency, _ in rows]) * 1000
+        errors = sum(status >= 400 for _, status in rows)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"{endpoint:<10}{len(rows):>8}{p50:>10.2f}{p95:>10.2f}{p99:>10.2f}{latencies.max():>10.2f}{errors:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--url", default=None, help="Target a running server instead of starting one")
+    parser.add_argument("--data", default=None, help="Raw data directory for the in-process server")
+    parser.add_argument("--contacts", type=int, default=0,
+                        help="Generate a synthetic dataset with this many contacts instead of using --data")
+    parser.add_argument("--messages-per-contact", type=int, default=200)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--mix", default="contact=70,urgent=15,actions=10,ingest=5",
+                        help="Relative weights of the request types")
+    parser.add_argument("--ingest-rate", type=float, default=1.0,
+                        help="Fraction of ingest picks actually sent (0 for a read-only test)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    mix = {name: float(weight) for name, weight in (item.split("=") for item in args.mix.split(","))}
+
+    server = None
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            url = urlparse(args.url)
+            host, port = url.hostname, url.port or 80
+        else:
+            logging.disable(logging.INFO)
+            import shutil
+            from src.api.index import contact_index_from_config
+            from src.api.server import start_server
+            from src.data_generation.generator import generate_dataset
+            from src.utils.config import load_config, get_user_name
+            config = load_config(args.config)
+            raw_dir = os.path.join(tmp, "raw")
+            if args.contacts:
+                generate_dataset(raw_dir, n_contacts=args.contacts, messages_per_contact=args.messages_per_contact,
+                                 seed=args.seed, user_name=get_user_name(config))
+            else:
+                # Ingest appends to a CSV in the data directory, so work on a copy
+                shutil.copytree(args.data or config['data']['raw_data_path'], raw_dir)
+            start = time.perf_counter()
+            index = contact_index_from_config(config, get_user_name(config), raw_data_path=raw_dir).load()
+            print(f"Indexed {len(index.contacts())} contacts in {time.perf_counter() - start:.2f}s")
+            server = start_server(index, port=0)
+            host, port = server.server_address[:2]
+
+        conn = http.client.HTTPConnection(host, port)
+        conn.request("GET", "/contacts")
+        contacts = json.loads(conn.getresponse().read())['contacts']
+        conn.close()
+        results = run_load_test(host, port, contacts, args.clients, args.seconds, mix, args.ingest_rate, args.seed)
+        print_report(results, args.seconds)
+        if server is not None:
+            server.shutdown()
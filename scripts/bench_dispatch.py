@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+"""
+Load-test the notification dispatcher against the in-process fake transport.
+"""
+import sys
+import os
+import argparse
+import asyncio
+import random
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.automation.dispatch import NotificationDispatcher, FakeTransport
+
+async def run_load_test(args):
+    rng = random.Random(args.seed)
+    transport = FakeTransport(latency=args.latency, failure_rate=args.failure_rate, seed=args.seed)
+    dispatcher = NotificationDispatcher(transport,
+                                        rate_per_second=args.rate,
+                                        burst=args.burst,
+                                        max_concurrency=args.concurrency,
+                                        max_retries=args.retries,
+                                        backoff_base=args.backoff,
+                                        digest_min_priority=args.digest_priority)
+    for i in range(args.actions):
+        priority = rng.randint(1, 6)
+        dispatcher.enqueue(chat_id=rng.randrange(args.chats), text=f"Action {i}", priority=priority,
+                           buttons=[[("✅ Accept", f"fb:{i}:a"), ("❌ Dismiss", f"fb:{i}:d")]])
+    stats = await dispatcher.drain()
+    return stats, transport
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--actions", type=int, default=1000)
+    parser.add_argument("--chats", type=int, default=1)
+    parser.add_argument("--rate", type=float, default=200.0, help="Messages per second per chat")
+    parser.add_argument("--burst", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--backoff", type=float, default=0.01)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--digest-priority", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    stats, transport = asyncio.run(run_load_test(args))
+    print(f"Sent {stats['sent']} messages for {args.actions} actions in {stats['seconds']:.2f}s "
+          f"({stats['sent'] / stats['seconds']:.0f} msg/s, limit {args.rate:.0f}/s)")
+    print(f"Transport attempts: {transport.attempts}, retries: {stats['retries']}, failed: {stats['failed']}, "
+          f"digests: {stats['digests']} covering {stats['digested_actions']} actions")
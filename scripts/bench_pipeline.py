@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+"""
+Time every pipeline stage on synthetic logs of increasing size.
+
+For each size a seeded dataset is generated and the pipeline runs in a fresh
+process, without the artifact cache, under the profiler. The report shows
+per-stage wall time, peak memory (with --trace-memory) and process max RSS.
+It flags stages whose time grows super-linearly between sizes and stages
+slower than the stored baseline.
+
+    python scripts/bench_pipeline.py --sizes 1e3,1e4,1e5 --save-baseline
+    python scripts/bench_pipeline.py --sizes 1e3,1e4,1e5        # compare to it
+"""
+import sys
+import os
+import argparse
+import json
+import logging
+import math
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data_generation.generator import generate_dataset
+from src.state.journal import write_json_atomic
+
+DEFAULT_BASELINE = "benchmarks/pipeline_baseline.json"
+
+
+def run_size(n_messages, messages_per_contact, seed, trace_memory, config_path):
+    """Generate one dataset and run the pipeline on it; runs in its own process so max RSS is per size."""
+    logging.disable(logging.WARNING)
+    from src.pipeline import run_pipeline_with_artifacts
+    from src.utils.profiling import Profiler
+
+    n_contacts = max(2, n_messages // messages_per_contact)
+    with tempfile.TemporaryDirectory() as tmp:
+        raw_dir = os.path.join(tmp, "raw")
+        start = time.perf_counter()
+        written = generate_dataset(raw_dir, n_contacts=n_contacts, messages_per_contact=messages_per_contact,
+                                   seed=seed)
+        generate_seconds = time.perf_counter() - start
+        profiler = Profiler(output_dir=os.path.join(tmp, "profiling"), trace_memory=trace_memory)
+        run_pipeline_with_artifacts(config_path, raw_data_path=raw_dir,
+                                    state_file=os.path.join(tmp, "actions_log.json"),
+                                    verbose=False, simulate_feedback=False, profiler=profiler, use_cache=False)
+    report = profiler.report()
+    return {
+        'size': n_messages,
+        'messages': written,
+        'contacts': n_contacts,
+        'generate_seconds': generate_seconds,
+        'total_seconds': report['wall_seconds'],
+        'max_rss_bytes': report['max_rss_bytes'],
+        'spans': {f"{s['kind']}:{s['name']}": {'wall_seconds': s['wall_seconds'],
+                                               'peak_memory_bytes': s['peak_memory_bytes']}
+                  for s in report['spans']},
+    }
+
+
+def scaling_flags(results, exponent_threshold, min_seconds):
+    """(span, from_size, to_size, exponent) for spans whose time grows faster than size**threshold."""
+    flags = []
+    for prev, cur in zip(results, results[1:]):
+        ratio = cur['messages'] / prev['messages']
+        for name, stats in cur['spans'].items():
+            before = prev['spans'].get(name, {}).get('wall_seconds')
+            after = stats['wall_seconds']
+            if not before or after < min_seconds or ratio <= 1:
+                continue
+            exponent = math.log(after / before) / math.log(ratio)
+            if exponent > exponent_threshold:
+                flags.append((name, prev['size'], cur['size'], exponent))
+    return flags
+
+
+def regression_flags(results, baseline, tolerance, min_seconds):
+    """(span, size, baseline_seconds, seconds) for spans slower than the baseline by more than tolerance."""
+    flags = []
+    by_size = {r['size']: r for r in baseline.get('results', [])}
+    for result in results:
+        base = by_size.get(result['size'])
+        if base is None:
+            continue
+        for name, stats in result['spans'].items():
+            before = base['spans'].get(name, {}).get('wall_seconds')
+            after = stats['wall_seconds']
+            if before is None or after - before < min_seconds:
+                continue
+            if after > before * (1 + tolerance):
+                flags.append((name, result['size'], before, after))
+    return flags
+
+
+def print_report(results, show_memory):
+    stages = [name for name in results[-1]['spans'] if name.startswith('stage:')]
+    header = f"{'stage':<14}" + "".join(f"{r['size']:>12,}" for r in results)
+    print("\nWall time per stage (s)")
+    print(header)
+    for name in stages:
+        print(f"{name[6:]:<14}" + "".join(f"{r['spans'].get(name, {}).get('wall_seconds', 0):>12.3f}"
+                                         for r in results))
+    print(f"{'total':<14}" + "".join(f"{r['total_seconds']:>12.3f}" for r in results))
+    if show_memory:
+        print("\nPeak traced memory per stage (MiB)")
+        print(header)
+        for name in stages:
+            print(f"{name[6:]:<14}" + "".join(
+                f"{(r['spans'].get(name, {}).get('peak_memory_bytes') or 0) / 2**20:>12.1f}" for r in results))
+    if results[-1]['max_rss_bytes'] is not None:
+        print(f"{'max RSS (MiB)':<14}" + "".join(f"{r['max_rss_bytes'] / 2**20:>12.1f}" for r in results))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--sizes", default="1e3,1e4,1e5", help="Comma-separated message counts, up to 1e7")
+    parser.add_argument("--messages-per-contact", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace-memory", action="store_true", help="Record peak memory per stage (slower)")
+    parser.add_argument("--time-budget", type=float, default=None,
+                        help="Skip larger sizes once one run takes longer than this many seconds")
+    parser.add_argument("--superlinear", type=float, default=1.25,
+                        help="Flag stages whose time grows faster than size**this")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="Ignore timings below this (noise)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown against the baseline")
+    parser.add_argument("--report", default=None, help="Also write the full results to this JSON file")
+    args = parser.parse_args()
+
+    sizes = [int(float(s)) for s in args.sizes.split(",")]
+    results = []
+    for size in sorted(sizes):
+        # A fresh process per size, so max RSS and imports do not carry over
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            result = pool.submit(run_size, size, args.messages_per_contact, args.seed,
+                                 args.trace_memory, args.config).result()
+        results.append(result)
+        print(f"{size:>12,} messages: {result['total_seconds']:.2f}s "
+              f"(generated {result['messages']:,} in {result['generate_seconds']:.2f}s)")
+        if args.time_budget and result['total_seconds'] > args.time_budget:
+            print(f"Stopping: {result['total_seconds']:.1f}s exceeds the {args.time_budget:.0f}s budget")
+            break
+
+    print_report(results, args.trace_memory)
+
+    flags = scaling_flags(results, args.superlinear, args.min_seconds)
+    print(f"\nSuper-linear scaling (exponent > {args.superlinear}):" if flags else "\nNo super-linear scaling detected.")
+    for name, before, after, exponent in flags:
+        print(f"  {name}: {before:,} -> {after:,} messages grows as n^{exponent:.2f}")
+
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('trace_memory') != args.trace_memory:
+            print("\nNote: the baseline was recorded with a different --trace-memory setting; timings are not comparable.")
+        regressions = regression_flags(results, baseline, args.tolerance, args.min_seconds)
+        print(f"\nRegressions against {args.baseline} (> {args.tolerance:.0%} slower):" if regressions
+              else f"\nNo regressions against {args.baseline}.")
+        for name, size, before, after in regressions:
+            print(f"  {name} at {size:,} messages: {before:.3f}s -> {after:.3f}s")
+
+    payload = {'created_at': time.time(), 'messages_per_contact': args.messages_per_contact,
+               'seed': args.seed, 'trace_memory': args.trace_memory, 'results': results}
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        write_json_atomic(args.baseline, payload, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+    if args.report:
+        write_json_atomic(args.report, payload, indent=2)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+"""
+Burst-load the Telegram feedback path against a local stub of the Bot API.
+
+Registers N actions, then feeds M button-press updates to the bot's real
+Application (telegram_bot.build_application) through its update queue, the
+way polling does, so every press goes through Application.process_update
+with the production handler and concurrency settings. Bot API calls are
+answered by an in-process stub with a fixed latency. Reports presses/s and
+how many state flushes the presses were coalesced into.
+"""
+import sys
+import os
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Update
+from telegram.request import BaseRequest
+import telegram_bot
+from src.state.service import StateService
+
+CHAT = {'id': 1, 'type': 'private'}
+USER = {'id': 1, 'is_bot': False, 'first_name': 'Bench'}
+
+
+class StubBotAPI(BaseRequest):
+    """Answers the Bot API methods the bot calls, after `latency` seconds."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = {}
+        self.edited = []
+        self.all_edited = asyncio.Event()
+        self.expected_edits = None
+
+    @property
+    def read_timeout(self):
+        return None
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None):
+        api_method = url.rsplit('/', 1)[-1]
+        self.calls[api_method] = self.calls.get(api_method, 0) + 1
+        params = request_data.parameters if request_data is not None else {}
+        if api_method == 'getMe':
+            result = {'id': 2, 'is_bot': True, 'first_name': 'Stub', 'username': 'stub_bot'}
+        elif api_method == 'editMessageText':
+            await asyncio.sleep(self.latency)
+            self.edited.append(params.get('text'))
+            if len(self.edited) == self.expected_edits:
+                self.all_edited.set()
+            result = {'message_id': 1, 'date': 0, 'chat': CHAT, 'text': params.get('text')}
+        else:
+            await asyncio.sleep(self.latency)
+            result = True
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+
+def press_update(update_id, data, bot):
+    return Update.de_json({
+        'update_id': update_id,
+        'callback_query': {'id': str(update_id), 'from': USER, 'chat_instance': '1', 'data': data,
+                           'message': {'message_id': update_id, 'date': 0, 'chat': CHAT, 'text': 'action'}},
+    }, bot)
+
+
+async def run_benchmark(n_actions, n_presses, latency, seed, concurrent_updates=True):
+    rng = random.Random(seed)
+    actions = [{'contact': f"contact_{i % 97}", 'type': 'catch_up'} for i in range(n_actions)]
+    service = telegram_bot.bot_state_service()
+    await service.register_actions_async(actions)
+
+    api = StubBotAPI(latency)
+    api.expected_edits = n_presses
+    app = telegram_bot.build_application("123456:BENCH", request=api, concurrent_updates=concurrent_updates)
+    await app.initialize()
+    await app.start()
+    updates = []
+    for update_id in range(1, n_presses + 1):
+        action = rng.choice(actions)
+        code = 'a' if rng.random() < 0.3 else 'd'
+        updates.append(press_update(update_id, telegram_bot.encode_feedback_callback(action['id'], code), app.bot))
+
+    flushes_before = service.flushes
+    start = time.perf_counter()
+    for update in updates:
+        await app.update_queue.put(update)
+    await api.all_edited.wait()
+    elapsed = time.perf_counter() - start
+    await app.stop()
+    await app.shutdown()
+    flushes = service.flushes - flushes_before
+    recorded = sum(1 for text in api.edited if text.startswith("Feedback recorded"))
+    return elapsed, flushes, recorded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--actions", type=int, default=500)
+    parser.add_argument("--presses", type=int, default=5000)
+    parser.add_argument("--latency", type=float, default=0.001, help="Stub API latency per call (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sequential", action="store_true",
+                        help="Process updates one at a time (PTB's default) for comparison")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Never touch the real state file
+        service = StateService(os.path.join(tmp, "actions_log.json"))
+        telegram_bot.bot_state_service = lambda: service
+        elapsed, flushes, recorded = asyncio.run(
+            run_benchmark(args.actions, args.presses, args.latency, args.seed, not args.sequential))
+        service.stop()
+
+    print(f"{recorded}/{args.presses} presses recorded in {elapsed:.2f}s "
+          f"({args.presses / elapsed:.0f} presses/s), coalesced into {flushes} flushes "
+          f"({args.presses / max(flushes, 1):.0f} presses/flush)")
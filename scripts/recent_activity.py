@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Answer recency-bounded questions from the partitioned message store, without
+loading or preprocessing the whole log. The pipeline keeps the store up to date
+(message text is not stored, only the columns the detectors read).
+
+    python scripts/recent_activity.py                               # recent signals for every contact
+    python scripts/recent_activity.py --contact Mom --last 20       # Mom's last 20 messages
+    python scripts/recent_activity.py --contact Mom --since 2026-03-01
+"""
+import sys
+import os
+import argparse
+import logging
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from src.analysis.anomalies import detect_recent_anomalies
+from src.preprocessing.partitions import partition_store_from_config
+from src.utils.config import load_config
+
+
+def print_messages(df):
+    for _, row in df.iterrows():
+        print(f"{row['timestamp']:%Y-%m-%d %H:%M}  {row['sender']:<16} sentiment {row['sentiment']:+.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--contact", default=None, help="Show this contact's messages instead of every contact's signals")
+    parser.add_argument("--last", type=int, default=None, help="The contact's N most recent messages")
+    parser.add_argument("--since", default=None, help="The contact's messages at or after this date")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    config = load_config(args.config)
+    store = partition_store_from_config(config)
+    if store is None or not store.partitions:
+        print("No message partitions yet: set partitions.dir and run the pipeline first.")
+        sys.exit(1)
+    now = pd.Timestamp.now()
+
+    if args.contact:
+        if store.last_timestamp(args.contact) is None:
+            print(f"No messages stored for {args.contact}.")
+            sys.exit(1)
+        columns = ['timestamp', 'sender', 'sentiment']
+        if args.since:
+            print_messages(store.since(args.contact, args.since, columns=columns))
+        else:
+            print_messages(store.last_n(args.contact, args.last or 10, columns=columns))
+    else:
+        for contact in store.contacts():
+            signals = detect_recent_anomalies(store, contact, config, current_date=now)
+            notes = []
+            if signals['inactivity']:
+                notes.append(f"inactive {signals['inactivity'][-1][2]} days")
+            if signals['sentiment_drop']:
+                drop = signals['sentiment_drop']
+                notes.append(f"sentiment {drop['previous']:.2f} -> {drop['recent']:.2f}")
+            if signals['one_sided_ratio']:
+                ratio = signals['one_sided_ratio']
+                notes.append(f"one-sided (mostly {'from you' if ratio < 0.3 else 'from them'})")
+            last = store.last_timestamp(contact)
+            print(f"{contact:<20} last message {last:%Y-%m-%d %H:%M}  {', '.join(notes) or 'ok'}")
+    print(f"\nRead {store.partitions_read} of {len(store.partitions)} partitions.")
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+"""
+Serve scores, explanations, urgent contacts and pending actions over local HTTP.
+
+    python scripts/run_api.py                       # http://127.0.0.1:8765
+    curl localhost:8765/urgent?n=5
+    curl localhost:8765/contacts/Priya
+    curl -X POST localhost:8765/ingest -d '{"messages": [{"timestamp": "2026-03-20 10:00",
+         "sender": "Priya", "receiver": "Rahul", "message": "Are you free tonight?"}]}'
+"""
+import sys
+import os
+import argparse
+import signal
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.api.index import contact_index_from_config
+from src.api.server import start_server
+from src.state.service import state_service_from_config
+from src.utils.config import load_config, get_user_name
+from src.utils.logger import configure_logging_from_config
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--data", default=None, help="Raw data directory (default: from the config)")
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None)
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    configure_logging_from_config(config)
+    api_config = config.get('api', {})
+    service = state_service_from_config(config)
+    index = contact_index_from_config(config, get_user_name(config), raw_data_path=args.data,
+                                      state_service=service).load()
+    server = start_server(index, host=args.host or api_config.get('host', "127.0.0.1"),
+                          port=args.port if args.port is not None else api_config.get('port', 8765))
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    stop.wait()
+    server.shutdown()
+    service.stop()
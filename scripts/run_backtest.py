@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Replay the decision engine at many past dates and report which actions
+would have fired on each.
+
+    python scripts/run_backtest.py                          # daily, over the whole log
+    python scripts/run_backtest.py --start 2026-02-05 --end 2026-03-15 --freq 6h --out output/backtest.csv
+    python scripts/run_backtest.py --check 5                # also compare 5 dates with full pipeline runs
+"""
+import sys
+import os
+import argparse
+import logging
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.backtest import run_backtest, check_against_pipeline
+from src.pipeline import tracker_from_config
+from src.state.tracker import StateTracker
+from src.utils.config import load_config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--data", default=None, help="Raw data directory (default: from the config)")
+    parser.add_argument("--start", default=None, help="First evaluation moment (default: the day after the first message)")
+    parser.add_argument("--end", default=None, help="Last evaluation moment (default: the last message)")
+    parser.add_argument("--freq", default="D", help="Spacing between evaluation moments, e.g. D, 12h, W")
+    parser.add_argument("--use-state", action="store_true",
+                        help="Use the current feedback state (sensitivities and bandit statistics) "
+                             "instead of an empty one")
+    parser.add_argument("--out", default=None, help="Write every candidate action per date to this CSV")
+    parser.add_argument("--check", type=int, default=0,
+                        help="Verify this many evenly spaced dates against full pipeline runs")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    state = StateTracker(backend='memory')
+    if args.use_state:
+        state = tracker_from_config(load_config(args.config))
+    result = run_backtest(args.config, raw_data_path=args.data, start=args.start, end=args.end,
+                          freq=args.freq, state=state)
+    if result is None:
+        sys.exit(1)
+    backtester, report = result
+
+    fired = report[report['selected']]
+    dates = sorted(report['as_of'].unique()) if not report.empty else []
+    print(f"Evaluated {report['as_of'].nunique()} dates: {len(report)} candidate actions, {len(fired)} selected.\n")
+    for as_of, day in fired.groupby('as_of'):
+        actions = ", ".join(f"{c} ({t})" for c, t in zip(day['contact'], day['type']))
+        print(f"{as_of:%Y-%m-%d %H:%M}  {actions}")
+    if not report.empty:
+        print("\nActions fired per type (candidates / selected):")
+        summary = report.groupby('type')['selected'].agg(['size', 'sum']).sort_values('size', ascending=False)
+        for action_type, row in summary.iterrows():
+            print(f"  {action_type:<22}{row['size']:>6} /{row['sum']:>5}")
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        report.to_csv(args.out, index=False)
+        print(f"\nFull report written to {args.out}")
+
+    if args.check and dates:
+        step = max(1, len(dates) // args.check)
+        sample = dates[::step][:args.check]
+        mismatches = check_against_pipeline(backtester, sample, args.config, args.data, state)
+        print(f"\nChecked {len(sample)} dates against full pipeline runs: "
+              + ("all match." if not mismatches else f"{len(mismatches)} differ: {mismatches}"))
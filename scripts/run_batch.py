@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+import sys
+import os
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.batch import run_batch, print_batch_report
+from src.utils.config import load_config
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the pipeline for many users on a shared process pool.")
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--users-dir", default=None, help="Directory with one sub-folder per user")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--simulate-feedback", action="store_true")
+    args = parser.parse_args()
+
+    batch_config = load_config(args.config).get('batch', {})
+    report = run_batch(args.users_dir or batch_config.get('users_dir', "data/users/"),
+                       config_path=args.config,
+                       workers=args.workers or batch_config.get('workers'),
+                       simulate_feedback=args.simulate_feedback)
+    print_batch_report(report)
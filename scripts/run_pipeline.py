@@ -1,9 +1,49 @@
 #!/usr/bin/env python
 import sys
 import os
+import argparse
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.pipeline import run_pipeline
+from src.sharding import run_sharded_pipeline
+from src.utils.config import load_config
+from src.utils.profiling import Profiler
 
 if __name__ == "__main__":
-    run_pipeline()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the relationship automation pipeline.")
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--profile", action="store_true",
+                        help="Record per-stage timings and write a JSON report and Prometheus textfile")
+    parser.add_argument("--trace-memory", action="store_true", help="Also record peak memory per stage (slower)")
+    parser.add_argument("--profile-stage", default=None,
+                        help="Run cProfile/tracemalloc around this stage, detector or rule")
+    parser.add_argument("--profile-mode", choices=["cprofile", "tracemalloc"], default="cprofile")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Recompute every stage instead of reusing memoized artifacts "
+                             "(implied by --profile-stage, so the profiled stage actually runs)")
+    parser.add_argument("--as-of", default=None,
+                        help="Evaluate the pipeline at this past moment (e.g. 2026-03-01 or '2026-03-01 18:00')")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Shard contacts across this many worker processes (0: sharding.workers or every core)")
+    parser.add_argument("--shards", type=int, default=None,
+                        help="Number of contact shards (default: workers * sharding.shards_per_worker)")
+    args = parser.parse_args()
+
+    if args.workers is not None or args.shards is not None:
+        # Shards run in other processes on private artifact stores; the profiler sees only this one
+        unsupported = [flag for flag, value in (("--profile", args.profile), ("--trace-memory", args.trace_memory),
+                                                ("--profile-stage", args.profile_stage),
+                                                ("--no-cache", args.no_cache)) if value]
+        if unsupported:
+            parser.error(f"{', '.join(unsupported)} cannot be combined with --workers/--shards")
+        run_sharded_pipeline(args.config, workers=args.workers or None, shards=args.shards, as_of=args.as_of)
+        sys.exit(0)
+
+    profiler = None
+    if args.profile or args.trace_memory or args.profile_stage:
+        profiling_config = load_config(args.config).get('profiling', {})
+        profiler = Profiler(output_dir=profiling_config.get('output_dir', "output/profiling"),
+                            trace_memory=args.trace_memory,
+                            profile_stage=args.profile_stage,
+                            profile_mode=args.profile_mode)
+    run_pipeline(args.config, profiler=profiler, use_cache=not (args.no_cache or args.profile_stage), as_of=args.as_of)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+"""
+Long-running scheduler: re-evaluates the rules only for contacts with new
+messages or whose next due time has come, and prints the actions that change.
+
+    python scripts/run_scheduler.py                     # daemon; polls data/raw/ for new messages
+    python scripts/run_scheduler.py --record            # also log emitted actions to the state file
+    python scripts/run_scheduler.py --replay 2026-02-01 2026-03-20 --step 1h   # simulated clock, no sleeping
+"""
+import sys
+import os
+import argparse
+import signal
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from src.automation.templates import render_all
+from src.scheduler import scheduler_from_config, RawDataWatcher, run_forever
+from src.state.service import state_service_from_config
+from src.utils.config import load_config, get_user_name
+from src.utils.logger import setup_logger, configure_logging_from_config
+
+logger = setup_logger("run_scheduler")
+
+
+def print_emitted(actions, now=None):
+    stamp = f"{(now or pd.Timestamp.now()):%Y-%m-%d %H:%M}"
+    for action, message in zip(actions, render_all(actions)):
+        print(f"{stamp}  [{action['type'].upper()}] {action['contact']}: {message}")
+        print(f"{'':18}Reason: {action['reason']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--data", default=None, help="Raw data directory to watch (default: from the config)")
+    parser.add_argument("--poll", type=float, default=None,
+                        help="Seconds between checks for new messages (default: scheduler.poll_seconds)")
+    parser.add_argument("--record", action="store_true", help="Record emitted actions in the state file")
+    parser.add_argument("--replay", nargs=2, metavar=("START", "END"), default=None,
+                        help="Step a simulated clock from START to END instead of running as a daemon")
+    parser.add_argument("--step", default="1h", help="Clock step for --replay")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    configure_logging_from_config(config)
+    scheduler_config = config.get('scheduler', {})
+    service = state_service_from_config(config)
+    scheduler = scheduler_from_config(config, get_user_name(config), state=service.tracker)
+    watcher = RawDataWatcher(args.data or config['data']['raw_data_path'], scheduler)
+
+    def emit(actions, now=None):
+        print_emitted(actions, now)
+        if args.record:
+            for action in actions:
+                action['id'] = service.add_action(action)
+
+    if args.replay:
+        watcher.poll()
+        start = time.perf_counter()
+        ticks = pd.date_range(args.replay[0], args.replay[1], freq=args.step)
+        for now in ticks:
+            with service.reading():
+                actions = scheduler.run_pending(now)
+            if actions:
+                emit(actions, now)
+        print(f"\n{len(ticks)} ticks, {len(scheduler.histories)} contacts: {scheduler.evaluations} contact "
+              f"evaluations instead of {len(ticks) * len(scheduler.histories)} "
+              f"({time.perf_counter() - start:.2f}s)")
+        sys.exit(0)
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+    logger.info("Scheduler started; watching %s", watcher.raw_data_path)
+    run_forever(scheduler, watcher, poll_seconds=args.poll or scheduler_config.get('poll_seconds', 30),
+                on_actions=emit, stop_event=stop, state_service=service)
+    logger.info("Scheduler stopped after %d contact evaluations.", scheduler.evaluations)
@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+import sys
+import os
+import argparse
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from src.state.simulator import AcceptanceModel, synthetic_candidates, simulate_policy, print_simulation_report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay synthetic feedback episodes against the action policies.")
+    parser.add_argument("--episodes", type=int, default=20000)
+    parser.add_argument("--contacts", type=int, default=50)
+    parser.add_argument("--epsilon", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--policies", nargs="+", default=["rl", "epsilon_greedy", "thompson", "ucb"])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    candidates = synthetic_candidates(args.contacts, rng)
+    acceptance = AcceptanceModel.random(list(candidates), rng)
+    results = [simulate_policy(candidates, acceptance, episodes=args.episodes, policy=p,
+                               epsilon=args.epsilon, seed=args.seed)
+               for p in args.policies]
+    print_simulation_report(results)
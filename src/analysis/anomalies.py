@@ -1,26 +1,43 @@
 import pandas as pd
 import numpy as np
+from src.analysis.sketches import TDigest
+from src.preprocessing.message_store import question_mask, commitment_mask
+from src.utils.config import DEFAULT_USER_NAME
 from src.utils.logger import setup_logger
+from src.utils.profiling import profiled
 
 logger = setup_logger(__name__)
 
-def detect_response_time_anomalies(df, contact, std_multiplier=2.0):
-    """Find unusually slow responses."""
-    contact_df = df[df['contact'] == contact].copy()
+@profiled('detector')
+def detect_response_time_anomalies(df, contact, std_multiplier=2.0, percentile=None, sketch=None):
+    """
+    Find unusually slow responses: slower than mean + std_multiplier * std,
+    or, with percentile (e.g. 95), slower than that percentile of the
+    contact's reply times, read from sketch (a TDigest) when one is given.
+    """
+    contact_df = df[df['contact'] == contact]
     resp_times = contact_df['response_time_seconds'].dropna()
     if len(resp_times) < 2:
         return []
-    mean = resp_times.mean()
-    std = resp_times.std()
-    threshold = mean + std_multiplier * std
+    if percentile is not None:
+        if sketch is None:
+            sketch = TDigest.from_values(resp_times.to_numpy())
+        threshold = sketch.quantile(percentile / 100)
+    else:
+        mean = resp_times.mean()
+        std = resp_times.std()
+        threshold = mean + std_multiplier * std
     anomalies = contact_df[contact_df['response_time_seconds'] > threshold]
-    return anomalies[['timestamp', 'message', 'response_time_seconds']].to_dict('records')
+    # msg_id instead of the text when it has been split off into a MessageStore
+    columns = [c for c in ('timestamp', 'msg_id', 'message', 'response_time_seconds') if c in contact_df]
+    return anomalies[columns].to_dict('records')
 
+@profiled('detector')
 def detect_inactivity_periods(df, contact, threshold_days=7, current_date=None):
     """Find gaps in conversation longer than threshold."""
     if current_date is None:
         current_date = pd.Timestamp.now()
-    contact_df = df[df['contact'] == contact].sort_values('timestamp')
+    contact_df = df[df['contact'] == contact].sort_values('timestamp', kind='stable')
     if contact_df.empty:
         return []
     gaps = []
@@ -36,26 +53,27 @@ def detect_inactivity_periods(df, contact, threshold_days=7, current_date=None):
         gaps.append((last_msg, current_date, days_since_last))
     return gaps
 
-def detect_unanswered_questions(df, contact, followup_days=2):
+@profiled('detector')
+def detect_unanswered_questions(df, contact, followup_days=2, user_name=DEFAULT_USER_NAME):
     """
-    Find messages that are questions but received no reply from 'Rahul' within followup_days.
+    Find messages that are questions but received no reply from the user within followup_days.
     Simple heuristic: message contains '?' and is from the contact.
     """
-    contact_df = df[df['contact'] == contact].sort_values('timestamp')
+    contact_df = df[df['contact'] == contact].sort_values('timestamp', kind='stable')
     questions = []
-    for idx, row in contact_df[contact_df['sender'] == contact].iterrows():
-        if '?' in row['message']:
-            # look for a reply from Rahul within followup_days
-            future = contact_df[(contact_df['timestamp'] > row['timestamp']) &
-                                (contact_df['timestamp'] <= row['timestamp'] + pd.Timedelta(days=followup_days)) &
-                                (contact_df['sender'] == 'Rahul')]
-            if future.empty:
-                questions.append(row)
+    for idx, row in contact_df[(contact_df['sender'] == contact) & question_mask(contact_df)].iterrows():
+        # look for a reply from the user within followup_days
+        future = contact_df[(contact_df['timestamp'] > row['timestamp']) &
+                            (contact_df['timestamp'] <= row['timestamp'] + pd.Timedelta(days=followup_days)) &
+                            (contact_df['sender'] == user_name)]
+        if future.empty:
+            questions.append(row)
     return questions
 
+@profiled('detector', count_result=bool)
 def detect_sentiment_drop(df, contact, window=3, drop_threshold=0.3):
     """Detect if recent sentiment has dropped significantly compared to previous window."""
-    contact_df = df[df['contact'] == contact].sort_values('timestamp')
+    contact_df = df[df['contact'] == contact].sort_values('timestamp', kind='stable')
     if len(contact_df) < window*2:
         return None
     recent = contact_df['sentiment'].iloc[-window:].mean()
@@ -64,12 +82,13 @@ def detect_sentiment_drop(df, contact, window=3, drop_threshold=0.3):
         return {'previous': previous, 'recent': recent, 'drop': previous - recent}
     return None
 
+@profiled('detector', count_result=bool)
 def detect_one_sided_conversation(df, contact, ratio_threshold=0.7):
     """
     Detect if conversation is one-sided (mostly from one person) in last N messages.
     Returns ratio or False.
     """
-    contact_df = df[df['contact'] == contact].sort_values('timestamp')
+    contact_df = df[df['contact'] == contact].sort_values('timestamp', kind='stable')
     if len(contact_df) < 5:
         return False
     last_10 = contact_df.iloc[-10:]
@@ -80,18 +99,94 @@ def detect_one_sided_conversation(df, contact, ratio_threshold=0.7):
         return ratio
     return False
 
-def detect_missed_commitments(df, contact, commitment_keywords, followup_days=3):
+@profiled('detector')
+def detect_missed_commitments(df, contact, commitment_keywords, followup_days=3, user_name=DEFAULT_USER_NAME):
     """
-    Find commitments (e.g., "let's meet") made by contact that Rahul hasn't followed up on.
+    Find commitments (e.g., "let's meet") made by contact that the user hasn't followed up on.
     """
-    contact_df = df[df['contact'] == contact].sort_values('timestamp')
+    contact_df = df[df['contact'] == contact].sort_values('timestamp', kind='stable')
     missed = []
-    for idx, row in contact_df[contact_df['sender'] == contact].iterrows():
-        if row['commitments']:   # list of matched keywords
-            # look for any response from Rahul after this message
-            future = contact_df[(contact_df['timestamp'] > row['timestamp']) &
-                                (contact_df['timestamp'] <= row['timestamp'] + pd.Timedelta(days=followup_days)) &
-                                (contact_df['sender'] == 'Rahul')]
-            if future.empty:
-                missed.append(row)
-    return missed
\ No newline at end of file
+    for idx, row in contact_df[(contact_df['sender'] == contact) & commitment_mask(contact_df)].iterrows():
+        # look for any response from the user after this message
+        future = contact_df[(contact_df['timestamp'] > row['timestamp']) &
+                            (contact_df['timestamp'] <= row['timestamp'] + pd.Timedelta(days=followup_days)) &
+                            (contact_df['sender'] == user_name)]
+        if future.empty:
+            missed.append(row)
+    return missed
+
+def detect_contact_anomalies(df_contact, contact, config, user_name=DEFAULT_USER_NAME, current_date=None,
+                             sketch=None, recent=None):
+    """
+    Every anomaly signal for one contact, as used by the rules and the displays:
+    {'as_of', 'response_time_anomalies', 'inactivity', 'unanswered_questions',
+     'missed_commitments', 'sentiment_drop', 'one_sided_ratio'}
+    sketch: the contact's reply-time TDigest, for thresholds.response_time_percentile.
+    recent: the contact's detect_recent_anomalies result; its inactivity,
+    sentiment drop and one-sided signals are used instead of scanning df_contact.
+    """
+    if current_date is None:
+        current_date = pd.Timestamp.now()
+    thresholds = config['thresholds']
+    if recent is None:
+        recent = {
+            'inactivity': detect_inactivity_periods(df_contact, contact, thresholds['inactivity_days'], current_date),
+            'sentiment_drop': detect_sentiment_drop(df_contact, contact, window=3, drop_threshold=0.3),
+            'one_sided_ratio': detect_one_sided_conversation(df_contact, contact),
+        }
+    return {
+        'as_of': current_date,
+        'response_time_anomalies': detect_response_time_anomalies(
+            df_contact, contact, thresholds['max_response_time_std_multiplier'],
+            percentile=thresholds.get('response_time_percentile'), sketch=sketch),
+        'inactivity': recent['inactivity'],
+        'unanswered_questions': detect_unanswered_questions(df_contact, contact, followup_days=2, user_name=user_name),
+        'missed_commitments': detect_missed_commitments(
+            df_contact, contact, config['nlp']['commitment_keywords'],
+            thresholds['commitment_followup_days'], user_name=user_name),
+        'sentiment_drop': recent['sentiment_drop'],
+        'one_sided_ratio': recent['one_sided_ratio'],
+    }
+
+# The most messages the recency detectors look at: sentiment drop 2 * 3, one-sided 10
+RECENT_MESSAGES = 10
+
+def detect_recent_anomalies(store, contact, config, current_date=None):
+    """
+    The signals that only need recent history, read from a
+    PartitionedMessageStore: {'as_of', 'inactivity', 'sentiment_drop',
+    'one_sided_ratio'}, the same values detect_contact_anomalies gives,
+    except that inactivity holds only the trailing gap (the one the rules
+    act on). Reads the last RECENT_MESSAGES messages and no older partitions.
+    """
+    if current_date is None:
+        current_date = pd.Timestamp.now()
+    last_message = store.last_timestamp(contact)
+    if last_message is None:
+        return None
+    days_since_last = (current_date - last_message).days
+    recent = store.last_n(contact, RECENT_MESSAGES, columns=['timestamp', 'sender', 'contact', 'sentiment'])
+    return {
+        'as_of': current_date,
+        'inactivity': ([(last_message, current_date, days_since_last)]
+                       if days_since_last > config['thresholds']['inactivity_days'] else []),
+        'sentiment_drop': detect_sentiment_drop(recent, contact, window=3, drop_threshold=0.3),
+        'one_sided_ratio': detect_one_sided_conversation(recent, contact),
+    }
+
+def detect_all_anomalies(df, config, user_name=DEFAULT_USER_NAME, current_date=None, sketches=None,
+                         partition_store=None):
+    """
+    detect_contact_anomalies for every contact, from a single groupby over df.
+    sketches: ResponseTimeSketches holding each contact's reply-time digest.
+    partition_store: a PartitionedMessageStore holding df's messages; the
+    recency signals are then read from each contact's latest partitions.
+    """
+    if current_date is None:
+        current_date = pd.Timestamp.now()
+    return {contact: detect_contact_anomalies(
+                contact_df, contact, config, user_name, current_date,
+                sketch=sketches.get(contact) if sketches is not None else None,
+                recent=(detect_recent_anomalies(partition_store, contact, config, current_date)
+                        if partition_store is not None else None))
+            for contact, contact_df in df.groupby('contact')}
@@ -1,12 +1,57 @@
 import pandas as pd
 import numpy as np
 import re
-from collections import Counter
+from src.preprocessing.message_store import commitment_mask
+from src.utils.config import DEFAULT_USER_NAME
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
-def extract_advanced_features(df, user_name="Rahul"):
+NEG_THRESHOLD = -0.3
+LIFE_KEYWORDS = {
+    'exam': ['exam', 'test', 'grades'],
+    'thesis': ['thesis', 'dissertation', 'defense'],
+    'deadline': ['deadline', 'due', 'submit by'],
+    'sick': ['sick', 'fever', 'cough', 'hospital'],
+    'stress': ['stress', 'crazy', 'overthinking', 'tired']
+}
+CELEBRATION_KEYWORDS = ['happy', 'congratulations', 'birthday', 'anniversary', 'achievement', 'passed']
+# Simplified topic distribution: each message counts towards the first matching topic
+TOPICS = {
+    'work': ['work', 'job', 'office', 'meeting', 'project', 'deadline'],
+    'personal': ['feel', 'love', 'miss', 'sorry', 'angry', 'happy'],
+    'plans': ['meet', 'tonight', 'tomorrow', 'weekend', 'movie', 'dinner'],
+    'casual': ['lol', 'haha', 'stfu', 'bro', 'valo', 'game']
+}
+FOLLOW_THROUGH_DAYS = 3
+# Per-message columns add_keyword_flags derives from the text: topic is the
+# index of the first matching TOPICS entry, -1 for none
+KEYWORD_FLAG_COLUMNS = [f'life_{event}' for event in LIFE_KEYWORDS] + ['celebration_keyword', 'topic']
+
+def is_late_night(hours):
+    """Late night is 22:00-04:59."""
+    return (hours >= 22) | (hours <= 4)
+
+def _first_topic(msg):
+    for t, kws in enumerate(TOPICS.values()):
+        if any(kw in msg for kw in kws):
+            return t
+    return -1
+
+def add_keyword_flags(df):
+    """
+    df with the KEYWORD_FLAG_COLUMNS extract_advanced_features counts, so
+    the text can be split off after preprocessing as for is_question.
+    """
+    lowered = df['message'].fillna('').str.lower()
+    flags = {f'life_{event}': lowered.apply(lambda x: any(kw in x for kw in kws)).to_numpy(dtype=bool)
+             for event, kws in LIFE_KEYWORDS.items()}
+    flags['celebration_keyword'] = lowered.apply(
+        lambda x: any(kw in x for kw in CELEBRATION_KEYWORDS)).to_numpy(dtype=bool)
+    flags['topic'] = lowered.apply(_first_topic).to_numpy(dtype=np.int8)
+    return df.assign(**flags)
+
+def extract_advanced_features(df, user_name=DEFAULT_USER_NAME):
     """
     Per‑contact advanced features:
     - conflict score (negative sentiment bursts)
@@ -16,65 +61,44 @@ def extract_advanced_features(df, user_name="Rahul"):
     - time‑of‑day patterns
     - initiation ratio over time
     - commitment follow‑through rate
+    Keyword counts come from the add_keyword_flags columns, computed here
+    when df still carries the message text instead.
     """
+    if 'topic' not in df:
+        df = add_keyword_flags(df)
+    topic_names = list(TOPICS)
     features = {}
     for contact in df['contact'].unique():
         contact_df = df[df['contact'] == contact].copy()
         if len(contact_df) < 3:
             continue
         # Conflict detection: consecutive negative messages from both sides
-        neg_thresh = -0.3
-        contact_df['is_neg'] = contact_df['sentiment'] < neg_thresh
+        contact_df['is_neg'] = contact_df['sentiment'] < NEG_THRESHOLD
         # mark arguments: at least 3 messages in a row where both sides have negative sentiment
         contact_df['neg_block'] = (contact_df['is_neg'] != contact_df['is_neg'].shift()).cumsum()
         arg_blocks = contact_df.groupby('neg_block').filter(lambda g: len(g) >= 3 and g['is_neg'].all())
         conflict_count = len(arg_blocks) if not arg_blocks.empty else 0
         # Life events
-        life_keywords = {
-            'exam': ['exam', 'test', 'grades'],
-            'thesis': ['thesis', 'dissertation', 'defense'],
-            'deadline': ['deadline', 'due', 'submit by'],
-            'sick': ['sick', 'fever', 'cough', 'hospital'],
-            'stress': ['stress', 'crazy', 'overthinking', 'tired']
-        }
-        life_events = {}
-        for event, kws in life_keywords.items():
-            count = contact_df['message'].str.lower().apply(lambda x: any(kw in x for kw in kws) if pd.notna(x) else False).sum()
-            life_events[event] = count
+        life_events = {event: contact_df[f'life_{event}'].sum() for event in LIFE_KEYWORDS}
         # Celebration: positive sentiment + keywords
-        celeb_keywords = ['happy', 'congratulations', 'birthday', 'anniversary', 'achievement', 'passed']
-        celebration_count = contact_df[
-            (contact_df['sentiment'] > 0.5) &
-            (contact_df['message'].str.lower().apply(lambda x: any(kw in x for kw in celeb_keywords) if pd.notna(x) else False))
-        ].shape[0]
-        # Topic distribution (simplified)
-        topics = {
-            'work': ['work', 'job', 'office', 'meeting', 'project', 'deadline'],
-            'personal': ['feel', 'love', 'miss', 'sorry', 'angry', 'happy'],
-            'plans': ['meet', 'tonight', 'tomorrow', 'weekend', 'movie', 'dinner'],
-            'casual': ['lol', 'haha', 'stfu', 'bro', 'valo', 'game']
-        }
-        topic_counts = Counter()
-        for msg in contact_df['message'].dropna():
-            msg_low = msg.lower()
-            for topic, kws in topics.items():
-                if any(kw in msg_low for kw in kws):
-                    topic_counts[topic] += 1
-                    break  # simple assignment
+        celebration_count = contact_df[(contact_df['sentiment'] > 0.5) & contact_df['celebration_keyword']].shape[0]
+        # Topic distribution (simplified), in order of first mention
+        topics = contact_df['topic'].to_numpy()
+        topic_counts = {topic_names[t]: int((topics == t).sum()) for t in pd.unique(topics[topics >= 0])}
         # Time‑of‑day: late night (22‑4) messages
         contact_df['hour'] = contact_df['timestamp'].dt.hour
-        late_night = ((contact_df['hour'] >= 22) | (contact_df['hour'] <= 4)).sum()
+        late_night = is_late_night(contact_df['hour']).sum()
         # Initiation ratio over last 10 messages
         last_10 = contact_df.iloc[-10:]
         from_user = (last_10['sender'] == user_name).sum()
         from_contact = (last_10['sender'] == contact).sum()
         init_ratio = from_contact / (from_contact + from_user) if (from_contact + from_user) > 0 else 0.5
         # Commitment follow‑through: count commitments made by contact, count replies from user within 3 days
-        commitments_made = contact_df[contact_df['commitments'].apply(len) > 0]
+        commitments_made = contact_df[commitment_mask(contact_df)]
         followed = 0
         for idx, row in commitments_made.iterrows():
             future = contact_df[(contact_df['timestamp'] > row['timestamp']) &
-                                (contact_df['timestamp'] <= row['timestamp'] + pd.Timedelta(days=3)) &
+                                (contact_df['timestamp'] <= row['timestamp'] + pd.Timedelta(days=FOLLOW_THROUGH_DAYS)) &
                                 (contact_df['sender'] == user_name)]
             if not future.empty:
                 followed += 1
@@ -84,7 +108,7 @@ def extract_advanced_features(df, user_name="Rahul"):
             'conflict_count': conflict_count,
             'life_events': life_events,
             'celebration_count': celebration_count,
-            'topic_counts': dict(topic_counts),
+            'topic_counts': topic_counts,
             'late_night_msg': late_night,
             'initiation_ratio_recent': init_ratio,
             'commitment_follow_rate': follow_rate
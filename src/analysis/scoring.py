@@ -1,13 +1,15 @@
 import pandas as pd
 import numpy as np
+from src.utils.config import DEFAULT_USER_NAME
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
-def compute_streaks(df, contact):
+def compute_streaks(df, contact, as_of=None):
     """
     Compute current streak (consecutive days with at least one message)
-    and max streak for a given contact.
+    and max streak for a given contact. The current streak counts as broken
+    if the last message is older than the day before as_of (default: now).
     """
     contact_df = df[df['contact'] == contact].copy()
     if contact_df.empty:
@@ -28,7 +30,7 @@ def compute_streaks(df, contact):
             current_streak = 1
     # Current streak: check if last message was today or yesterday
     last_date = dates[-1]
-    today = pd.Timestamp.now().date()
+    today = (as_of if as_of is not None else pd.Timestamp.now()).date()
     days_since = (today - last_date).days
     if days_since == 0:
         # active today, streak continues
@@ -41,7 +43,32 @@ def compute_streaks(df, contact):
         current_streak = 0
     return current_streak, max_streak
 
-def compute_relationship_scores(df, user_name="Rahul", weights=None, window_days=7):
+def week_score(total_msgs, user_msgs, avg_sentiment, avg_resp, current_streak, weights):
+    """
+    Score of one contact-week from its message counts, mean sentiment, mean
+    response time in seconds (None if no replies) and the current streak.
+    Returns (score, freq, reciprocity_score).
+    """
+    freq = total_msgs / 7.0
+    ratio = user_msgs / total_msgs if total_msgs > 0 else 0.5
+    reciprocity_score = 1 - 2 * abs(0.5 - ratio)
+    if avg_resp is not None:
+        max_resp = 7 * 24 * 3600
+        resp_score = np.exp(-avg_resp / max_resp)
+    else:
+        resp_score = 0.5
+    max_freq = 10.0
+    freq_score = min(freq / max_freq, 1.0)
+    # Streak score: normalize current streak by max possible (say 30 days)
+    streak_score = min(current_streak / 30.0, 1.0) if current_streak > 0 else 0.0
+    score = (weights['frequency'] * freq_score +
+             weights['reciprocity'] * reciprocity_score +
+             weights['sentiment'] * ((avg_sentiment + 1) / 2) +
+             weights['response_time'] * resp_score +
+             weights['streak'] * streak_score)
+    return score, freq, reciprocity_score
+
+def compute_relationship_scores(df, user_name=DEFAULT_USER_NAME, weights=None, window_days=7, as_of=None):
     if weights is None:
         weights = {'frequency': 0.25, 'reciprocity': 0.2, 'sentiment': 0.2, 'response_time': 0.2, 'streak': 0.15}
     df = df.copy()
@@ -49,32 +76,17 @@ def compute_relationship_scores(df, user_name="Rahul", weights=None, window_days
     scores = []
     for contact, contact_df in df.groupby('contact'):
         # Compute overall streaks (not per week, but we can compute weekly streak component)
-        current_streak, max_streak = compute_streaks(df, contact)
+        current_streak, max_streak = compute_streaks(df, contact, as_of=as_of)
         for week_start, week_df in contact_df.groupby('week_start'):
             if len(week_df) == 0:
                 continue
-            freq = len(week_df) / 7.0
             user_msgs = len(week_df[week_df['sender'] == user_name])
             total_msgs = len(week_df)
-            ratio = user_msgs / total_msgs if total_msgs > 0 else 0.5
-            reciprocity_score = 1 - 2 * abs(0.5 - ratio)
             avg_sentiment = week_df['sentiment'].mean()
             resp_times = week_df['response_time_seconds'].dropna()
-            if len(resp_times) > 0:
-                avg_resp = resp_times.mean()
-                max_resp = 7 * 24 * 3600
-                resp_score = np.exp(-avg_resp / max_resp)
-            else:
-                resp_score = 0.5
-            max_freq = 10.0
-            freq_score = min(freq / max_freq, 1.0)
-            # Streak score: normalize current streak by max possible (say 30 days)
-            streak_score = min(current_streak / 30.0, 1.0) if current_streak > 0 else 0.0
-            score = (weights['frequency'] * freq_score +
-                     weights['reciprocity'] * reciprocity_score +
-                     weights['sentiment'] * ((avg_sentiment + 1) / 2) +
-                     weights['response_time'] * resp_score +
-                     weights['streak'] * streak_score)
+            avg_resp = resp_times.mean() if len(resp_times) > 0 else None
+            score, freq, reciprocity_score = week_score(total_msgs, user_msgs, avg_sentiment, avg_resp,
+                                                        current_streak, weights)
             scores.append({
                 'contact': contact,
                 'week_start': week_start,
@@ -82,7 +94,7 @@ def compute_relationship_scores(df, user_name="Rahul", weights=None, window_days
                 'freq': freq,
                 'reciprocity': reciprocity_score,
                 'avg_sentiment': avg_sentiment,
-                'avg_response_time': avg_resp if len(resp_times) > 0 else None,
+                'avg_response_time': avg_resp,
                 'num_messages': total_msgs,
                 'current_streak': current_streak,
                 'max_streak': max_streak
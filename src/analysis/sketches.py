@@ -0,0 +1,203 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from src.state.journal import write_json_atomic
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DEFAULT_COMPRESSION = 100
+
+
+class TDigest:
+    """
+    Mergeable quantile sketch (a merging t-digest). Values are kept as at most
+    about `compression` weighted centroids, small near both tails, so memory
+    per digest is constant and tail quantiles such as p95 or p99 stay
+    accurate. Digests built on different shards combine with merge().
+    """
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    @classmethod
+    def from_values(cls, values, compression=DEFAULT_COMPRESSION):
+        return cls(compression).update(values)
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def __len__(self):
+        return len(self.means)
+
+    def update(self, values):
+        """Add a batch of values (NaNs are ignored)."""
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values):
+            self.min = min(self.min, values.min())
+            self.max = max(self.max, values.max())
+            self._compress(np.concatenate([self.means, values]),
+                           np.concatenate([self.weights, np.ones(len(values))]))
+        return self
+
+    def merge(self, other):
+        """Fold another digest into this one."""
+        if len(other):
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self._compress(np.concatenate([self.means, other.means]),
+                           np.concatenate([self.weights, other.weights]))
+        return self
+
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        # k1 scale function: each unit of k(q) = compression/(2*pi) * asin(2q - 1)
+        # holds one centroid, so centroids are small where q is near 0 or 1
+        q_left = (np.cumsum(weights) - weights) / total
+        k = self.compression / (2 * np.pi) * np.arcsin(np.clip(2 * q_left - 1, -1, 1))
+        group = np.floor(k - k[0]).astype(np.int64)
+        group = np.unique(group, return_inverse=True)[1]
+        merged_weights = np.bincount(group, weights=weights)
+        self.means = np.bincount(group, weights=means * weights) / merged_weights
+        self.weights = merged_weights
+
+    def quantile(self, q):
+        """Estimated q-quantile (0 <= q <= 1; scalar or array); NaN when empty."""
+        if not len(self):
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        total = self.weights.sum()
+        centers = np.cumsum(self.weights) - self.weights / 2
+        return np.interp(np.asarray(q) * total, np.concatenate([[0.0], centers, [total]]),
+                         np.concatenate([[self.min], self.means, [self.max]]))
+
+    def to_dict(self):
+        return {'compression': self.compression, 'min': float(self.min), 'max': float(self.max),
+                'means': self.means.tolist(), 'weights': self.weights.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        digest = cls(data.get('compression', DEFAULT_COMPRESSION))
+        digest.means = np.asarray(data['means'], dtype=float)
+        digest.weights = np.asarray(data['weights'], dtype=float)
+        if len(digest.means):
+            digest.min, digest.max = data['min'], data['max']
+        return digest
+
+
+class ResponseTimeSketches:
+    """
+    A TDigest of reply latencies per contact, persisted as JSON between runs.
+
+    update() folds in only the replies sent since the digest was last brought
+    up to date; a contact whose earlier replies no longer add up (a file was
+    edited or removed) is rebuilt from its full history instead.
+    """
+
+    def __init__(self, path=None, compression=DEFAULT_COMPRESSION):
+        self.path = path
+        self.compression = compression
+        self.digests = {}           # contact -> TDigest
+        self.replied_through = {}   # contact -> latest reply time (ns) folded in
+        self.replies = {}           # contact -> replies folded in
+
+    @classmethod
+    def load(cls, path, compression=DEFAULT_COMPRESSION):
+        sketches = cls(path, compression)
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+                for contact, entry in data.get('contacts', {}).items():
+                    sketches.digests[contact] = TDigest.from_dict(entry['digest'])
+                    sketches.replied_through[contact] = entry['replied_through']
+                    sketches.replies[contact] = entry['replies']
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable response-time sketches {path}: {e}")
+                sketches = cls(path, compression)
+        return sketches
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        write_json_atomic(self.path, {'contacts': {
+            contact: {'digest': digest.to_dict(), 'replied_through': self.replied_through[contact],
+                      'replies': self.replies[contact]}
+            for contact, digest in self.digests.items()}})
+
+    def update(self, df, as_of):
+        """Bring every contact's digest up to as_of from df's response_time_seconds."""
+        as_of_ns = pd.Timestamp(as_of).value
+        rebuilt = 0
+        for contact, contact_df in df.groupby('contact'):
+            resp = contact_df['response_time_seconds'].to_numpy(dtype=float)
+            replied_at = (contact_df['timestamp'].to_numpy(dtype='datetime64[ns]').view('i8') +
+                          np.nan_to_num(resp * 1e9).astype(np.int64))
+            replied = ~np.isnan(resp) & (replied_at <= as_of_ns)
+            through = self.replied_through.get(contact)
+            if through is not None and int((replied & (replied_at <= through)).sum()) == self.replies[contact]:
+                new = replied & (replied_at > through)
+                self.digests[contact].update(resp[new])
+                self.replies[contact] += int(new.sum())
+            else:
+                self.digests[contact] = TDigest.from_values(resp[replied], self.compression)
+                self.replies[contact] = int(replied.sum())
+                rebuilt += 1
+            self.replied_through[contact] = int(replied_at[replied].max()) if replied.any() else 0
+        for contact in set(self.digests) - set(df['contact'].unique()):
+            for registry in (self.digests, self.replied_through, self.replies):
+                registry.pop(contact, None)
+        logger.debug("Response-time sketches updated (%d rebuilt).", rebuilt)
+        return self
+
+    def get(self, contact):
+        return self.digests.get(contact)
+
+    def subset(self, contacts):
+        """A copy holding only these contacts (sharing their digests), e.g. one shard's."""
+        sketches = ResponseTimeSketches(compression=self.compression)
+        for contact in contacts:
+            if contact in self.digests:
+                sketches.digests[contact] = self.digests[contact]
+                sketches.replied_through[contact] = self.replied_through[contact]
+                sketches.replies[contact] = self.replies[contact]
+        return sketches
+
+    def merge(self, other):
+        """Fold in another set, e.g. a shard's: new contacts are adopted, shared ones merged."""
+        for contact, digest in other.digests.items():
+            if contact in self.digests:
+                self.digests[contact].merge(digest)
+                self.replied_through[contact] = max(self.replied_through[contact], other.replied_through[contact])
+                self.replies[contact] += other.replies[contact]
+            else:
+                self.digests[contact] = digest
+                self.replied_through[contact] = other.replied_through[contact]
+                self.replies[contact] = other.replies[contact]
+        return self
+
+    def percentiles(self, percentiles=(50, 90, 95, 99)):
+        """One row per contact: replies counted and reply-time percentiles in seconds."""
+        rows = []
+        for contact, digest in sorted(self.digests.items()):
+            if not len(digest):
+                continue
+            values = digest.quantile(np.asarray(percentiles) / 100)
+            row = {'contact': contact, 'replies': int(digest.count)}
+            row.update({f"p{p}": float(v) for p, v in zip(percentiles, values)})
+            rows.append(row)
+        return pd.DataFrame(rows, columns=['contact', 'replies'] + [f"p{p}" for p in percentiles])
+
+
+def sketches_from_config(config):
+    sketch_config = config.get('sketches', {})
+    return ResponseTimeSketches.load(sketch_config.get('file'), sketch_config.get('compression', DEFAULT_COMPRESSION))
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+
+SORTABLE_COLUMNS = ['score', 'freq', 'avg_sentiment', 'reciprocity', 'current_streak', 'num_messages', 'contact']
+
+
+def latest_scores(scores_df):
+    """One row per contact: its most recent week (vectorized, no per-contact loop)."""
+    if scores_df.empty:
+        return scores_df.copy()
+    idx = scores_df.groupby('contact')['week_start'].idxmax()
+    return scores_df.loc[idx].reset_index(drop=True)
+
+
+def query_contacts(latest, search=None, min_score=None, max_score=None, trend=None, trends=None,
+                   sort_by='score', ascending=False, page=1, page_size=50):
+    """
+    Filter, sort and paginate the latest-score table.
+    Returns (page_df, total_matching_rows).
+    """
+    mask = np.ones(len(latest), dtype=bool)
+    if search:
+        mask &= latest['contact'].str.contains(search, case=False, regex=False).to_numpy()
+    if min_score is not None:
+        mask &= (latest['score'] >= min_score).to_numpy()
+    if max_score is not None:
+        mask &= (latest['score'] <= max_score).to_numpy()
+    if trend and trends is not None:
+        mask &= latest['contact'].map(trends).eq(trend).to_numpy()
+    filtered = latest[mask]
+    total = len(filtered)
+    if sort_by not in filtered.columns:
+        sort_by = 'score'
+    page = max(1, int(page))
+    start = (page - 1) * page_size
+    if start >= total:
+        return filtered.iloc[0:0], total
+    # One stable ordering for every page, ties broken by contact name, so pages never overlap or skip rows
+    if sort_by == 'contact':
+        ordered = filtered.sort_values('contact', ascending=ascending, kind='stable')
+    else:
+        ordered = filtered.sort_values([sort_by, 'contact'], ascending=[ascending, True], kind='stable')
+    return ordered.iloc[start:start + page_size], total
+
+
+def top_n(latest, n=20, by='score', ascending=False):
+    return latest.nsmallest(n, by) if ascending else latest.nlargest(n, by)
+
+
+def score_histogram(latest, bins=20):
+    """(counts, edges) of the latest scores, for a distribution chart that does not grow with contacts."""
+    counts, edges = np.histogram(latest['score'].dropna(), bins=bins, range=(0.0, 1.0))
+    return counts, edges
+
+
+def downsample_series(x, y, max_points=200):
+    """
+    Reduce a time series to at most `max_points` points by averaging equal-size buckets.
+    x may be datetimes; returns (x, y) as NumPy arrays.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= max_points:
+        return x, y
+    edges = np.linspace(0, n, max_points + 1).astype(int)
+    starts = edges[:-1]
+    sizes = np.diff(edges)
+    y_out = np.add.reduceat(y, starts) / sizes
+    # Bucket midpoint for the x value keeps datetimes datetimes
+    x_out = x[starts + sizes // 2]
+    return x_out, y_out
+
+
+def contact_series(scores_df, contact, max_points=200):
+    series = scores_df[scores_df['contact'] == contact].sort_values('week_start')
+    return downsample_series(series['week_start'].to_numpy(), series['score'].to_numpy(), max_points)
+
+
+def trend_summary(trends):
+    """{'increasing': n, 'decreasing': n, 'stable': n}"""
+    summary = {'increasing': 0, 'decreasing': 0, 'stable': 0}
+    for t in trends.values():
+        summary[t] = summary.get(t, 0) + 1
+    return summary
+
+
+def paginate_rows(rows, page=1, page_size=50):
+    """Slice a list of dict rows into one page; returns (DataFrame, total)."""
+    page = max(1, int(page))
+    start = (page - 1) * page_size
+    return pd.DataFrame(rows[start:start + page_size]), len(rows)
@@ -0,0 +1,206 @@
+import os
+import threading
+import time
+import pandas as pd
+from src.analysis.patterns import detect_trends
+from src.decision_engine.classify_contact import feature_matrix
+from src.decision_engine.prioritization import prioritize_contacts
+from src.preprocessing.loader import EXPECTED_HEADER, parse_timestamp
+from src.scheduler import scheduler_from_config, RawDataWatcher
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class ContactIndex:
+    """
+    Per-contact state for the query API, held in memory.
+
+    The scheduler underneath keeps every contact's messages, latest score,
+    candidate actions and the pending (selected) action, and re-evaluates a
+    contact only when it gets new messages or reaches its next due time.
+    refresh() runs that, at most every refresh_seconds. The detailed view
+    of a contact (weekly scores, trend, features, anomalies) is computed on
+    first request and kept until the contact's messages change or it becomes
+    due again.
+
+    New messages arrive through ingest(), which appends them to a CSV in the
+    raw data directory (so later pipeline runs see them too) and reloads
+    just that file. With a state_service, evaluations read the state under
+    its reading() lock, as the scheduler daemon does.
+    """
+
+    def __init__(self, config, user_name, raw_data_path, state=None, ingest_file="api_ingest.csv",
+                 refresh_seconds=1.0, state_service=None):
+        self.config = config
+        self.user_name = user_name
+        self.raw_data_path = raw_data_path
+        self.ingest_path = os.path.join(raw_data_path, ingest_file)
+        self.refresh_seconds = refresh_seconds
+        self.state_service = state_service
+        if state_service is not None:
+            state = state_service.tracker
+        self.scheduler = scheduler_from_config(config, user_name, state=state)
+        self.watcher = RawDataWatcher(raw_data_path, self.scheduler)
+        self._details = {}          # contact -> (history it was built from, due_ns, details)
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()     # ingest file and watcher; queries do not wait on it
+        self._refreshed_at = None
+        self._ranked = None         # (refresh it was built at, prioritized contacts)
+
+    def load(self):
+        """Read the raw data directory and evaluate every contact."""
+        with self._write_lock:
+            self.watcher.poll()
+        with self._lock:
+            self._refresh(force=True)
+        logger.info("Indexed %d contacts.", len(self.scheduler.histories))
+        return self
+
+    def refresh(self):
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self._refreshed_at is not None and now - self._refreshed_at < self.refresh_seconds:
+            return
+        self._refreshed_at = now
+        if self.state_service is not None:
+            with self.state_service.reading():
+                self.scheduler.run_pending()
+        else:
+            self.scheduler.run_pending()
+
+    # ---- Queries ----
+
+    def contacts(self):
+        self.refresh()
+        return sorted(self.scheduler.histories)
+
+    def contact(self, contact):
+        """Score, explanation, trend, type, features, anomalies and candidate actions (None if unknown)."""
+        self.refresh()
+        with self._lock:
+            history = self.scheduler.histories.get(contact)
+            if history is None:
+                return None
+            now = pd.Timestamp.now()
+            cached = self._details.get(contact)
+            if cached is None or cached[0] is not history or cached[1] <= now.value:
+                k = history.cutoff(now.value)
+                cached = (history, self.scheduler.next_due(history, k, now), self._compute(history, k, now))
+                self._details[contact] = cached
+            details = dict(cached[2])
+            details['candidate_actions'] = self.scheduler.candidates.get(contact, [])
+            details['pending_action'] = self.scheduler.actions.get(contact)
+            return details
+
+    def _compute(self, history, k, now):
+        if k == 0:
+            return {'contact': history.contact, 'score': None, 'last_message': None}
+        weights = self.config['weights']
+        info, anomalies, features = history.signals(k, now, weights)
+        contact_type = self.scheduler.classifier.classify(feature_matrix({history.contact: features}))[history.contact]
+        weekly = history.weekly_scores(k, now, weights)
+        latest = weekly[-1]
+        return {
+            'contact': history.contact,
+            'score': float(info['latest_score']),
+            'explanation': {
+                'week_start': latest['week_start'].isoformat(),
+                'weights': weights,
+                'messages_per_day': float(latest['freq']),
+                'reciprocity': float(latest['reciprocity']),
+                'avg_sentiment': float(latest['avg_sentiment']),
+                'avg_response_time_seconds': (None if latest['avg_response_time'] is None
+                                              else float(latest['avg_response_time'])),
+                'current_streak': latest['current_streak'],
+                'max_streak': latest['max_streak'],
+            },
+            'trend': detect_trends(pd.DataFrame(weekly)).get(history.contact, 'stable'),
+            'weekly_scores': [{'week_start': w['week_start'].isoformat(), 'score': float(w['score']),
+                               'num_messages': w['num_messages']} for w in weekly],
+            'contact_type': contact_type,
+            'features': features,
+            'anomalies': {
+                'response_time_anomalies': len(anomalies['response_time_anomalies']),
+                'inactivity_days': anomalies['inactivity'][-1][2] if anomalies['inactivity'] else 0,
+                'unanswered_questions': [q['message'] for q in anomalies['unanswered_questions']],
+                'missed_commitments': [m['message'] for m in anomalies['missed_commitments']],
+                'sentiment_drop': anomalies['sentiment_drop'],
+                'one_sided_ratio': anomalies['one_sided_ratio'] or None,
+            },
+            'last_message': history.last_message(k).isoformat(),
+        }
+
+    def urgent(self, n=10):
+        """The n most urgent contacts, ranked like the decision engine ranks them."""
+        return self._ranking()[:n]
+
+    def _ranking(self):
+        # Scores only move on evaluation and days_since_last only at day boundaries, so the
+        # ranking is rebuilt at most once per refresh (or when an ingest forced one)
+        self.refresh()
+        with self._lock:
+            if self._ranked is None or self._ranked[0] != self._refreshed_at:
+                now = pd.Timestamp.now()
+                contacts_info = []
+                # The watcher may drop contacts meanwhile (it runs under the write lock only)
+                for contact, score in list(self.scheduler.scores.items()):
+                    history = self.scheduler.histories.get(contact)
+                    if history is None:
+                        continue
+                    last = history.last_message(history.cutoff(now.value))
+                    contacts_info.append({'contact': contact, 'latest_score': score,
+                                          'days_since_last': (now - last).days})
+                self._ranked = (self._refreshed_at, prioritize_contacts(contacts_info))
+            return self._ranked[1]
+
+    def pending_actions(self):
+        """The selected action per contact, most urgent contact first."""
+        ranking = self._ranking()
+        with self._lock:
+            order = {c['contact']: i for i, c in enumerate(ranking)}
+            actions = sorted(list(self.scheduler.actions.values()), key=lambda a: order.get(a['contact'], len(order)))
+            return [{key: action[key] for key in ('contact', 'type', 'reason', 'priority', 'details')}
+                    for action in actions]
+
+    # ---- Ingest ----
+
+    def ingest(self, messages):
+        """
+        Append messages ({timestamp, sender, receiver, platform, message}
+        dicts) to the ingest CSV and re-evaluate the contacts they touch.
+        Returns the affected contacts.
+        """
+        rows = []
+        for message in messages:
+            missing = [key for key in ('timestamp', 'sender', 'receiver', 'message') if not message.get(key)]
+            if missing:
+                raise ValueError(f"Message is missing {', '.join(missing)}")
+            timestamp = parse_timestamp(str(message['timestamp']))
+            if pd.isna(timestamp):
+                raise ValueError(f"Unparseable timestamp: {message['timestamp']}")
+            # The loader splits on commas and keeps everything after the 4th in the message
+            rows.append([timestamp.strftime("%Y-%m-%d %H:%M:%S"), message['sender'], message['receiver'],
+                         message.get('platform', 'API'), " ".join(str(message['message']).splitlines())])
+        with self._write_lock:
+            new_file = not os.path.exists(self.ingest_path)
+            os.makedirs(self.raw_data_path, exist_ok=True)
+            with open(self.ingest_path, 'a', encoding='utf-8', newline='') as f:
+                if new_file:
+                    f.write(",".join(EXPECTED_HEADER) + "\n")
+                for row in rows:
+                    f.write(",".join(row) + "\n")
+            affected = self.watcher.poll()
+        with self._lock:
+            self._refresh(force=True)
+        return sorted(affected)
+
+
+def contact_index_from_config(config, user_name, raw_data_path=None, state=None, state_service=None):
+    api_config = config.get('api', {})
+    return ContactIndex(config, user_name, raw_data_path or config['data']['raw_data_path'], state=state,
+                        ingest_file=api_config.get('ingest_file', "api_ingest.csv"),
+                        refresh_seconds=api_config.get('refresh_seconds', 1.0), state_service=state_service)
@@ -0,0 +1,92 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+MAX_BODY_BYTES = 1 << 20
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """
+    JSON endpoints over a ContactIndex (self.server.index):
+
+        GET  /health
+        GET  /contacts
+        GET  /contacts/<name>        score, explanation, trend, features, anomalies, actions
+        GET  /urgent?n=10            most urgent contacts first
+        GET  /actions                pending action per contact
+        POST /ingest                 {"messages": [{timestamp, sender, receiver, platform, message}, ...]}
+    """
+
+    protocol_version = "HTTP/1.1"     # keep-alive, so clients reuse connections
+    disable_nagle_algorithm = True    # headers and body go out in separate writes
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [unquote(p) for p in url.path.strip('/').split('/') if p]
+        query = parse_qs(url.query)
+        index = self.server.index
+        if parts == ['health']:
+            return self._send(200, {'status': 'ok', 'contacts': len(index.scheduler.histories),
+                                    'evaluations': index.scheduler.evaluations})
+        if parts == ['contacts']:
+            return self._send(200, {'contacts': index.contacts()})
+        if len(parts) == 2 and parts[0] == 'contacts':
+            details = index.contact(parts[1])
+            if details is None:
+                return self._send(404, {'error': f"Unknown contact '{parts[1]}'"})
+            return self._send(200, details)
+        if parts == ['urgent']:
+            try:
+                n = int(query.get('n', ['10'])[0])
+            except ValueError:
+                return self._send(400, {'error': "n must be an integer"})
+            return self._send(200, {'contacts': index.urgent(n)})
+        if parts == ['actions']:
+            return self._send(200, {'actions': index.pending_actions()})
+        return self._send(404, {'error': f"No route for {url.path}"})
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip('/') != '/ingest':
+            return self._send(404, {'error': f"No route for {self.path}"})
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            return self._send(413, {'error': "Request body too large"})
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            messages = payload['messages'] if isinstance(payload, dict) else payload
+            affected = self.server.index.ingest(messages)
+        except (ValueError, KeyError, TypeError) as e:
+            return self._send(400, {'error': str(e)})
+        return self._send(200, {'ingested': len(messages), 'contacts': affected})
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, default=str).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class QueryServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, index):
+        super().__init__(address, QueryHandler)
+        self.index = index
+
+
+def start_server(index, host="127.0.0.1", port=8765):
+    """Serve index on a background thread; returns the server (port=0 picks a free port)."""
+    server = QueryServer((host, port), index)
+    thread = threading.Thread(target=server.serve_forever, name="query-api", daemon=True)
+    thread.start()
+    logger.info("Query API listening on http://%s:%d", *server.server_address[:2])
+    return server
@@ -0,0 +1,224 @@
+import asyncio
+import itertools
+import random
+import time
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Longest text the Bot API accepts in one message
+TELEGRAM_MAX_MESSAGE = 4096
+DIGEST_HEADER = "🗒️ Lower-priority suggestions:"
+
+
+def truncate_message(text, limit=TELEGRAM_MAX_MESSAGE):
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+class TransientSendError(Exception):
+    """A send that may succeed if retried (rate limited, timeout, network blip)."""
+
+    def __init__(self, message="", retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Transport:
+    """
+    Where notifications go. `buttons` is a list of rows of (label, callback_data)
+    pairs; transports that have no buttons may ignore it.
+    Implementations raise TransientSendError for failures worth retrying.
+    """
+
+    async def send(self, chat_id, text, buttons=None):
+        raise NotImplementedError
+
+
+class TelegramTransport(Transport):
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def send(self, chat_id, text, buttons=None):
+        from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+        from telegram.error import NetworkError, RetryAfter, TimedOut
+
+        markup = None
+        if buttons:
+            markup = InlineKeyboardMarkup([[InlineKeyboardButton(label, callback_data=data) for label, data in row]
+                                           for row in buttons])
+        try:
+            await self.bot.send_message(chat_id=chat_id, text=text, reply_markup=markup)
+        except RetryAfter as e:
+            retry_after = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else e.retry_after
+            raise TransientSendError(str(e), retry_after=retry_after) from e
+        except (TimedOut, NetworkError) as e:
+            raise TransientSendError(str(e)) from e
+
+
+class FakeTransport(Transport):
+    """In-process transport for load tests: fixed latency and a random transient failure rate."""
+
+    def __init__(self, latency=0.005, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.sent = []
+        self.attempts = 0
+
+    async def send(self, chat_id, text, buttons=None):
+        self.attempts += 1
+        await asyncio.sleep(self.latency)
+        if self.rng.random() < self.failure_rate:
+            raise TransientSendError("simulated failure")
+        self.sent.append((time.monotonic(), chat_id, text, buttons))
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, at most `capacity` banked."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class NotificationDispatcher:
+    """
+    Paced delivery of action notifications.
+
+    Notifications wait in a priority queue ordered by action priority (lower
+    is more urgent). `max_concurrency` workers take them in order, wait for a
+    slot in their chat's token bucket, and send them through the transport.
+    Transient failures are retried with exponential backoff plus jitter.
+    If `digest_min_priority` is set, actions at that priority or less urgent
+    are sent as digest messages per chat instead of one message each; a digest
+    holds at most `digest_max_items` actions and `max_message_chars` characters.
+
+    Keep one dispatcher for the life of the process: the rate limits live in
+    it, so every caller sending to a chat shares that chat's bucket.
+    """
+
+    def __init__(self, transport, rate_per_second=1.0, burst=10, max_concurrency=4,
+                 max_retries=3, backoff_base=0.5, digest_min_priority=None, digest_max_items=20,
+                 max_message_chars=TELEGRAM_MAX_MESSAGE):
+        self.transport = transport
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self._buckets = {}          # chat_id -> TokenBucket
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.digest_min_priority = digest_min_priority
+        self.digest_max_items = digest_max_items
+        self.max_message_chars = max_message_chars
+        self._queue = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self._digest = {}           # chat_id -> [(priority, text, buttons)]
+        self.stats = {'sent': 0, 'failed': 0, 'retries': 0, 'digests': 0, 'digested_actions': 0}
+
+    @classmethod
+    def from_config(cls, transport, config):
+        params = dict(config.get('notifications', {})) if config else {}
+        return cls(transport, **params)
+
+    def bucket(self, chat_id):
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = TokenBucket(self.rate_per_second, self.burst)
+        return bucket
+
+    def enqueue(self, chat_id, text, priority=5, buttons=None):
+        if self.digest_min_priority is not None and priority >= self.digest_min_priority:
+            self._digest.setdefault(chat_id, []).append((priority, text, buttons))
+            return
+        self._queue.put_nowait((priority, next(self._seq), chat_id, truncate_message(text, self.max_message_chars),
+                                buttons))
+
+    def _digest_chunks(self, entries):
+        """Numbered digest lines split into messages under digest_max_items and max_message_chars."""
+        chunks, chunk, length = [], [], len(DIGEST_HEADER)
+        for n, (priority, text, buttons) in enumerate(entries, 1):
+            line = truncate_message(f"{n}. {text}", self.max_message_chars - len(DIGEST_HEADER) - 1)
+            if chunk and (len(chunk) == self.digest_max_items or length + 1 + len(line) > self.max_message_chars):
+                chunks.append(chunk)
+                chunk, length = [], len(DIGEST_HEADER)
+            chunk.append((n, priority, line, buttons))
+            length += 1 + len(line)
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
+    def _enqueue_digests(self, stats):
+        for chat_id, entries in self._digest.items():
+            entries.sort(key=lambda e: e[0])
+            for chunk in self._digest_chunks(entries):
+                lines = [DIGEST_HEADER]
+                buttons = []
+                for n, _, line, item_buttons in chunk:
+                    lines.append(line)
+                    # Keep each item's buttons, relabelled with its number
+                    for row in item_buttons or []:
+                        buttons.append([(f"{label} #{n}", data) for label, data in row])
+                self._queue.put_nowait((chunk[0][1], next(self._seq), chat_id, "\n".join(lines), buttons or None))
+                stats['digests'] += 1
+                stats['digested_actions'] += len(chunk)
+        self._digest = {}
+
+    async def _send_with_retry(self, chat_id, text, buttons, stats):
+        for attempt in range(self.max_retries + 1):
+            await self.bucket(chat_id).acquire()
+            try:
+                await self.transport.send(chat_id, text, buttons)
+                stats['sent'] += 1
+                return True
+            except TransientSendError as e:
+                if attempt == self.max_retries:
+                    break
+                stats['retries'] += 1
+                delay = e.retry_after if e.retry_after is not None else self.backoff_base * (2 ** attempt)
+                await asyncio.sleep(delay * (1 + random.random() * 0.1))
+        stats['failed'] += 1
+        logger.warning("Giving up on notification to %s after %d attempts", chat_id, self.max_retries + 1)
+        return False
+
+    async def _worker(self, stats):
+        while True:
+            try:
+                _, _, chat_id, text, buttons = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                await self._send_with_retry(chat_id, text, buttons, stats)
+            except Exception:
+                stats['failed'] += 1
+                logger.exception("Notification to %s failed", chat_id)
+            finally:
+                self._queue.task_done()
+
+    async def drain(self):
+        """
+        Send everything queued so far. Returns the stats of this drain (what
+        its own workers sent); self.stats keeps the running totals.
+        """
+        stats = dict.fromkeys(self.stats, 0)
+        self._enqueue_digests(stats)
+        start = time.perf_counter()
+        workers = [asyncio.create_task(self._worker(stats)) for _ in range(self.max_concurrency)]
+        await asyncio.gather(*workers)
+        for key, value in stats.items():
+            self.stats[key] += value
+        stats['seconds'] = time.perf_counter() - start
+        return stats
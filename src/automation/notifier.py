@@ -1,5 +1,5 @@
 import pandas as pd
-from src.automation.actions import generate_action_message
+from src.automation.templates import render_all
 
 def print_scores(scores_df):
     """Print a formatted table of the latest relationship scores."""
@@ -36,8 +36,8 @@ def print_actions(actions, contact_anomalies=None):
     print("\n" + "="*70)
     print("⚡ AUTOMATED ACTIONS GENERATED")
     print("="*70)
-    for i, action in enumerate(actions, 1):
-        msg = generate_action_message(action)
+    messages = render_all(actions)
+    for i, (action, msg) in enumerate(zip(actions, messages), 1):
         print(f"{i}. [{action['type'].upper()}] {msg}")
         print(f"   🧠 Reason: {action['reason']}")
         if 'details' in action and action['details']:
@@ -55,12 +55,17 @@ def print_actions(actions, contact_anomalies=None):
 
 def print_feedback_summary(tracker):
     """Print how feedback has adapted sensitivities."""
-    sens = tracker.sensitivity
-    if not sens:
+    rows = tracker.sensitivity_rows()
+    if not rows:
         return
     print("\n🔁 ADAPTIVE SENSITIVITIES (after feedback)")
-    for contact, actions in sens.items():
-        print(f"{contact}:")
-        for atype, val in actions.items():
-            print(f"   {atype}: {val:.2f}")
+    current = None
+    for row in rows:
+        if row['contact'] != current:
+            current = row['contact']
+            print(f"{current}:")
+        print(f"   {row['action_type']}: {row['sensitivity']:.2f}")
+    totals = tracker.feedback_totals()
+    print(f"Feedback so far: {totals['accepted']} accepted, {totals['dismissed']} dismissed, "
+          f"{totals['pending']} pending")
     print("-"*70)
\ No newline at end of file
@@ -1,3 +1,5 @@
+from string import Formatter
+
 templates = {
     'catch_up': "Hey {contact}, it's been a while! How have you been? Let's catch up soon.",
     'reach_out': "Hi {contact}, I noticed we haven't talked in {days} days. Hope you're doing well!",
@@ -15,5 +17,73 @@ templates = {
     'academic_reminder': "Remind {contact} about upcoming deadlines or offer help with work.",
 }
 
+# Used when an action carries no value for a template field
+default_params = {
+    'reach_out': {'days': 7},
+    'follow_up_reminder': {'commitment': "something"},
+    'propose_plan': {'commitment': "that"},
+}
+
+FALLBACK_TEMPLATE = "Action for {contact}: {reason}"
+
+
+class TemplateRegistry:
+    """
+    Templates parsed once into (format string, required fields) per action type.
+
+    Rendering reads values from the action's structured 'params' (set by the
+    rules), so no field is ever recovered by parsing the human-readable reason.
+    render_all() caches each result on the action under 'message', so the
+    console, Telegram and Streamlit outputs share one rendering per action.
+    """
+
+    def __init__(self, template_map=None, defaults=None):
+        template_map = templates if template_map is None else template_map
+        self.defaults = default_params if defaults is None else defaults
+        self._compiled = {atype: self._compile(text) for atype, text in template_map.items()}
+        self._fallback = self._compile(FALLBACK_TEMPLATE)
+
+    @staticmethod
+    def _compile(text):
+        fields = tuple(name for _, name, _, _ in Formatter().parse(text) if name)
+        return text, fields
+
+    def template(self, action_type):
+        """The format string render() uses for action_type."""
+        return self._compiled.get(action_type, self._fallback)[0]
+
+    def render(self, action):
+        text, fields = self._compiled.get(action['type'], self._fallback)
+        params = action.get('params') or {}
+        defaults = self.defaults.get(action['type'], {})
+        values = {}
+        for field in fields:
+            if field == 'contact':
+                values[field] = action['contact']
+            elif field == 'reason':
+                values[field] = action.get('reason', '')
+            elif field in params:
+                values[field] = params[field]
+            else:
+                values[field] = defaults.get(field, '')
+        return text.format_map(values)
+
+    def render_all(self, actions):
+        """Render every action once; returns the messages in order."""
+        messages = []
+        for action in actions:
+            message = action.get('message')
+            if message is None:
+                message = self.render(action)
+                action['message'] = message
+            messages.append(message)
+        return messages
+
+
+registry = TemplateRegistry()
+
 def get_template(action_type):
-    return templates.get(action_type, "Action: {reason}")
\ No newline at end of file
+    return registry.template(action_type)
+
+def render_all(actions):
+    return registry.render_all(actions)
@@ -0,0 +1,355 @@
+import numpy as np
+import pandas as pd
+from src.analysis.features_advanced import (NEG_THRESHOLD, LIFE_KEYWORDS, TOPICS, FOLLOW_THROUGH_DAYS,
+                                            is_late_night, add_keyword_flags)
+from src.analysis.scoring import week_score
+from src.analysis.sketches import TDigest
+from src.decision_engine.bandit import ContextualBandit
+from src.decision_engine.classify_contact import classifier_from_config, feature_matrix
+from src.decision_engine.engine import collect_candidates, choose_actions
+from src.decision_engine.prioritization import prioritize_contacts
+from src.pipeline import build_pipeline_graph
+from src.state.tracker import StateTracker
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+DAY_NS = 86_400 * 10**9
+UNANSWERED_FOLLOWUP_DAYS = 2    # detect_unanswered_questions' default
+SENTIMENT_WINDOW = 3
+SENTIMENT_DROP = 0.3
+ONE_SIDED_RATIO = 0.7
+
+
+def _prefix(flags):
+    """counts[k] = number of true flags among the first k messages."""
+    return np.concatenate([[0], np.cumsum(flags)])
+
+
+class ContactHistory:
+    """
+    One contact's preprocessed messages as time-sorted arrays, with prefix
+    counts and run lengths built once. The signals the decision engine reads
+    (latest weekly score, streaks, anomalies, advanced features) can then be
+    evaluated at any moment with a binary search, O(1) lookups and small
+    slices, instead of re-running the pipeline on the truncated log.
+
+    Results match the pipeline run with the same as_of (see truncate_to):
+    replies that only arrive after as_of do not count.
+    """
+
+    def __init__(self, contact, contact_df, user_name, config):
+        # Same order as the detectors, which sort stably by timestamp
+        contact_df = contact_df.sort_values('timestamp', kind='stable')
+        if 'topic' not in contact_df:
+            contact_df = add_keyword_flags(contact_df)
+        self.contact = contact
+        self.config = config
+        self.ts = contact_df['timestamp'].to_numpy(dtype='datetime64[ns]').view('i8')
+        self.n = len(self.ts)
+        self.messages = contact_df['message'].to_numpy(dtype=object)
+        self.commitments = contact_df['commitments'].to_numpy(dtype=object)
+        self.sentiment = contact_df['sentiment'].to_numpy(dtype=float)
+        self.response_time = contact_df['response_time_seconds'].to_numpy(dtype=float)
+        replied_at = contact_df['timestamp'] + pd.to_timedelta(contact_df['response_time_seconds'], unit='s')
+        # NaT (no reply) becomes the largest int64, i.e. "never"
+        self.replied_at = replied_at.to_numpy(dtype='datetime64[ns]').view('i8').copy()
+        self.replied_at[replied_at.isna().to_numpy()] = np.iinfo(np.int64).max
+        sender = contact_df['sender'].to_numpy(dtype=object)
+        self.from_contact = sender == contact
+        self.from_user = sender == user_name
+        self.user_prefix = _prefix(self.from_user)
+        self.contact_prefix = _prefix(self.from_contact)
+
+        # First message from the user strictly after each message
+        user_ts = np.append(self.ts[self.from_user], np.iinfo(np.int64).max)
+        self.next_user = user_ts[np.searchsorted(user_ts[:-1], self.ts, side='right')]
+
+        # Streaks: run lengths over distinct days
+        days = self.ts // DAY_NS
+        self.unique_days, self.day_index = np.unique(days, return_inverse=True)
+        runs = np.ones(len(self.unique_days), dtype=np.int64)
+        for i in range(1, len(runs)):
+            if self.unique_days[i] - self.unique_days[i - 1] == 1:
+                runs[i] = runs[i - 1] + 1
+        self.runs = runs
+
+        # Calendar weeks (Monday start), as in compute_relationship_scores
+        self.week = contact_df['timestamp'].dt.to_period('W').dt.start_time.to_numpy(dtype='datetime64[ns]').view('i8')
+
+        # Flagged messages, for the question / commitment detectors
+        followup_days = config['thresholds']['commitment_followup_days']
+        self.questions = np.flatnonzero(self.from_contact & np.array(['?' in str(m) for m in self.messages]))
+        has_commitment = np.array([len(c) > 0 for c in self.commitments], dtype=bool)
+        self.commitment_rows = np.flatnonzero(self.from_contact & has_commitment)
+        self.followup_ns = followup_days * DAY_NS
+        self.any_commitment_rows = np.flatnonzero(has_commitment)
+
+        # Advanced-feature prefix counts
+        self.life_prefix = {event: _prefix(contact_df[f'life_{event}'].to_numpy(dtype=bool)) for event in LIFE_KEYWORDS}
+        celebration = (self.sentiment > 0.5) & contact_df['celebration_keyword'].to_numpy(dtype=bool)
+        self.celebration_prefix = _prefix(celebration)
+        topic_of = contact_df['topic'].to_numpy()
+        self.topic_prefix = [_prefix(topic_of == t) for t in range(len(TOPICS))]
+        self.topic_first = [int(np.argmax(topic_of == t)) if (topic_of == t).any() else self.n
+                            for t in range(len(TOPICS))]
+        hours = contact_df['timestamp'].dt.hour.to_numpy()
+        self.late_night_prefix = _prefix(is_late_night(hours))
+        # Conflict: rows inside runs of >= 3 negative messages; a run cut off by as_of counts only if still >= 3 long
+        is_neg = self.sentiment < NEG_THRESHOLD
+        starts = np.flatnonzero(np.concatenate([[True], is_neg[1:] != is_neg[:-1]])) if self.n else np.array([], int)
+        lengths = np.diff(np.concatenate([starts, [self.n]]))
+        block_neg = is_neg[starts] if self.n else np.array([], bool)
+        complete = np.where(block_neg & (lengths >= 3), lengths, 0)
+        self.block_start = starts
+        self.block_neg = block_neg
+        self.block_of = np.repeat(np.arange(len(starts)), lengths)
+        self.conflict_before = np.concatenate([[0], np.cumsum(complete)])
+
+    def cutoff(self, as_of_ns):
+        """Number of messages sent at or before as_of."""
+        return int(np.searchsorted(self.ts, as_of_ns, side='right'))
+
+    def last_message(self, k):
+        return pd.Timestamp(self.ts[k - 1])
+
+    def latest_score(self, k, as_of, weights):
+        current_streak = self._current_streak(k, as_of)
+        lo = int(np.searchsorted(self.week, self.week[k - 1], side='left'))
+        week = slice(lo, k)
+        valid = self.replied_at[week] <= as_of.value
+        resp = self.response_time[week][valid]
+        avg_resp = resp.mean() if len(resp) > 0 else None
+        user_msgs = int(self.user_prefix[k] - self.user_prefix[lo])
+        score, _, _ = week_score(k - lo, user_msgs, self.sentiment[week].mean(), avg_resp, current_streak, weights)
+        return score
+
+    def weekly_scores(self, k, as_of, weights):
+        """compute_relationship_scores rows for this contact as of as_of, oldest week first."""
+        current_streak = self._current_streak(k, as_of)
+        max_streak = int(self.runs[:self.day_index[k - 1] + 1].max())
+        replied = self.replied_at[:k] <= as_of.value
+        weeks, starts = np.unique(self.week[:k], return_index=True)
+        rows = []
+        for week_start, lo, hi in zip(weeks, starts, np.append(starts[1:], k)):
+            resp = self.response_time[lo:hi][replied[lo:hi]]
+            avg_resp = resp.mean() if len(resp) > 0 else None
+            avg_sentiment = self.sentiment[lo:hi].mean()
+            user_msgs = int(self.user_prefix[hi] - self.user_prefix[lo])
+            score, freq, reciprocity = week_score(hi - lo, user_msgs, avg_sentiment, avg_resp, current_streak, weights)
+            rows.append({'contact': self.contact, 'week_start': pd.Timestamp(week_start), 'score': score,
+                         'freq': freq, 'reciprocity': reciprocity, 'avg_sentiment': avg_sentiment,
+                         'avg_response_time': avg_resp, 'num_messages': int(hi - lo),
+                         'current_streak': current_streak, 'max_streak': max_streak})
+        return rows
+
+    def _current_streak(self, k, as_of):
+        j = self.day_index[k - 1]
+        days_since = (as_of.normalize().value // DAY_NS) - self.unique_days[j]
+        return int(self.runs[j]) if days_since <= 1 else 0
+
+    def anomalies(self, k, as_of):
+        """The signals the rules read from detect_contact_anomalies, as of as_of."""
+        thresholds = self.config['thresholds']
+        as_of_ns = as_of.value
+        last = self.last_message(k)
+        days_since_last = (as_of - last).days
+        # Only an open gap reaching as_of matters to the inactivity rule
+        inactivity = [(last, as_of, days_since_last)] if days_since_last > thresholds['inactivity_days'] else []
+        return {
+            'as_of': as_of,
+            'response_time_anomalies': self._response_time_anomalies(
+                k, as_of_ns, thresholds['max_response_time_std_multiplier'],
+                thresholds.get('response_time_percentile')),
+            'inactivity': inactivity,
+            'unanswered_questions': self._unanswered(self.questions, k, as_of_ns,
+                                                     UNANSWERED_FOLLOWUP_DAYS * DAY_NS),
+            'missed_commitments': self._unanswered(self.commitment_rows, k, as_of_ns, self.followup_ns),
+            'sentiment_drop': self._sentiment_drop(k),
+            'one_sided_ratio': self._one_sided(k),
+        }
+
+    def _rows(self, idx):
+        return [{'timestamp': pd.Timestamp(self.ts[i]), 'message': self.messages[i],
+                 'commitments': self.commitments[i], 'response_time_seconds': self.response_time[i]} for i in idx]
+
+    def _response_time_anomalies(self, k, as_of_ns, std_multiplier, percentile=None):
+        valid = self.replied_at[:k] <= as_of_ns
+        resp = self.response_time[:k][valid]
+        if len(resp) < 2:
+            return []
+        if percentile is not None:
+            threshold = TDigest.from_values(resp).quantile(percentile / 100)
+        else:
+            threshold = resp.mean() + std_multiplier * resp.std(ddof=1)
+        return self._rows(np.flatnonzero(valid & (self.response_time[:k] > threshold)))
+
+    def _unanswered(self, rows, k, as_of_ns, window_ns):
+        rows = rows[:np.searchsorted(rows, k)]
+        # No reply from the user within the window, counting only replies already sent by as_of
+        deadline = np.minimum(self.ts[rows] + window_ns, as_of_ns)
+        return self._rows(rows[self.next_user[rows] > deadline])
+
+    def _sentiment_drop(self, k):
+        if k < SENTIMENT_WINDOW * 2:
+            return None
+        recent = self.sentiment[k - SENTIMENT_WINDOW:k].mean()
+        previous = self.sentiment[k - 2 * SENTIMENT_WINDOW:k - SENTIMENT_WINDOW].mean()
+        if previous - recent > SENTIMENT_DROP:
+            return {'previous': previous, 'recent': recent, 'drop': previous - recent}
+        return None
+
+    def _one_sided(self, k):
+        if k < 5:
+            return False
+        lo = max(0, k - 10)
+        ratio = (self.contact_prefix[k] - self.contact_prefix[lo]) / (k - lo)
+        if ratio > ONE_SIDED_RATIO or ratio < (1 - ONE_SIDED_RATIO):
+            return ratio
+        return False
+
+    def signals(self, k, as_of, weights):
+        """
+        Everything the decision engine reads about this contact as of as_of
+        except its type: the contacts_info entry, anomalies and features ({}
+        below 3 messages). Types are assigned to all contacts at once by a
+        ContactClassifier.
+        """
+        feat = self.features(k, as_of)
+        info = {
+            'contact': self.contact,
+            'latest_score': self.latest_score(k, as_of, weights),
+            'days_since_last': (as_of - self.last_message(k)).days,
+        }
+        return info, self.anomalies(k, as_of), feat
+
+    def features(self, k, as_of):
+        """extract_advanced_features for this contact as of as_of ({} below 3 messages)."""
+        if k < 3:
+            return {}
+        b = self.block_of[k - 1]
+        partial = k - self.block_start[b]
+        conflict_count = int(self.conflict_before[b] + (partial if self.block_neg[b] and partial >= 3 else 0))
+        lo = max(0, k - 10)
+        from_user = self.user_prefix[k] - self.user_prefix[lo]
+        from_contact = self.contact_prefix[k] - self.contact_prefix[lo]
+        init_ratio = from_contact / (from_contact + from_user) if (from_contact + from_user) > 0 else 0.5
+        made = self.any_commitment_rows[:np.searchsorted(self.any_commitment_rows, k)]
+        deadline = np.minimum(self.ts[made] + FOLLOW_THROUGH_DAYS * DAY_NS, as_of.value)
+        followed = int((self.next_user[made] <= deadline).sum())
+        # Topics in order of first mention, as extract_advanced_features lists them
+        topics = sorted((self.topic_first[t], name, int(self.topic_prefix[t][k]))
+                        for t, name in enumerate(TOPICS) if self.topic_prefix[t][k] > 0)
+        return {
+            'conflict_count': conflict_count,
+            'life_events': {event: int(prefix[k]) for event, prefix in self.life_prefix.items()},
+            'celebration_count': int(self.celebration_prefix[k]),
+            'topic_counts': {name: count for _, name, count in topics},
+            'late_night_msg': int(self.late_night_prefix[k]),
+            'initiation_ratio_recent': init_ratio,
+            'commitment_follow_rate': followed / len(made) if len(made) > 0 else 1.0,
+        }
+
+
+class Backtester:
+    """
+    Replays the decision engine at many past moments over one preprocessed
+    DataFrame. Per-contact indexes are built once; each date then costs a
+    binary search per contact plus the rules and one bandit pass.
+
+    state: the tracker whose sensitivities and bandit statistics the engine
+    reads (default: an empty in-memory one, i.e. no feedback). The bandit is
+    re-seeded from the config for every date, so a date's result does not
+    depend on which other dates were evaluated.
+    """
+
+    def __init__(self, df, config, user_name, state=None):
+        self.config = config
+        self.user_name = user_name
+        self.state = state if state is not None else StateTracker(backend='memory')
+        self.classifier = classifier_from_config(config)
+        self.histories = {contact: ContactHistory(contact, contact_df, user_name, config)
+                          for contact, contact_df in df.groupby('contact')}
+
+    def evaluate(self, as_of):
+        """
+        (candidates, selected) at as_of: every action the rules propose, as
+        {contact: [action, ...]}, and the bandit's pick per contact in
+        priority order. Also returns the contact types used.
+        """
+        as_of = pd.Timestamp(as_of)
+        contacts_info, contact_anomalies, features = [], {}, {}
+        for contact, history in self.histories.items():
+            k = history.cutoff(as_of.value)
+            if k == 0:
+                continue
+            info, contact_anomalies[contact], feat = history.signals(k, as_of, self.config['weights'])
+            contacts_info.append(info)
+            if feat:
+                features[contact] = feat
+        contact_types = self.classifier.classify(feature_matrix(features, [c['contact'] for c in contacts_info]))
+        prioritized = prioritize_contacts(contacts_info)
+        candidates = collect_candidates(prioritized, self.config, self.state, features, contact_types,
+                                        contact_anomalies, as_of=as_of)
+        bandit = ContextualBandit.from_config(self.config, self.state, as_of=as_of)
+        selected = choose_actions(prioritized, candidates, self.config, self.state, bandit)
+        return candidates, selected, contact_types
+
+    def run(self, dates):
+        """
+        One row per candidate action per date: as_of, contact, contact_type,
+        type, priority, reason and whether the bandit selected it.
+        """
+        rows = []
+        for as_of in dates:
+            candidates, selected, contact_types = self.evaluate(as_of)
+            chosen = {id(action) for action in selected}
+            for contact, actions in candidates.items():
+                for action in actions:
+                    rows.append({'as_of': pd.Timestamp(as_of), 'contact': contact,
+                                 'contact_type': contact_types.get(contact, 'other'),
+                                 'type': action['type'], 'priority': action['priority'],
+                                 'reason': action['reason'], 'selected': id(action) in chosen})
+        logger.info("Backtest evaluated %d dates: %d candidate actions.", len(dates), len(rows))
+        return pd.DataFrame(rows, columns=['as_of', 'contact', 'contact_type', 'type', 'priority', 'reason',
+                                           'selected'])
+
+
+def backtest_dates(df, start=None, end=None, freq='D'):
+    """Evaluation moments from start to end (default: the first and last message), every freq."""
+    start = pd.Timestamp(start) if start is not None else df['timestamp'].min().normalize() + pd.Timedelta(days=1)
+    end = pd.Timestamp(end) if end is not None else df['timestamp'].max()
+    return list(pd.date_range(start, end, freq=freq))
+
+
+def run_backtest(config_path="config/config.yaml", user_name=None, raw_data_path=None, start=None, end=None,
+                 freq='D', dates=None, state=None):
+    """
+    Evaluate the decision engine at every date (or every freq between start
+    and end). Loading and preprocessing go through the pipeline graph once,
+    so they are memoized like any other run. Returns (backtester, report),
+    or None when no data was loaded.
+    """
+    graph = build_pipeline_graph(config_path, user_name=user_name, raw_data_path=raw_data_path)
+    if graph.get('raw_df').empty:
+        logger.error("No data loaded. Exiting.")
+        return
+    df = graph.get('message_store').attach(graph.get('preprocessed_df'))
+    backtester = Backtester(df, graph.ctx.config, graph.ctx.user_name, state=state)
+    if dates is None:
+        dates = backtest_dates(df, start, end, freq)
+    return backtester, backtester.run(dates)
+
+
+def check_against_pipeline(backtester, dates, config_path, raw_data_path, state):
+    """Run the full pipeline at each date and return the dates whose selected actions differ."""
+    mismatches = []
+    for as_of in dates:
+        graph = build_pipeline_graph(config_path, raw_data_path=raw_data_path, tracker=state, as_of=as_of)
+        if graph.get('df').empty:
+            continue
+        expected = [(a['contact'], a['type'], a['reason']) for a in graph.get('actions')]
+        _, selected, _ = backtester.evaluate(as_of)
+        if expected != [(a['contact'], a['type'], a['reason']) for a in selected]:
+            mismatches.append(as_of)
+    return mismatches
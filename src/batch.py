@@ -0,0 +1,129 @@
+import os
+import time
+import yaml
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+USER_PROFILE_FILE = "user.yaml"
+
+
+def discover_users(users_dir):
+    """
+    Find tenant folders under users_dir. Each tenant looks like:
+
+        users_dir/<user>/raw/*.csv         chat logs
+        users_dir/<user>/actions_log.json  state file (created on first run)
+        users_dir/<user>/user.yaml         optional, e.g. {name: "Alice"}
+
+    The user name defaults to the folder name.
+    """
+    jobs = []
+    if not os.path.isdir(users_dir):
+        logger.error(f"Users directory {users_dir} does not exist.")
+        return jobs
+    for entry in sorted(os.listdir(users_dir)):
+        user_dir = os.path.join(users_dir, entry)
+        raw_dir = os.path.join(user_dir, "raw")
+        if not os.path.isdir(raw_dir):
+            continue
+        name = entry
+        profile_path = os.path.join(user_dir, USER_PROFILE_FILE)
+        if os.path.exists(profile_path):
+            with open(profile_path, 'r') as f:
+                profile = yaml.safe_load(f) or {}
+            name = profile.get('name', name)
+        jobs.append({
+            'user_id': entry,
+            'user_name': name,
+            'raw_data_path': raw_dir,
+            'state_file': os.path.join(user_dir, "actions_log.json"),
+        })
+    return jobs
+
+
+def run_user(job, config_path="config/config.yaml", simulate_feedback=False):
+    """Run the pipeline for a single tenant. Executed inside a worker process."""
+    from src.pipeline import run_pipeline
+
+    start = time.perf_counter()
+    summary = {
+        'user_id': job['user_id'],
+        'user_name': job['user_name'],
+        'messages': 0,
+        'contacts': 0,
+        'actions': [],
+        'error': None,
+    }
+    try:
+        result = run_pipeline(config_path,
+                              user_name=job['user_name'],
+                              raw_data_path=job['raw_data_path'],
+                              state_file=job['state_file'],
+                              verbose=False,
+                              simulate_feedback=simulate_feedback)
+        if result is not None:
+            df, scores_df, actions, tracker = result
+            summary['messages'] = len(df)
+            summary['contacts'] = int(df['contact'].nunique())
+            # Only small, picklable results travel back to the parent process
+            summary['actions'] = [{k: a[k] for k in ('contact', 'type', 'reason', 'priority')} for a in actions]
+    except Exception as e:
+        logger.exception(f"Pipeline failed for user {job['user_id']}")
+        summary['error'] = str(e)
+    summary['seconds'] = time.perf_counter() - start
+    return summary
+
+
+def run_batch(users_dir, config_path="config/config.yaml", workers=None, simulate_feedback=False):
+    """
+    Run the pipeline for every tenant in users_dir on a shared process pool.
+    Each tenant gets its own StateService (and state file) inside its worker.
+    Returns a report with per-user timings and overall throughput.
+    """
+    jobs = discover_users(users_dir)
+    if not jobs:
+        logger.error(f"No user folders found in {users_dir}.")
+        return {'users': [], 'total_seconds': 0.0, 'total_messages': 0,
+                'users_per_second': 0.0, 'messages_per_second': 0.0}
+
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_user, job, config_path, simulate_feedback): job for job in jobs}
+        for future in as_completed(futures):
+            summary = future.result()
+            results.append(summary)
+            logger.info("User %s: %d messages, %d actions in %.2fs", summary['user_id'],
+                        summary['messages'], len(summary['actions']), summary['seconds'])
+    total_seconds = time.perf_counter() - start
+
+    results.sort(key=lambda r: r['user_id'])
+    total_messages = sum(r['messages'] for r in results)
+    report = {
+        'users': results,
+        'total_seconds': total_seconds,
+        'total_messages': total_messages,
+        'users_per_second': len(results) / total_seconds if total_seconds > 0 else 0.0,
+        'messages_per_second': total_messages / total_seconds if total_seconds > 0 else 0.0,
+    }
+    logger.info(f"Batch finished: {len(results)} users, {total_messages} messages in {total_seconds:.2f}s "
+                f"({report['messages_per_second']:.0f} msg/s).")
+    return report
+
+
+def print_batch_report(report):
+    print("\n" + "="*70)
+    print("👥 MULTI-USER BATCH REPORT")
+    print("="*70)
+    for r in report['users']:
+        status = f"ERROR: {r['error']}" if r['error'] else f"{len(r['actions'])} actions"
+        print(f"{r['user_id']:<15} : {r['seconds']:6.2f}s  "
+              f"({r['messages']} messages, {r['contacts']} contacts, {status})")
+    print("-"*70)
+    print(f"Total: {len(report['users'])} users, {report['total_messages']} messages "
+          f"in {report['total_seconds']:.2f}s")
+    print(f"Throughput: {report['users_per_second']:.2f} users/s, "
+          f"{report['messages_per_second']:.0f} messages/s")
+    print("="*70 + "\n")
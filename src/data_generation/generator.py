@@ -0,0 +1,139 @@
+import os
+import numpy as np
+import pandas as pd
+from src.utils.config import DEFAULT_USER_NAME
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+PLATFORMS = ['WhatsApp', 'Instagram', 'Telegram', 'SMS']
+PLATFORM_WEIGHTS = [0.6, 0.2, 0.15, 0.05]
+
+FIRST_NAMES = ['Aarav', 'Ishaan', 'Kabir', 'Vihaan', 'Arjun', 'Meera', 'Diya', 'Ananya', 'Kavya', 'Nisha',
+               'Rohan', 'Tara', 'Dev', 'Zoya', 'Kiran', 'Neel', 'Pooja', 'Aditi', 'Manav', 'Sana']
+LAST_NAMES = ['Shah', 'Iyer', 'Nair', 'Gupta', 'Rao', 'Khan', 'Mehta', 'Das', 'Bose', 'Joshi']
+
+# Relative chance of a conversation starting in each hour of the day
+HOURLY_ACTIVITY = np.array([0.3, 0.15, 0.08, 0.05, 0.05, 0.1, 0.3, 0.8, 1.2, 1.3, 1.2, 1.2,
+                            1.4, 1.3, 1.1, 1.1, 1.2, 1.4, 1.6, 1.7, 1.6, 1.3, 0.9, 0.5])
+HOURLY_ACTIVITY = HOURLY_ACTIVITY / HOURLY_ACTIVITY.sum()
+
+# Phrase pools. No commas or quotes: the loader splits lines on commas and keeps quotes.
+QUESTIONS = [
+    "Are you free this weekend?", "Did you see my last message?", "How did the interview go?",
+    "What time works for you?", "Can you send me the notes?", "Are you coming tonight?",
+    "How is your project going?", "Did you reach home safely?", "What are you doing later?",
+]
+COMMITMENTS = [
+    "Let's meet for coffee tomorrow", "We should get dinner this weekend", "Can we call tonight",
+    "I got movie tickets for Friday", "Let's hang out after class", "Lunch tomorrow at 1:30 pm",
+    "We should plan a party for next week", "Coffee at the usual place this weekend",
+]
+POSITIVE = [
+    "Haha that was amazing", "Congratulations on the new job!", "Happy birthday! Have a great day",
+    "I passed the exam!", "Love this so much", "That was the best trip ever", "Thanks a lot for the help",
+]
+NEGATIVE = [
+    "I am so tired of this", "That was really rude", "I feel terrible today", "Stop ignoring me",
+    "I hate how this turned out", "So much stress with the deadline", "I am sick with a fever",
+]
+NEUTRAL = [
+    "Ok", "Sure", "On my way", "Sounds good", "Will check and let you know", "Bro valo later",
+    "Sent the file", "At the office now", "lol", "Meeting ran late", "Just finished work", "Noted",
+]
+REPLIES = [
+    "Yes sure", "Not today sorry", "Sounds good to me", "I will let you know", "Haha same",
+    "Thanks!", "Ok see you then", "Let me check", "Sorry just saw this", "Great news",
+]
+
+
+def contact_names(n_contacts):
+    """Unique, readable contact names ('Meera Rao', 'Meera Rao 2', ...)."""
+    names = []
+    combos = len(FIRST_NAMES) * len(LAST_NAMES)
+    for i in range(n_contacts):
+        name = f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]}"
+        if i >= combos:
+            name += f" {i // combos + 1}"
+        names.append(name)
+    return names
+
+
+def _pick(rng, pool, n):
+    return np.asarray(pool, dtype=object)[rng.integers(0, len(pool), n)]
+
+
+def generate_contact_log(contact, n_messages, rng, user_name=DEFAULT_USER_NAME, start="2026-01-01", days=60,
+                         question_rate=0.15, commitment_rate=0.08, positive_rate=0.2, negative_rate=0.1,
+                         reply_prob=0.8, latency_median_minutes=20.0, latency_sigma=1.5,
+                         contact_initiates=0.55, platform=None):
+    """
+    One conversation as a DataFrame in the loader's column order.
+
+    Conversations are threads: an opening message on a random day of the
+    window, at an hour drawn from HOURLY_ACTIVITY, answered by the other
+    side with probability reply_prob after a log-normal delay (median
+    latency_median_minutes, spread latency_sigma).
+    Opening messages are questions, commitments, positive, negative or
+    neutral at the given rates. Answers are short replies.
+    """
+    n_threads = max(1, int(round(n_messages / (1 + reply_prob))))
+    opened_at = np.sort(rng.integers(0, days, n_threads) * 1440
+                        + rng.choice(24, n_threads, p=HOURLY_ACTIVITY) * 60
+                        + rng.uniform(0, 60, n_threads))
+    from_contact = rng.random(n_threads) < contact_initiates
+
+    kind = rng.random(n_threads)
+    text = _pick(rng, NEUTRAL, n_threads)
+    bounds = np.cumsum([question_rate, commitment_rate, positive_rate, negative_rate])
+    for pool, low, high in [(QUESTIONS, 0, bounds[0]), (COMMITMENTS, bounds[0], bounds[1]),
+                            (POSITIVE, bounds[1], bounds[2]), (NEGATIVE, bounds[2], bounds[3])]:
+        mask = (kind >= low) & (kind < high)
+        text[mask] = _pick(rng, pool, int(mask.sum()))
+
+    replied = rng.random(n_threads) < reply_prob
+    delay = rng.lognormal(np.log(latency_median_minutes), latency_sigma, n_threads)
+    reply_at = opened_at[replied] + delay[replied]
+
+    minutes = np.concatenate([opened_at, reply_at])
+    sender_is_contact = np.concatenate([from_contact, ~from_contact[replied]])
+    messages = np.concatenate([text, _pick(rng, REPLIES, int(replied.sum()))])
+    order = np.argsort(minutes, kind='stable')[:n_messages]
+
+    sender = np.where(sender_is_contact[order], contact, user_name)
+    receiver = np.where(sender_is_contact[order], user_name, contact)
+    timestamps = pd.Timestamp(start) + pd.to_timedelta(minutes[order].astype(np.int64), unit='m')
+    if platform is None:
+        platform = rng.choice(PLATFORMS, p=PLATFORM_WEIGHTS)
+    return pd.DataFrame({
+        'timestamp': timestamps,
+        'sender': sender,
+        'receiver': receiver,
+        'platform': platform,
+        'message': messages[order],
+    })
+
+
+def generate_dataset(out_dir, n_contacts=20, messages_per_contact=200, activity_skew=0.8, seed=0,
+                     user_name=DEFAULT_USER_NAME, **conversation_params):
+    """
+    Write one CSV per contact to out_dir in the format load_all_data reads.
+
+    Messages per contact are log-normal around messages_per_contact
+    (activity_skew=0 gives every contact the same count), so a few contacts
+    are much busier than the rest, as in real logs. Any other keyword is
+    passed to generate_contact_log. The same seed always produces the same
+    files. Returns the total number of messages written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    weights = rng.lognormal(0.0, activity_skew, n_contacts) if activity_skew > 0 else np.ones(n_contacts)
+    counts = np.maximum(2, np.round(weights / weights.sum() * n_contacts * messages_per_contact)).astype(int)
+    total = 0
+    for i, (contact, n_messages) in enumerate(zip(contact_names(n_contacts), counts)):
+        df = generate_contact_log(contact, int(n_messages), rng, user_name=user_name, **conversation_params)
+        path = os.path.join(out_dir, f"synthetic_{i:05d}.csv")
+        df.to_csv(path, index=False, date_format="%Y-%m-%d %H:%M")
+        total += len(df)
+    logger.info(f"Wrote {total} messages for {n_contacts} contacts to {out_dir}")
+    return total
@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+POLICIES = ('epsilon_greedy', 'thompson', 'ucb')
+
+
+class ContextualBandit:
+    """
+    Bernoulli bandit over (contact, action_type) arms.
+
+    Feedback counts live in dense NumPy tables indexed by contact row and
+    action-type column, so estimates for every candidate of every contact
+    are computed in one vectorized pass.
+    Supported policies: 'epsilon_greedy', 'thompson' and 'ucb'.
+    """
+
+    def __init__(self, policy='epsilon_greedy', epsilon=0.2, ucb_c=1.0,
+                 reward_weight=0.7, seed=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown bandit policy '{policy}'. Expected one of {POLICIES}.")
+        self.policy = policy
+        self.epsilon = epsilon
+        self.ucb_c = ucb_c
+        self.reward_weight = reward_weight
+        self.rng = np.random.default_rng(seed)
+        self.contact_index = {}
+        self.action_index = {}
+        self.accepted = np.zeros((8, 16), dtype=np.int64)
+        self.dismissed = np.zeros((8, 16), dtype=np.int64)
+
+    @classmethod
+    def from_config(cls, config, tracker=None, as_of=None):
+        """
+        Bandit from config['bandit'] with the tracker's feedback counts.
+        as_of: the moment of the decision. A configured seed is combined with
+        it, so every live run (as_of = now) explores differently while any
+        evaluation at the same as_of repeats exactly.
+        """
+        params = dict(config.get('bandit', {})) if config else {}
+        if as_of is not None and params.get('seed') is not None:
+            # default_rng wants non-negative entropy; dates before 1970 are negative nanoseconds
+            params['seed'] = [params['seed'], pd.Timestamp(as_of).value & 0xFFFFFFFFFFFFFFFF]
+        bandit = cls(**params)
+        if tracker is not None:
+            bandit.load_stats(tracker.action_stats)
+        return bandit
+
+    def load_stats(self, action_stats):
+        """Fill the count tables from the tracker's nested {contact: {type: counts}} dict."""
+        for contact, per_type in action_stats.items():
+            ci = self._contact_row(contact)
+            for atype, counts in per_type.items():
+                aj = self._action_col(atype)
+                self.accepted[ci, aj] = counts.get('accepted', 0)
+                self.dismissed[ci, aj] = counts.get('dismissed', 0)
+
+    def _contact_row(self, contact):
+        row = self.contact_index.get(contact)
+        if row is None:
+            row = len(self.contact_index)
+            self.contact_index[contact] = row
+            if row >= self.accepted.shape[0]:
+                self._grow(rows=max(2 * self.accepted.shape[0], row + 1))
+        return row
+
+    def _action_col(self, action_type):
+        col = self.action_index.get(action_type)
+        if col is None:
+            col = len(self.action_index)
+            self.action_index[action_type] = col
+            if col >= self.accepted.shape[1]:
+                self._grow(cols=max(2 * self.accepted.shape[1], col + 1))
+        return col
+
+    def _grow(self, rows=None, cols=None):
+        rows = rows or self.accepted.shape[0]
+        cols = cols or self.accepted.shape[1]
+        for name in ('accepted', 'dismissed'):
+            old = getattr(self, name)
+            new = np.zeros((rows, cols), dtype=old.dtype)
+            new[:old.shape[0], :old.shape[1]] = old
+            setattr(self, name, new)
+
+    def update(self, contact, action_type, feedback):
+        ci = self._contact_row(contact)
+        aj = self._action_col(action_type)
+        if feedback == 'accepted':
+            self.accepted[ci, aj] += 1
+        elif feedback == 'dismissed':
+            self.dismissed[ci, aj] += 1
+
+    def get_stats(self, contact, action_type):
+        ci = self.contact_index.get(contact)
+        aj = self.action_index.get(action_type)
+        if ci is None or aj is None:
+            return 0, 0
+        return int(self.accepted[ci, aj]), int(self.dismissed[ci, aj])
+
+    def _scores(self, rows, cols, groups, n_groups, priorities):
+        acc = self.accepted[rows, cols].astype(float)
+        dis = self.dismissed[rows, cols].astype(float)
+        total = acc + dis
+        mean = np.divide(acc, total, out=np.full_like(acc, 0.5), where=total > 0)
+
+        if self.policy == 'thompson':
+            reward = self.rng.beta(acc + 1.0, dis + 1.0)
+        elif self.policy == 'ucb':
+            contact_totals = (self.accepted + self.dismissed).sum(axis=1)[rows].astype(float)
+            reward = mean + self.ucb_c * np.sqrt(2.0 * np.log(contact_totals + 1.0) / (total + 1.0))
+        else:
+            reward = mean
+
+        # Same blend as select_action_with_rl: priority 1 -> 0.5, priority 5 -> 0.166
+        urgency = 1.0 / (priorities + 1.0)
+        scores = reward * self.reward_weight + urgency * (1 - self.reward_weight)
+
+        if self.policy == 'epsilon_greedy' and self.epsilon > 0:
+            explore = self.rng.random(n_groups) < self.epsilon
+            explore_rows = explore[groups]
+            scores[explore_rows] = self.rng.random(int(explore_rows.sum()))
+        return scores
+
+    def select_batch(self, candidates_by_contact):
+        """
+        Pick one action per contact in a single vectorized call.
+        candidates_by_contact: {contact: [action, ...]} in rule-priority order.
+        Returns {contact: action}; contacts without candidates are omitted.
+        """
+        contacts = [c for c, cands in candidates_by_contact.items() if cands]
+        if not contacts:
+            return {}
+
+        flat_actions = []
+        rows, cols, groups, priorities = [], [], [], []
+        for g, contact in enumerate(contacts):
+            ci = self._contact_row(contact)
+            for action in candidates_by_contact[contact]:
+                flat_actions.append(action)
+                rows.append(ci)
+                cols.append(self._action_col(action['type']))
+                groups.append(g)
+                priorities.append(action.get('priority', 5))
+
+        rows = np.asarray(rows)
+        cols = np.asarray(cols)
+        groups = np.asarray(groups)
+        priorities = np.asarray(priorities, dtype=float)
+        scores = self._scores(rows, cols, groups, len(contacts), priorities)
+
+        # Best score per group; ties go to the earliest candidate (highest rule priority)
+        order = np.lexsort((np.arange(len(scores)), -scores, groups))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = groups[order][1:] != groups[order][:-1]
+        winners = order[first]
+
+        selected = {contacts[groups[i]]: flat_actions[i] for i in winners}
+        logger.debug("Bandit (%s) selected actions for %d contacts.", self.policy, len(selected))
+        return selected
@@ -1,24 +1,79 @@
-import re
+import threading
+import numpy as np
+import pandas as pd
+from src.utils.fingerprint import config_fingerprint
 
-def classify_contact(contact_name, df_contact=None, features=None):
+CONTACT_TYPES = ('family', 'romantic', 'friend', 'academic', 'other')
+_UNASSIGNED = (-1, None)
+
+def feature_matrix(advanced_features, contacts=None):
+    """
+    The features the classifier reads, one row per contact (default: every
+    contact in advanced_features). Contacts without features get zeros.
+    """
+    contacts = list(advanced_features) if contacts is None else list(contacts)
+    features = [advanced_features.get(c, {}) for c in contacts]
+    return pd.DataFrame({
+        'late_night_msg': np.fromiter((f.get('late_night_msg', 0) for f in features), float, len(features)),
+        'work_topics': np.fromiter((f.get('topic_counts', {}).get('work', 0) for f in features), float, len(features)),
+    }, index=pd.Index(contacts, dtype=object, name='contact'))
+
+
+class ContactClassifier:
     """
-    Infer relationship type based on name and conversation patterns.
-    Returns one of: 'family', 'romantic', 'friend', 'academic', 'other'
+    Infers every contact's relationship type ('family', 'romantic', 'friend',
+    'academic', 'other') in one vectorized pass over a feature_matrix.
+
+    A name listed in type_overrides always gets that type. Otherwise more
+    than `late_night_messages` late-night messages means romantic, then more
+    than `work_mentions` work-topic messages means academic. Assignments are
+    cached per contact with the side of each threshold its features were on,
+    so a contact is only reclassified when a feature crosses a threshold.
     """
-    name_lower = contact_name.lower()
-    # Explicit mappings from our dataset
-    if contact_name in ['Mom', 'Dad', 'Sister', 'Brother']:
-        return 'family'
-    if contact_name in ['Anjali', 'Priya']:
-        return 'romantic'
-    if contact_name in ['Varun', 'Sahil', 'Sneha', 'Riya', 'Aryan']:
-        return 'friend'
-    if contact_name == 'Dr. Sharma':
-        return 'academic'
-    # Fallback: use features if available
-    if features:
-        if features.get('late_night_msg', 0) > 10:
-            return 'romantic'
-        if features.get('topic_counts', {}).get('work', 0) > 5:
-            return 'academic'
-    return 'other'
\ No newline at end of file
+
+    def __init__(self, type_overrides=None, late_night_messages=10, work_mentions=5):
+        self.overrides = {name: contact_type for contact_type, names in (type_overrides or {}).items()
+                          for name in names}
+        unknown = set(self.overrides.values()) - set(CONTACT_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown contact types in type_overrides: {sorted(unknown)}")
+        self.late_night_messages = late_night_messages
+        self.work_mentions = work_mentions
+        self.assignments = {}       # contact -> (threshold signature, type)
+        self.recomputed = 0         # contacts classified (cache misses) so far
+        self._lock = threading.Lock()
+
+    def classify(self, matrix):
+        """{contact: type} for every row of matrix, in its order."""
+        contacts = matrix.index.to_numpy()
+        late_night = matrix['late_night_msg'].to_numpy() > self.late_night_messages
+        work = matrix['work_topics'].to_numpy() > self.work_mentions
+        signature = late_night.astype(np.int8) | (work.astype(np.int8) << 1)
+        with self._lock:
+            cached = np.fromiter((self.assignments.get(c, _UNASSIGNED)[0] for c in contacts), np.int8, len(contacts))
+            stale = cached != signature
+            if stale.any():
+                override = np.array([self.overrides.get(c, '') for c in contacts[stale].tolist()], dtype=object)
+                types = np.select([override != '', late_night[stale], work[stale]],
+                                  [override, 'romantic', 'academic'], 'other')
+                self.assignments.update(zip(contacts[stale].tolist(),
+                                            zip(signature[stale].tolist(), types.tolist())))
+                self.recomputed += int(stale.sum())
+            return {contact: self.assignments[contact][1] for contact in contacts.tolist()}
+
+
+_classifiers = {}
+_classifiers_lock = threading.Lock()
+
+def classifier_from_config(config):
+    """One classifier (and assignment cache) per contacts config per process."""
+    contacts_config = config.get('contacts', {})
+    key = config_fingerprint(contacts_config)
+    with _classifiers_lock:
+        classifier = _classifiers.get(key)
+        if classifier is None:
+            classifier = _classifiers[key] = ContactClassifier(
+                contacts_config.get('type_overrides'),
+                late_night_messages=contacts_config.get('romantic_late_night_messages', 10),
+                work_mentions=contacts_config.get('academic_work_mentions', 5))
+        return classifier
@@ -2,23 +2,26 @@ import random
 import pandas as pd
 from src.decision_engine.rules import apply_rules
 from src.decision_engine.prioritization import prioritize_contacts
+from src.decision_engine.bandit import ContextualBandit
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
-def select_action_with_rl(actions, contact, state, epsilon=0.2):
+def select_action_with_rl(actions, contact, state, epsilon=0.2, rng=None):
     """
     Use epsilon-greedy to choose one action from the list (or None).
     If no actions, return None.
     If random < epsilon, explore: pick random action.
     Else exploit: pick action with highest estimated reward.
+    rng: optional random.Random for reproducible runs (defaults to the random module).
     """
     if not actions:
         return None
-    if random.random() < epsilon:
+    rng = rng or random
+    if rng.random() < epsilon:
         # explore
-        chosen = random.choice(actions)
-        logger.debug(f"Exploring: selected {chosen['type']} for {contact}")
+        chosen = rng.choice(actions)
+        logger.debug("Exploring: selected %s for %s", chosen['type'], contact)
         return chosen
     else:
         # exploit: compute reward estimate for each action type
@@ -43,38 +46,84 @@ def select_action_with_rl(actions, contact, state, epsilon=0.2):
                 best_action = action
         return best_action
 
-def run_decision_engine(df, scores_df, config, state, advanced_features=None, contact_types=None):
+def run_decision_engine(df, scores_df, config, state, advanced_features=None, contact_types=None, bandit=None,
+                        contact_anomalies=None, as_of=None):
+    """
+    contact_anomalies: precomputed {contact: anomalies} from the pipeline's
+    anomalies stage; contacts missing from it are analysed by apply_rules itself.
+    as_of: the moment the decision is made (default: now); inactivity and
+    anomaly windows are measured up to it.
+    """
+    current_date = as_of if as_of is not None else pd.Timestamp.now()
+    contacts_info, contact_dfs = summarize_contacts(df, scores_df, current_date)
+    prioritized = prioritize_contacts(contacts_info)
+    candidates_by_contact = collect_candidates(prioritized, config, state, advanced_features, contact_types,
+                                               contact_anomalies, contact_dfs=contact_dfs, empty_df=df.iloc[0:0],
+                                               as_of=current_date)
+    return choose_actions(prioritized, candidates_by_contact, config, state, bandit, as_of=current_date)
+
+
+def summarize_contacts(df, scores_df, current_date):
+    """
+    (contacts_info, contact_dfs): the prioritize_contacts input, one entry
+    per scored contact in name order, and df split by contact.
+    """
     latest_scores = scores_df.sort_values('week_start').groupby('contact').last().reset_index()
-    current_date = pd.Timestamp.now()
+    # Split df once instead of filtering it again for every contact
+    contact_dfs = dict(tuple(df.groupby('contact')))
     contacts_info = []
-    for contact in latest_scores['contact']:
-        contact_df = df[df['contact'] == contact]
-        days_since = (current_date - contact_df['timestamp'].max()).days if not contact_df.empty else 999
+    for contact, latest_score in zip(latest_scores['contact'], latest_scores['score']):
+        contact_df = contact_dfs.get(contact)
+        days_since = (current_date - contact_df['timestamp'].max()).days if contact_df is not None else 999
         contacts_info.append({
             'contact': contact,
-            'latest_score': latest_scores[latest_scores['contact'] == contact]['score'].values[0],
+            'latest_score': latest_score,
             'days_since_last': days_since
         })
-    prioritized = prioritize_contacts(contacts_info)
-    all_actions = []
+    return contacts_info, contact_dfs
+
+
+def collect_candidates(prioritized, config, state, advanced_features=None, contact_types=None, contact_anomalies=None,
+                       contact_dfs=None, empty_df=None, as_of=None, sensitivities=None):
+    """
+    Candidate actions from the rules, as {contact: actions}, for contacts in
+    the order prioritize_contacts returned them. Contacts without an entry in
+    contact_anomalies need their messages in contact_dfs. sensitivities
+    ({contact: sensitivity}) stands in for state where there is none, e.g. in
+    a shard worker.
+    """
+    candidates_by_contact = {}
     for cinfo in prioritized:
         contact = cinfo['contact']
-        contact_df = df[df['contact'] == contact]
+        contact_df = contact_dfs.get(contact, empty_df) if contact_dfs else empty_df
         latest_score = cinfo['latest_score']
-        sensitivity = state.get_contact_sensitivity(contact) if state else None
+        if sensitivities is not None:
+            sensitivity = sensitivities.get(contact, {})
+        else:
+            sensitivity = state.get_contact_sensitivity(contact) if state else None
         feat = advanced_features.get(contact, {}) if advanced_features else {}
         ctype = contact_types.get(contact, 'other') if contact_types else 'other'
+        anomalies = contact_anomalies.get(contact) if contact_anomalies else None
         # Generate candidate actions using rules
-        candidates = apply_rules(contact, latest_score, contact_df, config, sensitivity, feat, ctype)
-        if not candidates:
-            continue
-        # Use RL to select one action
-        selected = select_action_with_rl(candidates, contact, state, epsilon=0.2)
-        if selected:
-            all_actions.append(selected)
-            logger.info(f"RL selected {selected['type']} for {contact}")
-        else:
-            # fallback: take highest priority
-            all_actions.append(candidates[0])
-    logger.info(f"Decision engine generated {len(all_actions)} actions after RL selection.")
-    return all_actions
\ No newline at end of file
+        candidates_by_contact[contact] = apply_rules(contact, latest_score, contact_df, config, sensitivity, feat, ctype,
+                                                     anomalies=anomalies, as_of=as_of)
+    return candidates_by_contact
+
+
+def choose_actions(prioritized, candidates_by_contact, config, state, bandit=None, as_of=None):
+    """
+    One action per contact, picked by the bandit, in priority order.
+    as_of: the decision time, which seeds the default bandit's exploration.
+    """
+    # Select one action per contact in a single vectorized bandit pass
+    if bandit is None:
+        bandit = ContextualBandit.from_config(config, state, as_of=as_of)
+    selected = bandit.select_batch(candidates_by_contact)
+    all_actions = []
+    for cinfo in prioritized:
+        contact = cinfo['contact']
+        if contact in selected:
+            all_actions.append(selected[contact])
+            logger.info("RL selected %s for %s", selected[contact]['type'], contact)
+    logger.info("Decision engine generated %d actions after RL selection.", len(all_actions))
+    return all_actions
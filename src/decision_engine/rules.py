@@ -1,195 +1,288 @@
-import pandas as pd
-from src.analysis.anomalies import (
-    detect_inactivity_periods,
-    detect_unanswered_questions,
-    detect_sentiment_drop,
-    detect_one_sided_conversation,
-    detect_missed_commitments,
-    detect_response_time_anomalies
-)
+from src.analysis.anomalies import detect_contact_anomalies
+from src.utils.config import get_user_name
 from src.utils.logger import setup_logger
+from src.utils.profiling import current_profiler
 
 logger = setup_logger(__name__)
 
-def apply_rules(contact, latest_score, df_contact, config, state_sensitivity=None, contact_features=None, contact_type=None):
-    """
-    Evaluate multiple signals and generate a list of possible actions with priority.
-    """
-    actions = []
-    thresholds = config['thresholds']
-    keywords = config['nlp']['commitment_keywords']
-    current_date = pd.Timestamp.now()
+# Every rule takes (contact, latest_score, anomalies, feat, contact_type, thresholds)
+# and returns the list of candidate actions it proposes.
 
-    # ----- 1. Low relationship score -----
+# ----- 1. Low relationship score -----
+def rule_low_score(contact, latest_score, anomalies, feat, contact_type, thresholds):
     if latest_score < thresholds['low_score']:
-        actions.append({
+        return [{
             'type': 'catch_up',
             'contact': contact,
             'reason': f"Relationship score is low ({latest_score:.2f})",
             'priority': 1,
-            'details': []
-        })
+            'details': [],
+            'params': {'score': latest_score}
+        }]
+    return []
 
-    # ----- 2. Inactivity -----
-    inactivity_gaps = detect_inactivity_periods(df_contact, contact, thresholds['inactivity_days'], current_date)
+# ----- 2. Inactivity -----
+def rule_inactivity(contact, latest_score, anomalies, feat, contact_type, thresholds):
+    inactivity_gaps = anomalies['inactivity']
     if inactivity_gaps:
         last_gap = inactivity_gaps[-1]
-        if last_gap[1] == current_date:
+        if last_gap[1] == anomalies['as_of']:
             days = last_gap[2]
-            actions.append({
+            return [{
                 'type': 'reach_out',
                 'contact': contact,
                 'reason': f"No messages for {days} days",
                 'priority': 2,
-                'details': [f"Last message: {last_gap[0].strftime('%Y-%m-%d')}"]
-            })
+                'details': [f"Last message: {last_gap[0].strftime('%Y-%m-%d')}"],
+                'params': {'days': days, 'last_message': last_gap[0].strftime('%Y-%m-%d')}
+            }]
+    return []
 
-    # ----- 3. Unanswered questions -----
-    unanswered = detect_unanswered_questions(df_contact, contact, followup_days=2)
-    for q in unanswered[:2]:
-        actions.append({
-            'type': 'follow_up_reminder',
-            'contact': contact,
-            'reason': f"Unanswered question from {q['timestamp'].strftime('%Y-%m-%d')}",
-            'priority': 3,
-            'details': [q['message']]
-        })
+# ----- 3. Unanswered questions -----
+def rule_unanswered_questions(contact, latest_score, anomalies, feat, contact_type, thresholds):
+    return [{
+        'type': 'follow_up_reminder',
+        'contact': contact,
+        'reason': f"Unanswered question from {q['timestamp'].strftime('%Y-%m-%d')}",
+        'priority': 3,
+        'details': [q['message']],
+        'params': {'commitment': q['message'], 'asked_at': q['timestamp'].strftime('%Y-%m-%d')}
+    } for q in anomalies['unanswered_questions'][:2]]
 
-    # ----- 4. Missed commitments -----
-    missed = detect_missed_commitments(df_contact, contact, keywords, thresholds['commitment_followup_days'])
-    for m in missed[:2]:
-        actions.append({
-            'type': 'follow_up_reminder',
-            'contact': contact,
-            'reason': f"Missed commitment: '{m['message']}'",
-            'priority': 3,
-            'details': [m['message']]
-        })
+# ----- 4. Missed commitments -----
+def rule_missed_commitments(contact, latest_score, anomalies, feat, contact_type, thresholds):
+    return [{
+        'type': 'follow_up_reminder',
+        'contact': contact,
+        'reason': f"Missed commitment: '{m['message']}'",
+        'priority': 3,
+        'details': [m['message']],
+        'params': {'commitment': m['message'], 'keywords': m['commitments']}
+    } for m in anomalies['missed_commitments'][:2]]
 
-    # ----- 5. Sentiment drop -----
-    sent_drop = detect_sentiment_drop(df_contact, contact, window=3, drop_threshold=0.3)
+# ----- 5. Sentiment drop -----
+def rule_sentiment_drop(contact, latest_score, anomalies, feat, contact_type, thresholds):
+    sent_drop = anomalies['sentiment_drop']
     if sent_drop:
-        actions.append({
+        return [{
             'type': 'check_in',
             'contact': contact,
             'reason': f"Sentiment dropped from {sent_drop['previous']:.2f} to {sent_drop['recent']:.2f}",
             'priority': 4,
-            'details': []
-        })
+            'details': [],
+            'params': {'previous': sent_drop['previous'], 'recent': sent_drop['recent']}
+        }]
+    return []
 
-    # ----- 6. One-sided conversation -----
-    one_sided_ratio = detect_one_sided_conversation(df_contact, contact)
+# ----- 6. One-sided conversation -----
+def rule_one_sided(contact, latest_score, anomalies, feat, contact_type, thresholds):
+    one_sided_ratio = anomalies['one_sided_ratio']
     if one_sided_ratio:
         direction = "from you" if one_sided_ratio < 0.3 else "from them"
-        actions.append({
+        return [{
             'type': 'balance_conversation',
             'contact': contact,
             'reason': f"Conversation is one-sided ({direction})",
             'priority': 5,
-            'details': []
-        })
+            'details': [],
+            'params': {'ratio': one_sided_ratio, 'direction': direction}
+        }]
+    return []
 
-    # ----- 7. Response time anomalies -----
-    resp_anomalies = detect_response_time_anomalies(df_contact, contact, thresholds['max_response_time_std_multiplier'])
+# ----- 7. Response time anomalies -----
+def rule_response_time(contact, latest_score, anomalies, feat, contact_type, thresholds):
+    resp_anomalies = anomalies['response_time_anomalies']
     if resp_anomalies:
-        actions.append({
+        return [{
             'type': 'response_time_alert',
             'contact': contact,
             'reason': f"Unusually slow replies detected ({len(resp_anomalies)} instances)",
             'priority': 6,
-            'details': [f"Slow reply: {a['message']}" for a in resp_anomalies[:2]]
+            'details': [f"Slow reply: {a['message']}" for a in resp_anomalies[:2]],
+            'params': {'count': len(resp_anomalies)}
+        }]
+    return []
+
+# ----- ADVANCED RULES (using features and type) -----
+
+# ----- 8. Conflict detected -----
+def rule_conflict(contact, latest_score, anomalies, feat, contact_type, thresholds):
+    if feat.get('conflict_count', 0) > 0:
+        return [{
+            'type': 'suggest_apology',
+            'contact': contact,
+            'reason': f"Possible conflict detected ({feat['conflict_count']} argument periods)",
+            'priority': 4,
+            'details': [],
+            'params': {'conflict_count': feat['conflict_count']}
+        }]
+    return []
+
+# ----- 9. Life event: stress / sick, exams / thesis -----
+def rule_life_events(contact, latest_score, anomalies, feat, contact_type, thresholds):
+    actions = []
+    life = feat.get('life_events', {})
+    if life.get('stress', 0) > 0 or life.get('sick', 0) > 0:
+        actions.append({
+            'type': 'support_checkin',
+            'contact': contact,
+            'reason': "Contact mentioned stress or illness",
+            'priority': 3,
+            'details': [],
+            'params': {}
+        })
+    if life.get('exam', 0) > 0 or life.get('thesis', 0) > 0:
+        actions.append({
+            'type': 'support_checkin',
+            'contact': contact,
+            'reason': "Contact has exams/thesis deadlines",
+            'priority': 3,
+            'details': [],
+            'params': {}
         })
+    return actions
 
-    # ----- ADVANCED RULES (using features and type) -----
+# ----- 10. Celebration -----
+def rule_celebration(contact, latest_score, anomalies, feat, contact_type, thresholds):
+    if feat.get('celebration_count', 0) > 0:
+        return [{
+            'type': 'congratulate',
+            'contact': contact,
+            'reason': "Positive event detected (birthday/achievement)",
+            'priority': 4,
+            'details': [],
+            'params': {}
+        }]
+    return []
+
+# ----- 11. Commitment follow-through low -----
+def rule_low_follow_through(contact, latest_score, anomalies, feat, contact_type, thresholds):
+    if feat.get('commitment_follow_rate', 1.0) < 0.5:
+        return [{
+            'type': 'improve_followup',
+            'contact': contact,
+            'reason': f"Low follow-through on commitments ({feat['commitment_follow_rate']:.0%})",
+            'priority': 5,
+            'details': [],
+            'params': {'follow_rate': feat['commitment_follow_rate']}
+        }]
+    return []
+
+# ----- 12. Plan proposal -----
+def rule_propose_plan(contact, latest_score, anomalies, feat, contact_type, thresholds):
+    missed = anomalies['missed_commitments']
+    if len(missed) > 0:
+        return [{
+            'type': 'propose_plan',
+            'contact': contact,
+            'reason': "Turn missed commitment into a concrete plan",
+            'priority': 3,
+            'details': [m['message'] for m in missed[:1]],
+            'params': {'commitment': missed[0]['message']}
+        }]
+    return []
+
+# ----- 13. Late night chats (romantic) -----
+def rule_late_night(contact, latest_score, anomalies, feat, contact_type, thresholds):
+    if contact_type == 'romantic' and feat.get('late_night_msg', 0) > 5:
+        return [{
+            'type': 'romantic_checkin',
+            'contact': contact,
+            'reason': "Late night conversations suggest closeness",
+            'priority': 4,
+            'details': [],
+            'params': {}
+        }]
+    return []
+
+# ----- 14. Topic-based: share meme -----
+def rule_share_meme(contact, latest_score, anomalies, feat, contact_type, thresholds):
+    if contact_type == 'friend' and feat.get('topic_counts', {}).get('casual', 0) > 5:
+        return [{
+            'type': 'share_meme',
+            'contact': contact,
+            'reason': "Frequent casual chats – share a meme",
+            'priority': 6,
+            'details': [],
+            'params': {}
+        }]
+    return []
+
+# ----- 15. Academic reminder -----
+def rule_academic_reminder(contact, latest_score, anomalies, feat, contact_type, thresholds):
+    if contact_type == 'academic' and feat.get('topic_counts', {}).get('work', 0) > 5:
+        return [{
+            'type': 'academic_reminder',
+            'contact': contact,
+            'reason': "Work-related conversations – remind about deadlines",
+            'priority': 5,
+            'details': [],
+            'params': {}
+        }]
+    return []
+
+BASIC_RULES = [
+    rule_low_score,
+    rule_inactivity,
+    rule_unanswered_questions,
+    rule_missed_commitments,
+    rule_sentiment_drop,
+    rule_one_sided,
+    rule_response_time,
+]
+
+# Only evaluated when contact features and a contact type are available
+ADVANCED_RULES = [
+    rule_conflict,
+    rule_life_events,
+    rule_celebration,
+    rule_low_follow_through,
+    rule_propose_plan,
+    rule_late_night,
+    rule_share_meme,
+    rule_academic_reminder,
+]
+
+def reweight_by_sensitivity(actions, sensitivity):
+    """
+    Actions with each priority scaled by the contact's feedback sensitivity
+    for its type ({action_type: multiplier}, as StateTracker.get_contact_sensitivity
+    returns it), sorted by priority.
+    """
+    if sensitivity:
+        actions = [dict(action, priority=action['priority'] * sensitivity.get(action['type'], 1.0))
+                   for action in actions]
+    return sorted(actions, key=lambda x: x['priority'])
+
+def apply_rules(contact, latest_score, df_contact, config, state_sensitivity=None, contact_features=None, contact_type=None, user_name=None, anomalies=None, as_of=None):
+    """
+    Evaluate multiple signals and generate a list of possible actions with priority.
+    state_sensitivity: this contact's {action_type: multiplier} from the state tracker.
+    anomalies: this contact's entry from detect_all_anomalies, if already computed
+    (the pipeline's anomalies stage); otherwise the detectors run here, as of
+    `as_of` (default: now).
+    """
+    if user_name is None:
+        user_name = get_user_name(config)
+    if anomalies is None:
+        anomalies = detect_contact_anomalies(df_contact, contact, config, user_name=user_name, current_date=as_of)
+    thresholds = config['thresholds']
+
+    rules = BASIC_RULES
+    feat = {}
     if contact_features and contact_type:
+        rules = BASIC_RULES + ADVANCED_RULES
         feat = contact_features.get(contact, {})
-        # 8. Conflict detected
-        if feat.get('conflict_count', 0) > 0:
-            actions.append({
-                'type': 'suggest_apology',
-                'contact': contact,
-                'reason': f"Possible conflict detected ({feat['conflict_count']} argument periods)",
-                'priority': 4,
-                'details': []
-            })
-        # 9. Life event: stress / sick
-        life = feat.get('life_events', {})
-        if life.get('stress', 0) > 0 or life.get('sick', 0) > 0:
-            actions.append({
-                'type': 'support_checkin',
-                'contact': contact,
-                'reason': "Contact mentioned stress or illness",
-                'priority': 3,
-                'details': []
-            })
-        if life.get('exam', 0) > 0 or life.get('thesis', 0) > 0:
-            actions.append({
-                'type': 'support_checkin',
-                'contact': contact,
-                'reason': "Contact has exams/thesis deadlines",
-                'priority': 3,
-                'details': []
-            })
-        # 10. Celebration
-        if feat.get('celebration_count', 0) > 0:
-            actions.append({
-                'type': 'congratulate',
-                'contact': contact,
-                'reason': "Positive event detected (birthday/achievement)",
-                'priority': 4,
-                'details': []
-            })
-        # 11. Commitment follow-through low
-        if feat.get('commitment_follow_rate', 1.0) < 0.5:
-            actions.append({
-                'type': 'improve_followup',
-                'contact': contact,
-                'reason': f"Low follow-through on commitments ({feat['commitment_follow_rate']:.0%})",
-                'priority': 5,
-                'details': []
-            })
-        # 12. Plan proposal
-        if len(missed) > 0:
-            actions.append({
-                'type': 'propose_plan',
-                'contact': contact,
-                'reason': "Turn missed commitment into a concrete plan",
-                'priority': 3,
-                'details': [m['message'] for m in missed[:1]]
-            })
-        # 13. Late night chats (romantic)
-        if contact_type == 'romantic' and feat.get('late_night_msg', 0) > 5:
-            actions.append({
-                'type': 'romantic_checkin',
-                'contact': contact,
-                'reason': "Late night conversations suggest closeness",
-                'priority': 4,
-                'details': []
-            })
-        # 14. Topic-based: share meme
-        if contact_type == 'friend' and feat.get('topic_counts', {}).get('casual', 0) > 5:
-            actions.append({
-                'type': 'share_meme',
-                'contact': contact,
-                'reason': "Frequent casual chats – share a meme",
-                'priority': 6,
-                'details': []
-            })
-        # 15. Academic reminder
-        if contact_type == 'academic' and feat.get('topic_counts', {}).get('work', 0) > 5:
-            actions.append({
-                'type': 'academic_reminder',
-                'contact': contact,
-                'reason': "Work-related conversations – remind about deadlines",
-                'priority': 5,
-                'details': []
-            })
-
-    # Apply state sensitivity
-    if state_sensitivity:
-        for action in actions:
-            sens = state_sensitivity.get(contact, {}).get(action['type'], 1.0)
-            action['priority'] = action['priority'] * sens
-
-    actions.sort(key=lambda x: x['priority'])
-    return actions
\ No newline at end of file
+
+    actions = []
+    profiler = current_profiler()
+    for rule in rules:
+        if profiler is None:
+            actions.extend(rule(contact, latest_score, anomalies, feat, contact_type, thresholds))
+            continue
+        with profiler.span(rule.__name__, 'rule', rows_in=1) as span:
+            proposed = rule(contact, latest_score, anomalies, feat, contact_type, thresholds)
+            span.rows_out = len(proposed)
+        actions.extend(proposed)
+
+    return reweight_by_sensitivity(actions, state_sensitivity)
@@ -0,0 +1,188 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from src.utils.fingerprint import config_fingerprint
+from src.utils.logger import setup_logger
+from src.utils.profiling import span, count_rows
+
+logger = setup_logger(__name__)
+
+
+class Stage:
+    """
+    One named step of a pipeline graph.
+
+    `fn(ctx, **inputs)` receives the artifacts named in `inputs` and returns a
+    dict with one entry per name in `outputs`. `params(ctx)` returns whatever
+    else the stage reads (config values, paths, fingerprints); it becomes part
+    of the cache key. Stages with memoize=False read mutable state (feedback,
+    bandit statistics) and run on every request; persist=True also pickles the
+    outputs to the store's cache directory. `columns` maps a DataFrame input
+    to the columns the stage reads; it receives just those.
+    """
+
+    def __init__(self, name, fn, inputs=(), outputs=None, params=None, memoize=True, persist=False, columns=None):
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs or (name,))
+        self.params = params or (lambda ctx: None)
+        self.memoize = memoize
+        self.persist = persist
+        self.columns = columns or {}
+
+
+class ArtifactStore:
+    """Stage outputs by cache key: an LRU in memory, optionally backed by pickles in `cache_dir`."""
+
+    def __init__(self, cache_dir=None, max_entries=64):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+        if self.cache_dir:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    outputs = pickle.load(f)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable cached artifact {key}: {e}")
+            else:
+                self._remember(key, outputs)
+                self.hits += 1
+                return outputs
+        self.misses += 1
+        return None
+
+    def put(self, key, outputs, persist=False):
+        self._remember(key, outputs)
+        if persist and self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp = f"{self._path(key)}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f:
+                pickle.dump(outputs, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self._path(key))
+
+    def _remember(self, key, outputs):
+        with self._lock:
+            self._memory[key] = outputs
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_artifact_store(cache_dir=None, max_entries=64):
+    """One store per cache directory per process, so every entry point shares memoized artifacts."""
+    key = os.path.abspath(cache_dir) if cache_dir else None
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = ArtifactStore(cache_dir, max_entries)
+        return store
+
+def artifact_store_from_config(config):
+    pipeline_config = config.get('pipeline', {})
+    return get_artifact_store(pipeline_config.get('cache_dir'), pipeline_config.get('memory_entries', 64))
+
+
+class PipelineGraph:
+    """
+    Resolves artifacts on demand: requesting an artifact runs only the stages
+    it depends on, and each memoized stage is looked up in the store first,
+    keyed by its own params and the keys of the stages upstream of it.
+    """
+
+    def __init__(self, stages, ctx, store=None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.ctx = ctx
+        self.store = store if store is not None else ArtifactStore()
+        self.producers = {}
+        for stage in stages:
+            for output in stage.outputs:
+                if output in self.producers:
+                    raise ValueError(f"Artifact '{output}' is produced by both "
+                                     f"'{self.producers[output].name}' and '{stage.name}'")
+                self.producers[output] = stage
+        for stage in stages:
+            for name in stage.inputs:
+                if name not in self.producers:
+                    raise ValueError(f"Stage '{stage.name}' needs '{name}', which no stage produces")
+        self._keys = {}
+        self._results = {}      # stage name -> outputs, for this graph's lifetime
+        self.executed = []      # stage names actually run (cache misses), in order
+
+    def key(self, stage_name, _resolving=()):
+        """Cache key of a stage: its name and outputs, its params, and the keys of every upstream stage."""
+        if stage_name not in self._keys:
+            if stage_name in _resolving:
+                raise ValueError(f"Cycle in pipeline graph at stage '{stage_name}'")
+            stage = self.stages[stage_name]
+            h = hashlib.sha1(stage.name.encode())
+            h.update(",".join(stage.outputs).encode())
+            h.update(config_fingerprint(stage.params(self.ctx)).encode())
+            for upstream in sorted({self.producers[name].name for name in stage.inputs}):
+                h.update(self.key(upstream, _resolving + (stage_name,)).encode())
+            self._keys[stage_name] = h.hexdigest()
+        return self._keys[stage_name]
+
+    def _run(self, stage_name, resolving=()):
+        if stage_name in self._results:
+            return self._results[stage_name]
+        if stage_name in resolving:
+            raise ValueError(f"Cycle in pipeline graph at stage '{stage_name}'")
+        stage = self.stages[stage_name]
+        key = self.key(stage_name) if stage.memoize else None
+        outputs = self.store.get(key) if key else None
+        if outputs is None:
+            # Inputs are resolved before the span opens so upstream stages are not counted twice
+            inputs = {name: self.get(name, _resolving=resolving + (stage_name,)) for name in stage.inputs}
+            for name, columns in stage.columns.items():
+                inputs[name] = inputs[name][list(columns)]
+            logger.debug("Running stage %s", stage_name)
+            with span(stage_name, 'stage', rows_in=sum(count_rows(v) for v in inputs.values())) as stage_span:
+                outputs = stage.fn(self.ctx, **inputs)
+                missing = set(stage.outputs) - set(outputs)
+                if missing:
+                    raise ValueError(f"Stage '{stage_name}' did not produce {sorted(missing)}")
+                stage_span.rows_out = sum(count_rows(outputs[name]) for name in stage.outputs)
+            self.executed.append(stage_name)
+            if key:
+                self.store.put(key, outputs, persist=stage.persist)
+        else:
+            with span(stage_name, 'stage') as stage_span:
+                stage_span.cache_hit = True
+                stage_span.rows_out = sum(count_rows(outputs[name]) for name in stage.outputs)
+        self._results[stage_name] = outputs
+        return outputs
+
+    def get(self, name, _resolving=()):
+        """A single artifact by name."""
+        if name not in self.producers:
+            raise KeyError(f"No stage produces artifact '{name}'")
+        return self._run(self.producers[name].name, _resolving)[name]
+
+    def get_many(self, *names):
+        """Several artifacts at once, as a dict."""
+        return {name: self.get(name) for name in names}
@@ -1,65 +1,313 @@
+import os
+from contextlib import contextmanager
 import pandas as pd
 from src.preprocessing.loader import load_all_data
 from src.preprocessing.features import preprocess_pipeline
+from src.preprocessing.message_store import split_text
+from src.preprocessing.partitions import partition_store_from_config
 from src.analysis.scoring import compute_relationship_scores
 from src.analysis.patterns import detect_trends
+from src.analysis.features_advanced import extract_advanced_features, add_keyword_flags, KEYWORD_FLAG_COLUMNS
+from src.analysis.anomalies import detect_all_anomalies
+from src.analysis.sketches import ResponseTimeSketches, sketches_from_config
+from src.decision_engine.classify_contact import classifier_from_config, feature_matrix
 from src.decision_engine.engine import run_decision_engine
+from src.automation.templates import render_all
 from src.automation.notifier import print_scores, print_trends, print_actions, print_feedback_summary
+from src.graph import Stage, PipelineGraph, ArtifactStore, artifact_store_from_config
 from src.state.tracker import StateTracker
 from src.state.feedback import simulate_feedback_loop
-from src.utils.config import load_config
-from src.utils.logger import setup_logger
+from src.state.service import StateService, state_service_from_config
+from src.utils.config import load_config, get_user_name
+from src.utils.fingerprint import data_fingerprint
+from src.utils.logger import setup_logger, configure_logging_from_config
+from src.utils.profiling import Profiler, span
 
 logger = setup_logger(__name__)
 
-def run_pipeline(config_path="config/config.yaml"):
+class PipelineContext:
+    """What the stages read besides their input artifacts."""
+
+    def __init__(self, config, user_name, raw_data_path, state_file=None, tracker=None, as_of=None):
+        self.config = config
+        self.user_name = user_name
+        self.raw_data_path = raw_data_path
+        self.state_file = state_file
+        self._tracker = tracker
+        # An explicit as_of evaluates the pipeline at that moment: messages
+        # after it are ignored. Otherwise every stage sees all data, as of now.
+        self.point_in_time = as_of is not None
+        self.as_of = pd.Timestamp(as_of) if as_of is not None else pd.Timestamp.now()
+
+    @property
+    def state(self):
+        """
+        Where feedback is written: the tracker passed in, or else the shared
+        StateService for the state file, which applies writes under the
+        state file's lock so other processes' feedback is never lost.
+        """
+        # Only the decide stage needs state, so entry points that just want
+        # scores or trends never open the state file
+        if self._tracker is None:
+            self._tracker = state_service_from_config(self.config, self.state_file)
+            self._tracker.refresh()
+        return self._tracker
+
+    @property
+    def tracker(self):
+        state = self.state
+        return state.tracker if isinstance(state, StateService) else state
+
+    def flush_state(self):
+        # A StateService has written everything by the time its calls return
+        if not isinstance(self.state, StateService):
+            self.state.flush()
+
+    @contextmanager
+    def reading_state(self):
+        """The tracker, with no StateService flush reloading it meanwhile."""
+        state = self.state
+        if isinstance(state, StateService):
+            with state.reading() as tracker:
+                yield tracker
+        else:
+            yield state
+
+def tracker_from_config(config, state_file=None):
+    state_config = config.get('state', {})
+    return StateTracker(state_file=state_file or state_config.get('state_file', "output/actions_log.json"),
+                        fsync_every=state_config.get('fsync_every', 32),
+                        compact_every=state_config.get('compact_every', 500),
+                        backend=state_config.get('backend', 'json'),
+                        sqlite_file=state_config.get('sqlite_file'))
+
+# ---- Stages ----
+
+def _load(ctx):
+    data_config = ctx.config.get('data', {})
+    return {'raw_df': load_all_data(ctx.raw_data_path, deduplicate=data_config.get('deduplicate', True),
+                                    dedup_index=data_config.get('dedup_index'))}
+
+def _preprocess(ctx, raw_df):
+    # Text goes to a side store; downstream stages pass around the numeric frame,
+    # with the keyword flags the features stage counts
+    df = add_keyword_flags(preprocess_pipeline(raw_df, user_name=ctx.user_name, config=ctx.config))
+    df, message_store = split_text(df)
+    return {'preprocessed_df': df, 'message_store': message_store}
+
+def _window(ctx, preprocessed_df):
+    if not ctx.point_in_time:
+        return {'df': preprocessed_df}
+    return {'df': truncate_to(preprocessed_df, ctx.as_of)}
+
+def _partitions(ctx, df):
+    # Live runs keep the on-disk partitions in step with the log. They hold the
+    # latest messages, so a past as_of leaves them alone and runs without them.
+    store = partition_store_from_config(ctx.config)
+    if store is None or ctx.point_in_time:
+        return {'partition_store': None}
+    store.write(df, settings={'user': ctx.user_name, 'sentiment': ctx.config.get('sentiment')})
+    return {'partition_store': store}
+
+def truncate_to(df, as_of):
+    """
+    The preprocessed messages as they were known at as_of: later messages are
+    dropped, and response times whose reply only arrives after as_of become
+    NaN. Same result as preprocessing the truncated log, without redoing it.
+    """
+    df = df[df['timestamp'] <= as_of].copy()
+    replied_at = df['timestamp'] + pd.to_timedelta(df['response_time_seconds'], unit='s')
+    df.loc[replied_at > as_of, 'response_time_seconds'] = float('nan')
+    return df
+
+def _score(ctx, df):
+    return {'scores_df': compute_relationship_scores(df, user_name=ctx.user_name, weights=ctx.config['weights'],
+                                                     as_of=ctx.as_of)}
+
+def _trends(ctx, scores_df):
+    return {'trends': detect_trends(scores_df)}
+
+def _features(ctx, df):
+    return {'advanced_features': extract_advanced_features(df, user_name=ctx.user_name)}
+
+def _classify(ctx, df, advanced_features):
+    matrix = feature_matrix(advanced_features, df['contact'].unique())
+    return {'contact_types': classifier_from_config(ctx.config).classify(matrix)}
+
+def _sketches(ctx, df):
+    # Live runs fold new replies into the persisted digests; a past as_of gets fresh ones
+    if ctx.point_in_time:
+        sketches = ResponseTimeSketches(compression=ctx.config.get('sketches', {}).get('compression', 100))
+    else:
+        sketches = sketches_from_config(ctx.config)
+    sketches.update(df, ctx.as_of)
+    sketches.save()
+    return {'response_sketches': sketches}
+
+def _anomalies(ctx, df, message_store, response_sketches, partition_store):
+    # Inactivity, sentiment drop and one-sidedness come from each contact's latest partitions
+    contact_anomalies = detect_all_anomalies(df, ctx.config, user_name=ctx.user_name, current_date=ctx.as_of,
+                                             sketches=response_sketches, partition_store=partition_store)
+    # Only the flagged messages' text is fetched, for the rules to quote
+    return {'contact_anomalies': message_store.materialize_anomalies(contact_anomalies)}
+
+def _decide(ctx, df, scores_df, advanced_features, contact_types, contact_anomalies):
+    with ctx.reading_state() as tracker:
+        return {'actions': run_decision_engine(df, scores_df, ctx.config, tracker,
+                                               advanced_features=advanced_features,
+                                               contact_types=contact_types,
+                                               contact_anomalies=contact_anomalies,
+                                               as_of=ctx.as_of)}
+
+def _render(ctx, actions):
+    # Render each message once; every output channel reuses action['message']
+    return {'messages': render_all(actions)}
+
+# Columns each stage reads from the (text-free) message frame
+SCORE_COLUMNS = ['timestamp', 'sender', 'contact', 'sentiment', 'response_time_seconds']
+FEATURE_COLUMNS = ['timestamp', 'sender', 'contact', 'sentiment', 'has_commitment'] + KEYWORD_FLAG_COLUMNS
+ANOMALY_COLUMNS = SCORE_COLUMNS + ['msg_id', 'is_question', 'has_commitment']
+# What detect_recent_anomalies reads: values a later message never changes
+PARTITION_COLUMNS = ['timestamp', 'sender', 'contact', 'sentiment']
+
+PIPELINE_STAGES = [
+    Stage('load', _load, outputs=['raw_df'], persist=True,
+          params=lambda ctx: {'path': os.path.abspath(ctx.raw_data_path),
+                              'data': data_fingerprint(ctx.raw_data_path),
+                              'deduplicate': ctx.config.get('data', {}).get('deduplicate', True)}),
+    Stage('preprocess', _preprocess, inputs=['raw_df'], outputs=['preprocessed_df', 'message_store'], persist=True,
+          params=lambda ctx: {'user': ctx.user_name, 'nlp': ctx.config.get('nlp'),
+                              'sentiment': ctx.config.get('sentiment'), 'flags': KEYWORD_FLAG_COLUMNS}),
+    Stage('window', _window, inputs=['preprocessed_df'], outputs=['df'],
+          params=lambda ctx: {'as_of': ctx.as_of if ctx.point_in_time else None}),
+    Stage('partitions', _partitions, inputs=['df'], outputs=['partition_store'], columns={'df': PARTITION_COLUMNS},
+          params=lambda ctx: {'partitions': ctx.config.get('partitions'),
+                              'as_of': ctx.as_of if ctx.point_in_time else None}),
+    # Streaks count back from as_of's date
+    Stage('score', _score, inputs=['df'], outputs=['scores_df'], persist=True, columns={'df': SCORE_COLUMNS},
+          params=lambda ctx: {'user': ctx.user_name, 'weights': ctx.config['weights'],
+                              'as_of': ctx.as_of.normalize()}),
+    Stage('trends', _trends, inputs=['scores_df'], outputs=['trends']),
+    Stage('features', _features, inputs=['df'], outputs=['advanced_features'], persist=True,
+          columns={'df': FEATURE_COLUMNS},
+          params=lambda ctx: {'user': ctx.user_name}),
+    Stage('classify', _classify, inputs=['df', 'advanced_features'], outputs=['contact_types'],
+          columns={'df': ['contact']}, params=lambda ctx: {'contacts': ctx.config.get('contacts')}),
+    Stage('sketches', _sketches, inputs=['df'], outputs=['response_sketches'],
+          columns={'df': ['timestamp', 'contact', 'response_time_seconds']},
+          params=lambda ctx: {'sketches': ctx.config.get('sketches'),
+                              'as_of': ctx.as_of if ctx.point_in_time else ctx.as_of.floor('h')}),
+    # Inactivity depends on the current time; results are reused within the same hour
+    # (an explicit as_of is keyed exactly)
+    Stage('anomalies', _anomalies, inputs=['df', 'message_store', 'response_sketches', 'partition_store'],
+          outputs=['contact_anomalies'],
+          persist=True,
+          columns={'df': ANOMALY_COLUMNS},
+          params=lambda ctx: {'user': ctx.user_name, 'thresholds': ctx.config['thresholds'],
+                              'nlp': ctx.config.get('nlp'),
+                              'as_of': ctx.as_of if ctx.point_in_time else ctx.as_of.floor('h')}),
+    # Decisions read feedback state and bandit statistics, which change between runs
+    Stage('decide', _decide, inputs=['df', 'scores_df', 'advanced_features', 'contact_types', 'contact_anomalies'],
+          outputs=['actions'], memoize=False, columns={'df': ANOMALY_COLUMNS}),
+    Stage('render', _render, inputs=['actions'], outputs=['messages'], memoize=False),
+]
+
+def build_pipeline_graph(config_path="config/config.yaml", user_name=None, raw_data_path=None,
+                         state_file=None, tracker=None, config=None, use_cache=True, as_of=None):
+    """
+    A PipelineGraph over PIPELINE_STAGES for one user. Entry points call
+    graph.get(...) for just the artifacts they need; stage outputs are shared
+    through the per-process artifact store (and its cache_dir, if configured).
+    use_cache=False runs every stage on a private, empty store.
+    as_of evaluates the pipeline at a past moment (a Timestamp or date string).
+    """
+    if config is None:
+        config = load_config(config_path)
+    user_name = user_name or get_user_name(config)
+    config.setdefault('user', {})['name'] = user_name
+    raw_data_path = raw_data_path or config['data']['raw_data_path']
+    ctx = PipelineContext(config, user_name, raw_data_path, state_file=state_file, tracker=tracker, as_of=as_of)
+    store = artifact_store_from_config(config) if use_cache else ArtifactStore()
+    return PipelineGraph(PIPELINE_STAGES, ctx, store)
+
+def run_pipeline(config_path="config/config.yaml", user_name=None, raw_data_path=None,
+                 state_file=None, verbose=True, simulate_feedback=True, profiler=None, use_cache=True, as_of=None):
+    """
+    Run the full pipeline for one user.
+    user_name, raw_data_path and state_file override the values from the config,
+    which lets the batch runner point each tenant at its own data and state.
+    Returns (df, scores_df, actions, tracker), or None when no data was loaded.
+    """
+    artifacts = run_pipeline_with_artifacts(config_path, user_name=user_name, raw_data_path=raw_data_path,
+                                            state_file=state_file, verbose=verbose,
+                                            simulate_feedback=simulate_feedback, profiler=profiler,
+                                            use_cache=use_cache, as_of=as_of)
+    if artifacts is None:
+        return
+    return artifacts['df'], artifacts['scores_df'], artifacts['actions'], artifacts['tracker']
+
+def run_pipeline_with_artifacts(config_path="config/config.yaml", user_name=None, raw_data_path=None,
+                                state_file=None, verbose=True, simulate_feedback=True, profiler=None, use_cache=True,
+                                as_of=None):
+    """
+    Same as run_pipeline, but returns every intermediate artifact in a dict:
+    df, scores_df, trends, advanced_features, contact_types, contact_anomalies,
+    actions, tracker and config. Front-ends reuse these instead of recomputing.
+    profiler: a Profiler to record the run with; by default one is built from
+    the config's profiling section (None when profiling is disabled).
+    use_cache=False ignores memoized stage artifacts and recomputes everything.
+    as_of: evaluate every stage at this moment instead of now, using only the
+    messages sent up to it.
+    """
     logger.info("Starting relationship automation pipeline.")
-    config = load_config(config_path)
+    graph = build_pipeline_graph(config_path, user_name=user_name, raw_data_path=raw_data_path,
+                                 state_file=state_file, use_cache=use_cache, as_of=as_of)
+    configure_logging_from_config(graph.ctx.config)
+    if profiler is None:
+        profiler = Profiler.from_config(graph.ctx.config)
+    if profiler is None:
+        return _run_graph(graph, verbose, simulate_feedback)
+    with profiler.activate():
+        artifacts = _run_graph(graph, verbose, simulate_feedback)
+    json_path, prom_path = profiler.write_reports()
+    logger.info(f"Profiling report written to {json_path} and {prom_path}")
+    return artifacts
 
-    df = load_all_data(config['data']['raw_data_path'])
-    if df.empty:
+def _run_graph(graph, verbose, simulate_feedback):
+    config = graph.ctx.config
+    if graph.get('raw_df').empty:
         logger.error("No data loaded. Exiting.")
         return
+    if graph.get('df').empty:
+        logger.error("No messages on or before %s. Exiting.", graph.ctx.as_of)
+        return
 
-    df = preprocess_pipeline(df, user_name="Rahul", config=config)
-    scores_df = compute_relationship_scores(df, user_name="Rahul", weights=config['weights'])
-    trends = detect_trends(scores_df)
+    artifacts = graph.get_many('df', 'scores_df', 'trends', 'advanced_features', 'contact_types',
+                               'contact_anomalies', 'response_sketches', 'partition_store')
 
     # ---- Print analysis results ----
-    print_scores(scores_df)
-    print_trends(trends)
-
-    # ---- Advanced features and classification ----
-    from src.analysis.features_advanced import extract_advanced_features
-    from src.decision_engine.classify_contact import classify_contact
-
-    advanced_features = extract_advanced_features(df, user_name="Rahul")
-    contact_types = {}
-    for contact in df['contact'].unique():
-        contact_df = df[df['contact'] == contact]
-        contact_types[contact] = classify_contact(contact, contact_df, advanced_features.get(contact, {}))
-
-    # ---- Anomaly collection for display ----
-    from src.analysis.anomalies import detect_response_time_anomalies, detect_inactivity_periods
-    contact_anomalies = {}
-    for contact in df['contact'].unique():
-        contact_df = df[df['contact'] == contact]
-        resp_anom = detect_response_time_anomalies(df, contact, config['thresholds']['max_response_time_std_multiplier'])
-        inact = detect_inactivity_periods(df, contact, config['thresholds']['inactivity_days'], pd.Timestamp.now())
-        contact_anomalies[contact] = {
-            'response_time_anomalies': resp_anom,
-            'inactivity': inact
-        }
-
-    tracker = StateTracker(state_file="output/actions_log.json")
-    actions = run_decision_engine(df, scores_df, config, tracker,
-                                  advanced_features=advanced_features,
-                                  contact_types=contact_types)
-    print_actions(actions, contact_anomalies)
-
-    if actions:
-        simulate_feedback_loop(tracker, actions)
-        print_feedback_summary(tracker)
-
-    logger.info("Pipeline finished.")
-    return df, scores_df, actions, tracker
\ No newline at end of file
+    if verbose:
+        print_scores(artifacts['scores_df'])
+        print_trends(artifacts['trends'])
+
+    actions = graph.get('actions')
+    graph.get('messages')
+    if verbose:
+        print_actions(actions, artifacts['contact_anomalies'])
+
+    if actions and simulate_feedback:
+        sim_config = config.get('simulation', {})
+        with span('feedback', 'stage', rows_in=len(actions)):
+            simulate_feedback_loop(graph.ctx.state, actions,
+                                   accept_prob=sim_config.get('accept_prob', 0.3),
+                                   seed=sim_config.get('seed'),
+                                   verbose=verbose)
+        if verbose:
+            with graph.ctx.reading_state() as tracker:
+                print_feedback_summary(tracker)
+
+    with span('state_flush', 'stage'):
+        graph.ctx.flush_state()
+    logger.info(f"Pipeline finished (stages run: {', '.join(graph.executed) or 'none'}).")
+    artifacts.update(config=config, actions=actions, tracker=graph.ctx.tracker)
+    return artifacts
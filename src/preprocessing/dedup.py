@@ -0,0 +1,119 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from src.utils.fingerprint import files_fingerprint
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+def normalize_messages(messages):
+    """Lowercase, trim and collapse whitespace, so re-exports that reflow text still match."""
+    return messages.fillna('').astype(str).str.lower().str.strip().str.replace(r'\s+', ' ', regex=True)
+
+def message_keys(df):
+    """
+    Stable 64-bit key per message: a hash of (timestamp, sender, receiver,
+    normalized message) combined with its occurrence number among identical
+    messages in the same frame. Two "ok"s sent in the same minute stay two
+    messages; an export that repeats both of them adds nothing.
+    """
+    if df.empty:
+        return np.array([], dtype=np.uint64)
+    key_df = pd.DataFrame({
+        'timestamp': df['timestamp'].to_numpy(dtype='datetime64[ns]').view('i8'),
+        'sender': df['sender'].astype(str).str.strip().to_numpy(),
+        'receiver': df['receiver'].astype(str).str.strip().to_numpy(),
+        'message': normalize_messages(df['message']).to_numpy(),
+    })
+    hashes = pd.util.hash_pandas_object(key_df, index=False)
+    occurrence = hashes.groupby(hashes.to_numpy()).cumcount()
+    return pd.util.hash_pandas_object(pd.DataFrame({'hash': hashes.to_numpy(), 'occurrence': occurrence.to_numpy()}),
+                                      index=False).to_numpy()
+
+class SeenHashes:
+    """
+    Message keys and parsed messages per raw file, persisted between runs. A
+    file whose (size, mtime) fingerprint is unchanged reuses its stored
+    messages and keys instead of being parsed and hashed again; files that
+    disappeared are forgotten on save. It is only a cache: a lost or stale
+    index costs a reparse, never a wrong result.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.files = {}             # file path -> (fingerprint, keys, messages)
+        self._dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    files = pickle.load(f)
+                if not isinstance(files, dict):
+                    raise TypeError(f"expected a dict, found {type(files).__name__}")
+                self.files = files
+            except Exception as e:
+                logger.warning("Ignoring unreadable dedup index %s: %s", path, e)
+
+    def frame(self, file_path):
+        """The file's parsed messages from the last run, or None if the file changed since."""
+        cached = self.files.get(file_path)
+        # Indexes written before messages were cached hold (fingerprint, keys)
+        if cached is None or len(cached) < 3 or cached[0] != files_fingerprint([file_path]):
+            return None
+        return cached[2]
+
+    def keys(self, file_path, df):
+        fingerprint = files_fingerprint([file_path])
+        cached = self.files.get(file_path)
+        if cached is not None and cached[0] == fingerprint and len(cached[1]) == len(df):
+            if len(cached) < 3:
+                self.files[file_path] = (fingerprint, cached[1], df)
+                self._dirty = True
+            return cached[1]
+        keys = message_keys(df)
+        self.files[file_path] = (fingerprint, keys, df)
+        self._dirty = True
+        return keys
+
+    def save(self, present=None):
+        """Write the index; present (file paths) forgets the other files of the same directories."""
+        if present is not None:
+            directories = {os.path.dirname(p) for p in present}
+            for file_path in set(self.files) - set(present):
+                if os.path.dirname(file_path) in directories:
+                    del self.files[file_path]
+                    self._dirty = True
+        if not self.path or not self._dirty:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self.files, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+def drop_cross_file_duplicates(frames, seen=None):
+    """
+    frames: [(file path, messages)] in load order. Drops every message whose
+    key already appeared in an earlier file; the first file to contain a
+    message keeps it. Returns (kept frames, {file name: duplicates dropped}).
+    """
+    seen = seen if seen is not None else SeenHashes()
+    earlier = np.array([], dtype=np.uint64)
+    kept, report = [], {}
+    for file_path, df in frames:
+        keys = seen.keys(file_path, df)
+        duplicate = np.isin(keys, earlier)
+        dropped = int(duplicate.sum())
+        if dropped:
+            report[os.path.basename(file_path)] = dropped
+            df = df[~duplicate]
+        earlier = np.union1d(earlier, keys)
+        kept.append((file_path, df))
+    return kept, report
+
+def log_duplicate_report(report):
+    for file_name, dropped in report.items():
+        logger.info("Dropped %d duplicate messages from %s (already in an earlier file).", dropped, file_name)
+    if report:
+        logger.info("Deduplication dropped %d messages across %d files.", sum(report.values()), len(report))
@@ -2,11 +2,12 @@ import pandas as pd
 import numpy as np
 from src.preprocessing.sentiment import get_sentiment
 from src.preprocessing.nlp_utils import extract_commitments, detect_important_mentions
+from src.utils.config import DEFAULT_USER_NAME
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
-def compute_response_times(df, user_name="Rahul"):
+def compute_response_times(df, user_name=DEFAULT_USER_NAME):
     df = df.copy()
     df['response_time_seconds'] = np.nan
     df['contact'] = df.apply(lambda row: row['sender'] if row['receiver'] == user_name else row['receiver'], axis=1)
@@ -51,7 +52,7 @@ def add_commitments(df, keywords):
     df['important_mentions'] = df['message'].apply(detect_important_mentions)
     return df
 
-def preprocess_pipeline(df, user_name="Rahul", config=None):
+def preprocess_pipeline(df, user_name=DEFAULT_USER_NAME, config=None):
     logger.info("Starting preprocessing...")
     df = df.copy()
     df = compute_response_times(df, user_name)
@@ -1,6 +1,7 @@
 import pandas as pd
 import glob
 import os
+from src.preprocessing.dedup import SeenHashes, drop_cross_file_duplicates, log_duplicate_report
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -35,69 +36,94 @@ def parse_timestamp(ts_str):
     except:
         return pd.NaT
 
-def load_all_data(raw_data_path):
-    all_files = glob.glob(os.path.join(raw_data_path, "*.csv"))
-    if not all_files:
-        logger.error(f"No CSV files found in {raw_data_path}")
+def load_file(file_path):
+    """Messages from one CSV chat log, with parsed timestamps (empty DataFrame if none)."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+
+    if not lines:
+        logger.warning("File %s is empty. Skipping.", file_path)
         return pd.DataFrame()
 
-    df_list = []
-    for file_path in all_files:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
+    # Check if first line is a valid header
+    first_line = lines[0].strip()
+    parts = first_line.split(',')
+    if len(parts) == 5 and all(p in EXPECTED_HEADER for p in parts):
+        header = parts
+        data_start = 1
+    else:
+        # No valid header found; assume file is data-only
+        logger.info("File %s has no header. Using default header.", file_path)
+        header = EXPECTED_HEADER
+        data_start = 0
 
-        if not lines:
-            logger.warning(f"File {file_path} is empty. Skipping.")
+    data = []
+    for line_num, line in enumerate(lines[data_start:], start=data_start+1):
+        line = line.strip()
+        if not line:
             continue
-
-        # Check if first line is a valid header
-        first_line = lines[0].strip()
-        parts = first_line.split(',')
-        if len(parts) == 5 and all(p in EXPECTED_HEADER for p in parts):
-            header = parts
-            data_start = 1
+        parts = line.split(',')
+        if len(parts) == 5:
+            data.append(parts)
         else:
-            # No valid header found; assume file is data-only
-            logger.info(f"File {file_path} has no header. Using default header.")
-            header = EXPECTED_HEADER
-            data_start = 0
+            # Message contains commas – combine extra parts
+            timestamp = parts[0]
+            sender = parts[1]
+            receiver = parts[2]
+            platform = parts[3]
+            message = ','.join(parts[4:])
+            data.append([timestamp, sender, receiver, platform, message])
 
-        data = []
-        for line_num, line in enumerate(lines[data_start:], start=data_start+1):
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split(',')
-            if len(parts) == 5:
-                data.append(parts)
-            else:
-                # Message contains commas – combine extra parts
-                timestamp = parts[0]
-                sender = parts[1]
-                receiver = parts[2]
-                platform = parts[3]
-                message = ','.join(parts[4:])
-                data.append([timestamp, sender, receiver, platform, message])
+    df = pd.DataFrame(data, columns=header)
 
-        df = pd.DataFrame(data, columns=header)
+    # Parse timestamps per file
+    df['timestamp'] = df['timestamp'].apply(parse_timestamp)
+    # Drop rows where timestamp could not be parsed
+    initial_len = len(df)
+    df = df.dropna(subset=['timestamp'])
+    if len(df) < initial_len:
+        logger.warning("Dropped %d rows in %s due to unparseable timestamps.", initial_len - len(df), os.path.basename(file_path))
+    if not df.empty:
+        logger.info("Loaded %d messages from %s", len(df), os.path.basename(file_path))
+    return df
 
-        # Parse timestamps per file
-        df['timestamp'] = df['timestamp'].apply(parse_timestamp)
-        # Drop rows where timestamp could not be parsed
-        initial_len = len(df)
-        df = df.dropna(subset=['timestamp'])
-        if len(df) < initial_len:
-            logger.warning(f"Dropped {initial_len - len(df)} rows in {os.path.basename(file_path)} due to unparseable timestamps.")
+def load_all_data(raw_data_path, deduplicate=True, dedup_index=None):
+    """
+    Every CSV in raw_data_path, sorted by timestamp. With deduplicate, a
+    message already present in an earlier file (overlapping re-exports) is
+    dropped; dedup_index persists each file's parsed messages and keys
+    between runs, so only new or modified files are parsed again.
+    The per-file duplicate counts are in combined.attrs['duplicates_dropped'].
+    """
+    # Sorted files and a stable sort keep same-minute messages in file order on every run
+    all_files = sorted(glob.glob(os.path.join(raw_data_path, "*.csv")))
+    if not all_files:
+        logger.error(f"No CSV files found in {raw_data_path}")
+        return pd.DataFrame()
 
+    seen = SeenHashes(dedup_index) if deduplicate else None
+    frames = []
+    for file_path in all_files:
+        df = seen.frame(file_path) if seen is not None else None
+        if df is None:
+            df = load_file(file_path)
+        else:
+            logger.debug("Reused %d parsed messages from %s", len(df), os.path.basename(file_path))
         if not df.empty:
-            df_list.append(df)
-            logger.info(f"Loaded {len(df)} messages from {os.path.basename(file_path)}")
+            frames.append((file_path, df))
 
-    if not df_list:
+    if not frames:
         logger.error("No valid data loaded.")
         return pd.DataFrame()
 
-    combined = pd.concat(df_list, ignore_index=True)
-    combined.sort_values('timestamp', inplace=True)
+    report = {}
+    if deduplicate:
+        frames, report = drop_cross_file_duplicates(frames, seen)
+        seen.save(present=all_files)
+        log_duplicate_report(report)
+
+    combined = pd.concat([df for _, df in frames], ignore_index=True)
+    combined.sort_values('timestamp', inplace=True, kind='stable')
+    combined.attrs['duplicates_dropped'] = report
     logger.info(f"Total: {len(combined)} messages from {len(all_files)} files.")
-    return combined
\ No newline at end of file
+    return combined
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Per-message text and Python lists: most of a preprocessed frame's memory
+TEXT_COLUMNS = ['message', 'commitments', 'important_mentions']
+
+def question_mask(df):
+    """Messages containing a '?': the is_question flag once the text has been split off."""
+    if 'is_question' in df:
+        return df['is_question']
+    return df['message'].apply(lambda m: '?' in m)
+
+def commitment_mask(df):
+    """Messages with at least one commitment keyword: the has_commitment flag once the text has been split off."""
+    if 'has_commitment' in df:
+        return df['has_commitment']
+    return df['commitments'].apply(len) > 0
+
+
+class MessageStore:
+    """
+    The text columns of a preprocessed frame, by msg_id (its row position at
+    split time). Stages pass around the numeric frame and fetch text only for
+    the rows they report on, e.g. the question an unanswered-question action
+    quotes.
+    """
+
+    def __init__(self, text_df):
+        self.text = text_df.reset_index(drop=True)
+
+    def __len__(self):
+        return len(self.text)
+
+    def get(self, msg_ids, columns=TEXT_COLUMNS):
+        """Text columns for these msg_ids, in their order."""
+        return self.text[list(columns)].take(np.asarray(msg_ids, dtype=np.int64))
+
+    def attach(self, df, columns=TEXT_COLUMNS):
+        """df with the text columns joined back on by msg_id."""
+        text = self.get(df['msg_id'], columns)
+        text.index = df.index
+        return pd.concat([df, text], axis=1)
+
+    def materialize(self, rows):
+        """Message rows (dicts or Series carrying msg_id) as dicts with their text filled in."""
+        rows = [dict(row) for row in rows]
+        if not rows:
+            return rows
+        text = self.get([row['msg_id'] for row in rows], ['message', 'commitments'])
+        for row, message, commitments in zip(rows, text['message'], text['commitments']):
+            row['message'] = message
+            row['commitments'] = commitments
+        return rows
+
+    def materialize_anomalies(self, contact_anomalies):
+        """Fill in the text of every message row detect_all_anomalies reported."""
+        for anomalies in contact_anomalies.values():
+            for key in ('response_time_anomalies', 'unanswered_questions', 'missed_commitments'):
+                anomalies[key] = self.materialize(anomalies[key])
+        return contact_anomalies
+
+
+def split_text(df):
+    """
+    (frame, store): df without its text columns but with a msg_id and the
+    is_question / has_commitment flags the detectors need, and a
+    MessageStore holding the text.
+    """
+    df = df.reset_index(drop=True)
+    text_columns = [c for c in TEXT_COLUMNS if c in df]
+    frame = df.drop(columns=text_columns)
+    frame['msg_id'] = np.arange(len(df), dtype=np.int64)
+    frame['is_question'] = question_mask(df).to_numpy(dtype=bool)
+    frame['has_commitment'] = commitment_mask(df).to_numpy(dtype=bool)
+    return frame, MessageStore(df[text_columns])
@@ -0,0 +1,185 @@
+import json
+import os
+import pickle
+import re
+import zlib
+import pandas as pd
+from src.state.journal import write_json_atomic
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+
+
+def partition_file(contact, month):
+    """month/contact-slug-crc.pkl: readable, and unique however the name is spelled."""
+    slug = re.sub(r'[^A-Za-z0-9]+', '_', contact).strip('_')[:40] or 'contact'
+    return os.path.join(month, f"{slug}-{zlib.crc32(contact.encode('utf-8')):08x}.pkl")
+
+def _fingerprint(part):
+    return f"{len(part)}:{int(pd.util.hash_pandas_object(part, index=False).sum()):016x}"
+
+def _month_starts(df, months):
+    """Per row of df, the start of its contact's month in months (NaT for contacts not in it)."""
+    return pd.to_datetime(df['contact'].map({contact: pd.Period(month).start_time
+                                             for contact, month in months.items()}))
+
+
+class PartitionedMessageStore:
+    """
+    Preprocessed messages on disk, one pickle per (month, contact), with a
+    manifest holding each partition's row count and min/max timestamp.
+
+    Queries (last_n, since, last_timestamp) consult the manifest first and
+    read only the partitions that can hold the answer, so their I/O follows
+    the recent activity of one contact rather than the size of the log.
+    `partitions_read` counts the partition files loaded.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.partitions = {}        # relative file -> {'contact', 'month', 'rows', 'min_ts', 'max_ts', 'fingerprint'}
+        self.settings = None        # what the stored rows were derived with, as passed to write()
+        self.partitions_read = 0
+        manifest_path = os.path.join(root, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path) as f:
+                    manifest = json.load(f)
+                self.partitions = manifest['partitions']
+                self.settings = manifest.get('settings')
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable partition manifest {manifest_path}: {e}")
+        self._index()
+
+    def _index(self):
+        # contact -> its partition files, oldest month first
+        self._by_contact = {}
+        for file, meta in sorted(self.partitions.items(), key=lambda item: item[1]['month']):
+            self._by_contact.setdefault(meta['contact'], []).append(file)
+
+    def _settled(self, df):
+        """
+        contact -> the month before which its stored partitions are taken as
+        final: the month of its newest stored message, provided df still has
+        as many of its rows before that month as the manifest records.
+        """
+        last_months = {contact: str(pd.Timestamp(max(self.partitions[file]['max_ts'] for file in files)).to_period('M'))
+                       for contact, files in self._by_contact.items()}
+        if not last_months:
+            return {}
+        counts = df.loc[df['timestamp'] < _month_starts(df, last_months), 'contact'].value_counts()
+        settled = {}
+        for contact, month in last_months.items():
+            stored = sum(self.partitions[file]['rows'] for file in self._by_contact[contact]
+                         if self.partitions[file]['month'] < month)
+            if counts.get(contact, 0) == stored:
+                settled[contact] = month
+        return settled
+
+    def write(self, df, settings=None):
+        """
+        Store df (preprocessed messages, with whichever columns the caller
+        projected), rewriting only the partitions whose content changed and
+        removing those that no longer exist. Returns the number of partition
+        files written.
+
+        Partitions from before the month of each contact's newest stored
+        message are kept without looking at them again (see _settled); only
+        the rows from that month on are grouped and fingerprinted, so a run
+        that appends new messages hashes the latest months, not the log.
+        That holds as long as a stored row never changes once later messages
+        exist, so the columns must not include response times (filled in by
+        later replies) or msg_id (a row position). settings (JSON) describes
+        how the rows were derived; when it differs from the stored one,
+        every partition is checked again.
+        """
+        same_settings = settings == self.settings
+        settled = self._settled(df) if same_settings else {}
+        self.settings = settings
+        current = {file for file, meta in self.partitions.items()
+                   if meta['month'] < settled.get(meta['contact'], '')}
+        if settled:
+            df = df[~(df['timestamp'] < _month_starts(df, settled))]
+        months = df['timestamp'].dt.strftime('%Y-%m')
+        written, kept = 0, len(current)
+        for (contact, month), part in df.groupby([df['contact'], months], sort=False):
+            file = partition_file(contact, month)
+            current.add(file)
+            part = part.sort_values('timestamp', kind='stable').reset_index(drop=True)
+            fingerprint = _fingerprint(part)
+            meta = self.partitions.get(file)
+            if meta is not None and meta['fingerprint'] == fingerprint and os.path.exists(os.path.join(self.root, file)):
+                continue
+            path = os.path.join(self.root, file)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp.{os.getpid()}"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(part, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+            timestamps = part['timestamp'].to_numpy(dtype='datetime64[ns]').view('i8')
+            self.partitions[file] = {'contact': contact, 'month': month, 'rows': len(part),
+                                     'min_ts': int(timestamps.min()), 'max_ts': int(timestamps.max()),
+                                     'fingerprint': fingerprint}
+            written += 1
+        removed = set(self.partitions) - current
+        for file in removed:
+            del self.partitions[file]
+            try:
+                os.remove(os.path.join(self.root, file))
+            except FileNotFoundError:
+                pass
+        if written or removed or not same_settings or not os.path.exists(os.path.join(self.root, MANIFEST_FILE)):
+            os.makedirs(self.root, exist_ok=True)
+            write_json_atomic(os.path.join(self.root, MANIFEST_FILE),
+                              {'partitions': self.partitions, 'settings': self.settings})
+        self._index()
+        logger.info(f"Message partitions: {written} written, {len(removed)} removed, "
+                    f"{len(current) - written - kept} unchanged, {kept} settled.")
+        return written
+
+    def _read(self, file, columns=None):
+        self.partitions_read += 1
+        with open(os.path.join(self.root, file), 'rb') as f:
+            part = pickle.load(f)
+        return part[list(columns)] if columns is not None else part
+
+    def contacts(self):
+        return sorted(self._by_contact)
+
+    def last_timestamp(self, contact):
+        """The contact's latest message time, from the manifest alone (None if unknown)."""
+        files = self._by_contact.get(contact)
+        if not files:
+            return None
+        return pd.Timestamp(max(self.partitions[file]['max_ts'] for file in files))
+
+    def last_n(self, contact, n, columns=None):
+        """The contact's n most recent messages, oldest first, reading back month by month."""
+        parts, rows = [], 0
+        for file in reversed(self._by_contact.get(contact, [])):
+            if rows >= n:
+                break
+            parts.append(self._read(file, columns))
+            rows += self.partitions[file]['rows']
+        if not parts:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(parts[::-1], ignore_index=True).iloc[-n:].reset_index(drop=True)
+
+    def since(self, contact, start, columns=None):
+        """The contact's messages at or after start, skipping partitions that end before it."""
+        start = pd.Timestamp(start)
+        files = [file for file in self._by_contact.get(contact, []) if self.partitions[file]['max_ts'] >= start.value]
+        if not files:
+            return pd.DataFrame(columns=columns)
+        df = pd.concat([self._read(file, columns if columns is None or 'timestamp' in columns
+                                   else list(columns) + ['timestamp']) for file in files], ignore_index=True)
+        df = df[df['timestamp'] >= start].reset_index(drop=True)
+        return df[list(columns)] if columns is not None else df
+
+
+def partition_store_from_config(config):
+    """The configured store, or None when partitions.dir is unset."""
+    root = config.get('partitions', {}).get('dir')
+    return PartitionedMessageStore(root) if root else None
@@ -0,0 +1,318 @@
+import glob
+import heapq
+import os
+import threading
+import numpy as np
+import pandas as pd
+from src.backtest import ContactHistory, DAY_NS, UNANSWERED_FOLLOWUP_DAYS
+from src.decision_engine.bandit import ContextualBandit
+from src.decision_engine.classify_contact import classifier_from_config, feature_matrix
+from src.decision_engine.engine import collect_candidates, choose_actions
+from src.decision_engine.prioritization import prioritize_contacts
+from src.preprocessing.features import preprocess_pipeline
+from src.preprocessing.dedup import SeenHashes, drop_cross_file_duplicates, log_duplicate_report
+from src.preprocessing.loader import load_file
+from src.state.tracker import StateTracker
+from src.utils.fingerprint import files_fingerprint
+from src.utils.logger import setup_logger
+from src.utils.profiling import span
+
+logger = setup_logger(__name__)
+
+NEVER = np.iinfo(np.int64).max
+
+
+def _signature(actions):
+    # Type and details, not the reason: "No messages for 9 days" is not news a day after "8 days"
+    return [(a['type'], tuple(a['details'])) for a in actions]
+
+def contact_of(raw_df, user_name):
+    """The other party of each raw message, as compute_response_times derives it."""
+    return pd.Series(np.where(raw_df['receiver'] == user_name, raw_df['sender'], raw_df['receiver']),
+                     index=raw_df.index)
+
+
+class ContactScheduler:
+    """
+    Re-evaluates the rules only for contacts whose signals can have changed.
+
+    Each contact's next due time sits in a min-heap. A contact is due when
+    - its inactivity gap crosses thresholds.inactivity_days (and then daily,
+      as the gap keeps growing),
+    - its reply streak would break (the second midnight after its last day),
+    - an open question reaches the 2-day window or an open commitment
+      reaches commitment_followup_days,
+    - a message already in its history becomes visible (replaying a log), or
+    - max_interval has passed since it was last evaluated.
+    Between those moments nothing the rules read changes, so a tick with no
+    due and no dirty contacts costs one heap peek. Contacts receiving new
+    messages (add_messages) or feedback (mark_dirty, subscribed to the
+    StateService by run_forever) are evaluated on the next tick.
+
+    run_pending returns the actions whose contact's candidates changed since
+    the contact was last evaluated, one per contact, picked by the bandit.
+    """
+
+    def __init__(self, config, user_name, state=None, max_interval=pd.Timedelta(hours=24)):
+        self.config = config
+        self.user_name = user_name
+        self.state = state if state is not None else StateTracker(backend='memory')
+        self.max_interval = max_interval
+        self.classifier = classifier_from_config(config)
+        self.raw = {}               # contact -> raw messages
+        self.histories = {}         # contact -> ContactHistory
+        self.dirty = set()
+        self._heap = []             # (due_ns, contact); stale entries are skipped
+        self._due = {}              # contact -> due_ns of its live heap entry
+        self.candidates = {}        # contact -> candidate actions at its last evaluation
+        self.actions = {}           # contact -> action selected at its last change
+        self.scores = {}            # contact -> latest weekly score at its last evaluation
+        self.evaluations = 0
+        self._lock = threading.Lock()
+
+    # ---- Input ----
+
+    def add_messages(self, raw_df, replace=False):
+        """
+        Raw messages (loader columns) for any contacts. Each affected contact
+        is re-preprocessed on its own and marked dirty. replace=True swaps
+        the contacts' messages for these instead of appending.
+        """
+        if raw_df.empty:
+            return set()
+        contacts = contact_of(raw_df, self.user_name)
+        changed = set()
+        with self._lock:
+            for contact, new_rows in raw_df.groupby(contacts):
+                old = self.raw.get(contact)
+                rows = new_rows if replace or old is None else pd.concat([old, new_rows], ignore_index=True)
+                self.raw[contact] = rows.sort_values('timestamp', kind='stable').reset_index(drop=True)
+                self._rebuild(contact)
+                changed.add(contact)
+        return changed
+
+    def _rebuild(self, contact):
+        df = preprocess_pipeline(self.raw[contact], user_name=self.user_name, config=self.config)
+        self.histories[contact] = ContactHistory(contact, df, self.user_name, self.config)
+        self.dirty.add(contact)
+
+    def remove_contact(self, contact):
+        with self._lock:
+            for registry in (self.raw, self.histories, self._due, self.candidates, self.actions, self.scores):
+                registry.pop(contact, None)
+            self.dirty.discard(contact)
+
+    def mark_dirty(self, contacts):
+        """Evaluate these contacts on the next tick, e.g. after feedback on their actions."""
+        with self._lock:
+            self.dirty.update(contact for contact in contacts if contact in self.histories)
+
+    # ---- Due times ----
+
+    def next_due(self, history, k, now):
+        """The next moment after now at which this contact's signals can change."""
+        now_ns = now.value
+        candidates = [now_ns + self.max_interval.value] if self.max_interval is not None else []
+        if k < history.n:
+            candidates.append(history.ts[k])           # a later message becomes visible
+        if k == 0:
+            return min(candidates, default=NEVER)
+        last = history.ts[k - 1]
+        # Inactivity: the gap in whole days exceeds the threshold, then grows every day
+        threshold_days = self.config['thresholds']['inactivity_days']
+        elapsed_days = (now_ns - last) // DAY_NS
+        candidates.append(last + max(threshold_days + 1, elapsed_days + 1) * DAY_NS)
+        # Streak breaks two calendar days after the last active day
+        streak_break = (history.unique_days[history.day_index[k - 1]] + 2) * DAY_NS
+        if streak_break > now_ns:
+            candidates.append(streak_break)
+        # Open questions and commitments reach the end of their reply window
+        for rows, window_ns in ((history.questions, UNANSWERED_FOLLOWUP_DAYS * DAY_NS),
+                                (history.commitment_rows, history.followup_ns)):
+            rows = rows[:np.searchsorted(rows, k)]
+            expiry = history.ts[rows] + window_ns
+            expiry = expiry[(expiry > now_ns) & (history.next_user[rows] > now_ns)]
+            if len(expiry):
+                candidates.append(int(expiry.min()))
+        return int(min(candidates))
+
+    def _schedule(self, contact, due_ns):
+        self._due[contact] = due_ns
+        heapq.heappush(self._heap, (due_ns, contact))
+
+    def next_wakeup(self):
+        """Earliest due time over all contacts (None if nothing is scheduled)."""
+        with self._lock:
+            while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            return pd.Timestamp(self._heap[0][0]) if self._heap else None
+
+    def _pop_due(self, now_ns):
+        due = set()
+        while self._heap and self._heap[0][0] <= now_ns:
+            due_ns, contact = heapq.heappop(self._heap)
+            if self._due.get(contact) == due_ns:
+                del self._due[contact]
+                due.add(contact)
+        return due
+
+    # ---- Evaluation ----
+
+    def run_pending(self, now=None):
+        """
+        Evaluate every dirty or due contact as of now and reschedule it.
+        Returns the newly selected actions (contacts whose candidates changed).
+        """
+        now = pd.Timestamp(now) if now is not None else pd.Timestamp.now()
+        with self._lock:
+            contacts = self._pop_due(now.value) | self.dirty
+            self.dirty = set()
+            if not contacts:
+                return []
+            with span('scheduler_tick', 'stage', rows_in=len(contacts)) as tick:
+                actions = self._evaluate(sorted(contacts), now)
+                tick.rows_out = len(actions)
+        return actions
+
+    def _evaluate(self, contacts, now):
+        weights = self.config['weights']
+        contacts_info, contact_anomalies, features = [], {}, {}
+        for contact in contacts:
+            history = self.histories.get(contact)
+            if history is None:
+                continue
+            k = history.cutoff(now.value)
+            self._schedule(contact, self.next_due(history, k, now))
+            if k == 0:
+                continue
+            info, contact_anomalies[contact], feat = history.signals(k, now, weights)
+            contacts_info.append(info)
+            self.scores[contact] = info['latest_score']
+            if feat:
+                features[contact] = feat
+        self.evaluations += len(contacts_info)
+        contact_types = self.classifier.classify(feature_matrix(features, [c['contact'] for c in contacts_info]))
+        prioritized = prioritize_contacts(contacts_info)
+        candidates = collect_candidates(prioritized, self.config, self.state, features, contact_types,
+                                        contact_anomalies, as_of=now)
+        changed = {}
+        for contact, actions in candidates.items():
+            previous = self.candidates.get(contact)
+            self.candidates[contact] = actions
+            if previous is None or _signature(previous) != _signature(actions):
+                changed[contact] = actions
+        if not changed:
+            return []
+        bandit = ContextualBandit.from_config(self.config, self.state, as_of=now)
+        selected = choose_actions([c for c in prioritized if c['contact'] in changed], changed,
+                                  self.config, self.state, bandit)
+        for contact in changed:
+            self.actions.pop(contact, None)
+        for action in selected:
+            self.actions[action['contact']] = action
+        logger.debug("Evaluated %d contacts at %s; %d changed.", len(contacts_info), now, len(changed))
+        return selected
+
+
+class RawDataWatcher:
+    """
+    Polls a raw data directory and hands new or modified CSV files to a
+    ContactScheduler. Files are compared by (size, mtime), like the pipeline's
+    data fingerprint, and only changed files are re-read.
+    """
+
+    def __init__(self, raw_data_path, scheduler):
+        self.raw_data_path = raw_data_path
+        self.scheduler = scheduler
+        self._fingerprints = {}     # path -> fingerprint
+        self._frames = {}           # path -> messages loaded from it
+        self._contacts = {}         # path -> contacts in those messages
+        self.deduplicate = scheduler.config.get('data', {}).get('deduplicate', True)
+        self._seen = SeenHashes()   # message keys per file, as load_all_data deduplicates
+
+    def poll(self):
+        """Load changed files; returns the contacts whose messages changed."""
+        paths = sorted(glob.glob(os.path.join(self.raw_data_path, "*.csv")))
+        changed_paths = []
+        for path in paths:
+            fingerprint = files_fingerprint([path])
+            if self._fingerprints.get(path) != fingerprint:
+                self._fingerprints[path] = fingerprint
+                changed_paths.append(path)
+        for path in set(self._frames) - set(paths):
+            changed_paths.append(path)
+            del self._fingerprints[path]
+        if not changed_paths:
+            return set()
+        user_name = self.scheduler.user_name
+        affected = set()
+        for path in changed_paths:
+            old = self._frames.pop(path, None)
+            self._contacts.pop(path, None)
+            df = load_file(path) if path in self._fingerprints else pd.DataFrame()
+            if not df.empty:
+                self._frames[path] = df
+                self._contacts[path] = set(contact_of(df, user_name))
+            if old is not None and len(df) >= len(old) and df.iloc[:len(old)].reset_index(drop=True).equals(
+                    old.reset_index(drop=True)):
+                # Appended to: only the contacts in the new rows changed
+                df = df.iloc[len(old):]
+            elif old is not None:
+                affected |= set(contact_of(old, user_name))
+            if not df.empty:
+                affected |= set(contact_of(df, user_name))
+        if not affected:
+            return set()
+        # A contact's messages may span files: rebuild it from every file that mentions it
+        frames = [(path, self._frames[path]) for path in sorted(self._frames) if self._contacts[path] & affected]
+        if self.deduplicate:
+            frames, report = drop_cross_file_duplicates(frames, self._seen)
+            log_duplicate_report(report)
+        frames = [df for _, df in frames]
+        combined = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        if not combined.empty:
+            combined = combined[contact_of(combined, user_name).isin(affected)]
+        self.scheduler.add_messages(combined, replace=True)
+        present = set(contact_of(combined, user_name)) if not combined.empty else set()
+        for contact in affected - present:
+            self.scheduler.remove_contact(contact)
+        logger.info("Reloaded %d changed file(s); %d contact(s) marked dirty.", len(changed_paths), len(affected))
+        return affected
+
+
+def scheduler_from_config(config, user_name, state=None):
+    scheduler_config = config.get('scheduler', {})
+    hours = scheduler_config.get('max_interval_hours', 24)
+    return ContactScheduler(config, user_name, state=state,
+                            max_interval=pd.Timedelta(hours=hours) if hours else None)
+
+
+def run_forever(scheduler, watcher=None, poll_seconds=30.0, on_actions=None, stop_event=None, state_service=None):
+    """
+    The daemon loop: pick up changed files, evaluate what is dirty or due,
+    then sleep until the next due time or the next poll, whichever is first.
+    With a state_service, each loop first reloads the state so feedback
+    recorded elsewhere (e.g. by the bot) reaches the rules, and contacts
+    whose feedback changed are marked dirty. Rules run under
+    state_service.reading(), so feedback writes never interleave with an
+    evaluation. Returns when stop_event is set.
+    """
+    stop_event = stop_event or threading.Event()
+    if state_service is not None:
+        state_service.on_feedback(scheduler.mark_dirty)
+    while not stop_event.is_set():
+        if watcher is not None:
+            watcher.poll()
+        if state_service is not None:
+            state_service.refresh()
+            with state_service.reading():
+                actions = scheduler.run_pending()
+        else:
+            actions = scheduler.run_pending()
+        if actions and on_actions is not None:
+            on_actions(actions)
+        timeout = poll_seconds
+        wakeup = scheduler.next_wakeup()
+        if wakeup is not None:
+            timeout = min(timeout, max(0.0, (wakeup - pd.Timestamp.now()).total_seconds()))
+        stop_event.wait(timeout)
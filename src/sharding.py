@@ -0,0 +1,156 @@
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from src.analysis.patterns import detect_trends
+from src.analysis.sketches import ResponseTimeSketches, sketches_from_config
+from src.automation.notifier import print_scores, print_trends, print_actions, print_feedback_summary
+from src.automation.templates import render_all
+from src.decision_engine.engine import summarize_contacts, collect_candidates, choose_actions
+from src.decision_engine.prioritization import prioritize_contacts
+from src.graph import Stage, PipelineGraph, ArtifactStore
+from src.pipeline import PIPELINE_STAGES, PipelineContext, ANOMALY_COLUMNS, build_pipeline_graph
+from src.scheduler import contact_of
+from src.state.feedback import simulate_feedback_loop
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Pipeline stages that only ever look at one contact at a time
+SHARD_STAGES = ('preprocess', 'window', 'score', 'features', 'classify', 'anomalies')
+
+
+def shard_of(contacts, n_shards):
+    """Shard of each contact: crc32 of its name, so a contact lands on the same shard in every run."""
+    codes, names = pd.factorize(contacts)
+    per_name = np.fromiter((zlib.crc32(name.encode('utf-8')) % n_shards for name in names), np.int64, len(names))
+    return per_name[codes]
+
+
+def _with_fn(stage, fn):
+    """The same stage (inputs, outputs, columns) running fn instead; a shard's graph has a private store."""
+    return Stage(stage.name, fn, inputs=stage.inputs, outputs=stage.outputs, columns=stage.columns)
+
+
+def run_shard(raw_df, config, user_name, as_of, point_in_time, sensitivities, sketches):
+    """
+    The per-contact part of the pipeline for one shard's raw messages, up to
+    the rules' candidate actions. Executed inside a worker process; only the
+    per-contact results travel back, never the message frame.
+    sensitivities: {contact: sensitivity} from the parent's state.
+    sketches: ResponseTimeSketches for this shard's contacts.
+    """
+    start = time.perf_counter()
+    ctx = PipelineContext(config, user_name, raw_data_path=None, as_of=as_of)
+    ctx.point_in_time = point_in_time
+    stages = {stage.name: stage for stage in PIPELINE_STAGES}
+    graph = PipelineGraph(
+        [_with_fn(stages['load'], lambda ctx: {'raw_df': raw_df}),
+         _with_fn(stages['sketches'], lambda ctx, df: {'response_sketches': sketches.update(df, ctx.as_of)}),
+         # No partition store: shards read the recency signals from their own frame
+         _with_fn(stages['partitions'], lambda ctx, df: {'partition_store': None})]
+        + [stages[name] for name in SHARD_STAGES],
+        ctx, ArtifactStore())
+    artifacts = graph.get_many('df', 'scores_df', 'advanced_features', 'contact_types', 'contact_anomalies',
+                               'response_sketches')
+    df = artifacts.pop('df')[ANOMALY_COLUMNS]
+    contacts_info, contact_dfs = summarize_contacts(df, artifacts['scores_df'], ctx.as_of)
+    artifacts['candidates'] = collect_candidates(contacts_info, config, None, artifacts['advanced_features'],
+                                                 artifacts['contact_types'], artifacts['contact_anomalies'],
+                                                 contact_dfs=contact_dfs, empty_df=df.iloc[0:0], as_of=ctx.as_of,
+                                                 sensitivities=sensitivities)
+    artifacts.update(contacts_info=contacts_info, messages=len(df), seconds=time.perf_counter() - start)
+    return artifacts
+
+
+def run_sharded_pipeline(config_path="config/config.yaml", user_name=None, raw_data_path=None, state_file=None,
+                         workers=None, shards=None, verbose=True, simulate_feedback=True, as_of=None):
+    """
+    run_pipeline_with_artifacts with the per-contact stages (preprocess
+    through rule evaluation) spread over a process pool. Contacts are
+    hash-partitioned into shards; the parent loads the raw data, merges the
+    shards' scores, features, anomalies and candidate actions, and runs the
+    global steps itself: prioritization, bandit selection and state. Picks the
+    same actions as run_pipeline. Returns the artifacts dict without 'df',
+    which is never assembled in one process (msg_id in anomaly rows is
+    shard-local); None when no data was loaded.
+    workers: processes (default: sharding.workers, else every core); 1 runs
+    the shards in this process. shards: default workers * sharding.shards_per_worker.
+    """
+    graph = build_pipeline_graph(config_path, user_name=user_name, raw_data_path=raw_data_path,
+                                 state_file=state_file, as_of=as_of)
+    ctx, config = graph.ctx, graph.ctx.config
+    sharding_config = config.get('sharding', {})
+    raw_df = graph.get('raw_df')
+    if raw_df.empty:
+        logger.error("No data loaded. Exiting.")
+        return
+    if ctx.point_in_time and not (raw_df['timestamp'] <= ctx.as_of).any():
+        logger.error("No messages on or before %s. Exiting.", ctx.as_of)
+        return
+    workers = workers or sharding_config.get('workers') or os.cpu_count() or 1
+    shards = shards or workers * sharding_config.get('shards_per_worker', 4)
+
+    start = time.perf_counter()
+    if ctx.point_in_time:
+        sketches = ResponseTimeSketches(compression=config.get('sketches', {}).get('compression', 100))
+    else:
+        sketches = sketches_from_config(config)
+    contacts = contact_of(raw_df, ctx.user_name).to_numpy()
+    shard_ids = shard_of(contacts, shards)
+    jobs = []
+    with ctx.reading_state() as tracker:
+        for shard in np.unique(shard_ids):
+            in_shard = shard_ids == shard
+            names = pd.unique(contacts[in_shard])
+            jobs.append((raw_df[in_shard], config, ctx.user_name, ctx.as_of, ctx.point_in_time,
+                         {contact: tracker.get_contact_sensitivity(contact) for contact in names},
+                         sketches.subset(names)))
+    if workers == 1:
+        results = [run_shard(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_shard, *job) for job in jobs]
+            results = [future.result() for future in as_completed(futures)]
+    logger.info("%d shards on %d workers: %d messages in %.2fs (slowest shard %.2fs).", len(jobs), workers,
+                sum(r['messages'] for r in results), time.perf_counter() - start,
+                max((r['seconds'] for r in results), default=0.0))
+
+    # Merge in contact order, as the single-process stages produce them
+    def merged(name):
+        return dict(sorted((item for r in results for item in r[name].items()), key=lambda item: item[0]))
+    scores_df = (pd.concat([r['scores_df'] for r in results], ignore_index=True)
+                 .sort_values(['contact', 'week_start'], kind='stable').reset_index(drop=True))
+    response_sketches = ResponseTimeSketches(sketches.path, sketches.compression)
+    for r in results:
+        response_sketches.merge(r['response_sketches'])
+    response_sketches.save()
+    artifacts = {'scores_df': scores_df, 'trends': detect_trends(scores_df),
+                 'advanced_features': merged('advanced_features'), 'contact_types': merged('contact_types'),
+                 'contact_anomalies': merged('contact_anomalies'), 'response_sketches': response_sketches}
+
+    prioritized = prioritize_contacts(sorted((info for r in results for info in r['contacts_info']),
+                                             key=lambda info: info['contact']))
+    candidates = merged('candidates')
+    with ctx.reading_state() as tracker:
+        actions = choose_actions(prioritized, {info['contact']: candidates[info['contact']] for info in prioritized},
+                                 config, tracker, as_of=ctx.as_of)
+    render_all(actions)
+    if verbose:
+        print_scores(scores_df)
+        print_trends(artifacts['trends'])
+        print_actions(actions, artifacts['contact_anomalies'])
+    if actions and simulate_feedback:
+        sim_config = config.get('simulation', {})
+        simulate_feedback_loop(ctx.state, actions, accept_prob=sim_config.get('accept_prob', 0.3),
+                               seed=sim_config.get('seed'), verbose=verbose)
+        if verbose:
+            with ctx.reading_state() as tracker:
+                print_feedback_summary(tracker)
+    ctx.flush_state()
+    logger.info("Sharded pipeline finished in %.2fs.", time.perf_counter() - start)
+    artifacts.update(config=config, actions=actions, tracker=ctx.tracker,
+                     messages=sum(r['messages'] for r in results), shards=len(jobs))
+    return artifacts
@@ -1,10 +1,27 @@
 import random
+from src.state.service import StateService
 
-def simulate_feedback_loop(tracker, actions):
-    print("\n=== SIMULATING USER FEEDBACK ===")
-    for action in actions:
-        action_id = tracker.add_action(action)
-        feedback = random.choices(['accepted', 'dismissed'], weights=[0.3, 0.7])[0]
-        tracker.record_feedback(action_id, feedback)
-        print(f"Action {action_id} for {action['contact']} ({action['type']}) was {feedback}.")
-    print("=================================\n")
\ No newline at end of file
+def simulate_feedback_loop(state, actions, accept_prob=0.3, seed=None, verbose=True):
+    """
+    Record a random accept/dismiss for every action. state is a StateTracker,
+    or a StateService, which registers the actions and applies the feedback
+    in one flush under the state file's lock.
+    """
+    rng = random.Random(seed)
+    if verbose:
+        print("\n=== SIMULATING USER FEEDBACK ===")
+    feedbacks = ['accepted' if rng.random() < accept_prob else 'dismissed' for _ in actions]
+    if isinstance(state, StateService):
+        futures = [state.submit('add_feedback', action, feedback) for action, feedback in zip(actions, feedbacks)]
+        action_ids = [future.result() for future in futures]
+    else:
+        action_ids = []
+        with state.batch():
+            for action, feedback in zip(actions, feedbacks):
+                action_ids.append(state.add_action(action))
+                state.record_feedback(action_ids[-1], feedback)
+    if verbose:
+        for action, action_id, feedback in zip(actions, action_ids, feedbacks):
+            print(f"Action {action_id} for {action['contact']} ({action['type']}) was {feedback}.")
+    if verbose:
+        print("=================================\n")
\ No newline at end of file
@@ -0,0 +1,150 @@
+import json
+import os
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+JOURNAL_VERSION = 1
+
+
+def journal_path_for(state_file):
+    """output/actions_log.json -> output/actions_log.journal.jsonl"""
+    base, _ = os.path.splitext(state_file)
+    return base + ".journal.jsonl"
+
+
+def write_json_atomic(path, data, indent=None):
+    """Write JSON to a temp file, fsync it and atomically replace the target."""
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=indent)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ActionJournal:
+    """
+    Append-only JSONL journal on top of a JSON snapshot.
+
+    Every state change is written as one line ({"seq": n, "op": ...}) instead of
+    rewriting the whole snapshot. Lines are flushed to the OS immediately and
+    fsynced every `fsync_every` records. `compact()` folds the journal into a
+    new snapshot that remembers the last applied seq, so a crash between the
+    snapshot replace and the journal truncate never replays an op twice.
+    """
+
+    def __init__(self, snapshot_file, journal_file=None, fsync_every=32):
+        self.snapshot_file = snapshot_file
+        self.journal_file = journal_file or journal_path_for(snapshot_file)
+        self.fsync_every = fsync_every
+        self.seq = 0
+        self.pending_ops = 0        # ops written since the last compaction
+        self._unsynced = 0
+        self._batch_depth = 0
+        self._fh = None
+
+    def load(self):
+        """
+        Return (snapshot, ops): the snapshot dict (legacy JSON state files are
+        read as-is) and the journal ops that still have to be replayed on top.
+        """
+        snapshot = {}
+        if os.path.exists(self.snapshot_file):
+            try:
+                with open(self.snapshot_file, 'r') as f:
+                    content = f.read().strip()
+                snapshot = json.loads(content) if content else {}
+            except json.JSONDecodeError:
+                print(f"Warning: {self.snapshot_file} is corrupt. Starting fresh.")
+                snapshot = {}
+        last_seq = snapshot.get('last_seq', 0)
+        self.seq = last_seq
+
+        ops = []
+        torn_at = None
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'rb') as f:
+                offset = 0
+                for line in f:
+                    start, offset = offset, offset + len(line)
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn write at the tail of the journal; everything after it is lost anyway
+                        torn_at = start
+                        break
+                    if record.get('seq', 0) <= last_seq:
+                        continue
+                    ops.append(record)
+                    self.seq = max(self.seq, record['seq'])
+        if torn_at is not None:
+            # Cut it off, or records appended after it would be unreadable on the next load
+            logger.warning(f"Dropping truncated record at the end of {self.journal_file}")
+            with open(self.journal_file, 'r+b') as f:
+                f.truncate(torn_at)
+        self.pending_ops = len(ops)
+        return snapshot, ops
+
+    def _open(self):
+        if self._fh is None:
+            directory = os.path.dirname(self.journal_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._fh = open(self.journal_file, 'a')
+        return self._fh
+
+    def append(self, op):
+        self.seq += 1
+        record = dict(op, seq=self.seq)
+        fh = self._open()
+        fh.write(json.dumps(record) + "\n")
+        fh.flush()
+        self.pending_ops += 1
+        self._unsynced += 1
+        if self._batch_depth == 0 and self._unsynced >= self.fsync_every:
+            self.sync()
+        return self.seq
+
+    def begin(self):
+        """Start a batch: fsync is deferred until the matching commit()."""
+        self._batch_depth += 1
+
+    def commit(self):
+        self._batch_depth -= 1
+        if self._batch_depth == 0:
+            self.sync()
+
+    def rollback(self):
+        # Journal lines are already written; replay applies whatever made it to disk
+        self._batch_depth = 0
+
+    def sync(self):
+        if self._fh is not None and self._unsynced:
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+        self._unsynced = 0
+
+    def compact(self, state):
+        """Write `state` as the new snapshot and truncate the journal."""
+        directory = os.path.dirname(self.snapshot_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.sync()
+        snapshot = dict(state, last_seq=self.seq, journal_version=JOURNAL_VERSION)
+        write_json_atomic(self.snapshot_file, snapshot, indent=2)
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+        if os.path.exists(self.journal_file):
+            open(self.journal_file, 'w').close()
+        self.pending_ops = 0
+
+    def close(self):
+        self.sync()
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
@@ -0,0 +1,267 @@
+import asyncio
+import atexit
+import copy
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from src.state.tracker import StateTracker
+from src.utils.logger import setup_logger
+
+try:
+    import fcntl
+except ImportError:          # Windows
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+logger = setup_logger(__name__)
+
+_STOP = object()
+
+
+class FileLock:
+    """Exclusive inter-process lock on a sidecar file (flock on POSIX, msvcrt on Windows)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._fh = None
+
+    def __enter__(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._fh = open(self.path, 'a+')
+        if fcntl is not None:
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            self._fh.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._fh.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if fcntl is not None:
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+        elif msvcrt is not None:
+            self._fh.seek(0)
+            msvcrt.locking(self._fh.fileno(), msvcrt.LK_UNLCK, 1)
+        self._fh.close()
+        self._fh = None
+
+
+class StateService:
+    """
+    Single writer for one state file.
+
+    All mutations are queued to a background thread which drains up to
+    `max_batch` requests (waiting at most `flush_interval` seconds for more),
+    then, holding an inter-process file lock, reloads the state from disk,
+    applies the whole batch and writes one atomic snapshot. Concurrent
+    callers in this process and other processes (bot, dashboard, pipeline)
+    therefore never lose each other's feedback or see a half-written file.
+
+    Sync callers use add_action / record_feedback (blocking until flushed);
+    async callers use the *_async variants, which never block the event loop.
+    on_feedback registers callbacks told which contacts' feedback changed.
+    """
+
+    def __init__(self, state_file="output/actions_log.json", max_batch=256, flush_interval=0.05,
+                 **tracker_kwargs):
+        self.state_file = state_file
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.lock = FileLock(state_file + ".lock")
+        self._queue = queue.Queue()
+        self._read_lock = threading.RLock()
+        with self.lock:
+            self.tracker = StateTracker(state_file, **tracker_kwargs)
+        self.flushes = 0
+        self.ops_written = 0
+        self._feedback_listeners = []
+        self._thread = threading.Thread(target=self._run, name=f"state-writer:{state_file}", daemon=True)
+        self._thread.start()
+
+    # ---- Writer thread ----
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    nxt = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if nxt is _STOP:
+                    stop = True
+                    break
+                batch.append(nxt)
+            self._flush(batch)
+            if stop:
+                return
+
+    def _flush(self, batch):
+        results = []
+        try:
+            with self.lock, self._read_lock:
+                before = self._stats_snapshot()
+                # Pick up whatever other processes wrote since our last flush
+                self.tracker.load()
+                with self.tracker.batch():
+                    for op, args, _ in batch:
+                        results.append(self._apply(op, args))
+                if self.tracker.backend == 'json':
+                    # One atomic snapshot replace per batch (sqlite commits are already atomic)
+                    self.tracker.save()
+                changed = self._feedback_changed(before)
+        except Exception as e:
+            logger.exception(f"State flush of {len(batch)} ops failed")
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        self.flushes += 1
+        self.ops_written += len(batch)
+        for (_, _, future), result in zip(batch, results):
+            future.set_result(result)
+        self._notify(changed)
+
+    def _stats_snapshot(self):
+        # Only worth copying when someone is listening
+        return copy.deepcopy(self.tracker.action_stats) if self._feedback_listeners else None
+
+    def _feedback_changed(self, before):
+        if before is None:
+            return set()
+        after = self.tracker.action_stats
+        return {contact for contact in set(before) | set(after) if before.get(contact) != after.get(contact)}
+
+    def _notify(self, contacts):
+        for callback in list(self._feedback_listeners) if contacts else ():
+            try:
+                callback(contacts)
+            except Exception:
+                logger.exception("Feedback listener failed")
+
+    def _apply(self, op, args):
+        if op == 'add':
+            return self.tracker.add_action(*args)
+        if op == 'feedback':
+            return self.tracker.record_feedback(*args)
+        if op == 'add_feedback':
+            action, feedback = args
+            action_id = self.tracker.add_action(action)
+            self.tracker.record_feedback(action_id, feedback)
+            return action_id
+        raise ValueError(f"Unknown state op '{op}'")
+
+    # ---- Public API ----
+
+    def submit(self, op, *args):
+        """Queue a mutation; returns a concurrent.futures.Future with its result."""
+        future = Future()
+        self._queue.put((op, args, future))
+        return future
+
+    def add_action(self, action):
+        return self.submit('add', action).result()
+
+    def record_feedback(self, action_id, feedback):
+        return self.submit('feedback', action_id, feedback).result()
+
+    def record_action_feedback(self, action, feedback):
+        """Record feedback for an action dict, registering it first if it has no id yet."""
+        if action.get('id') is not None:
+            return self.record_feedback(action['id'], feedback)
+        action['id'] = self.submit('add_feedback', action, feedback).result()
+        return True
+
+    async def add_action_async(self, action):
+        return await asyncio.wrap_future(self.submit('add', action))
+
+    async def record_feedback_async(self, action_id, feedback):
+        return await asyncio.wrap_future(self.submit('feedback', action_id, feedback))
+
+    async def register_actions_async(self, actions):
+        """Give every action without an id a tracker id; all adds share one flush."""
+        pending = [a for a in actions if a.get('id') is None]
+        ids = await asyncio.gather(*[self.add_action_async(a) for a in pending])
+        for action, action_id in zip(pending, ids):
+            action['id'] = action_id
+        return [a['id'] for a in actions]
+
+    def on_feedback(self, callback):
+        """
+        Call callback(contacts) after each flush or refresh that changed the
+        accepted/dismissed counts of these contacts, whichever process
+        recorded the feedback.
+        """
+        self._feedback_listeners.append(callback)
+
+    def refresh(self):
+        """Reload the tracker from disk now, picking up other processes' writes."""
+        with self.lock, self._read_lock:
+            before = self._stats_snapshot()
+            self.tracker.load()
+            changed = self._feedback_changed(before)
+        self._notify(changed)
+
+    @contextmanager
+    def reading(self):
+        """Consistent read access to the tracker (no flush runs while inside)."""
+        with self._read_lock:
+            yield self.tracker
+
+    def stop(self):
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        self.tracker.close()
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def state_service_from_config(config, state_file=None):
+    """Shared StateService for the state file (default: config['state']) and backend named in config['state']."""
+    state_config = config.get('state', {}) if config else {}
+    return get_state_service(state_file or state_config.get('state_file', "output/actions_log.json"),
+                             max_batch=state_config.get('max_batch', 256),
+                             flush_interval=state_config.get('flush_interval', 0.05),
+                             fsync_every=state_config.get('fsync_every', 32),
+                             compact_every=state_config.get('compact_every', 500),
+                             backend=state_config.get('backend', 'json'),
+                             sqlite_file=state_config.get('sqlite_file'))
+
+
+def get_state_service(state_file="output/actions_log.json", **kwargs):
+    """One StateService per state file per process."""
+    key = os.path.abspath(state_file)
+    with _services_lock:
+        service = _services.get(key)
+        if service is None:
+            service = StateService(state_file, **kwargs)
+            _services[key] = service
+        return service
+
+
+@atexit.register
+def _stop_services():
+    for service in list(_services.values()):
+        service.stop()
@@ -0,0 +1,125 @@
+import random
+import time
+import numpy as np
+from src.decision_engine.bandit import ContextualBandit, POLICIES
+from src.decision_engine.engine import select_action_with_rl
+from src.decision_engine.rules import reweight_by_sensitivity
+from src.state.tracker import StateTracker
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+ACTION_TYPES = [
+    ('catch_up', 1), ('reach_out', 2), ('follow_up_reminder', 3), ('support_checkin', 3),
+    ('propose_plan', 3), ('check_in', 4), ('suggest_apology', 4), ('congratulate', 4),
+    ('romantic_checkin', 4), ('balance_conversation', 5), ('improve_followup', 5),
+    ('academic_reminder', 5), ('response_time_alert', 6), ('share_meme', 6),
+]
+
+
+class AcceptanceModel:
+    """
+    Probability that a user accepts a given (contact, action_type) suggestion.
+    Lookup order: per-contact override, per-type default, global default.
+    """
+
+    def __init__(self, default=0.3, by_type=None, by_contact=None):
+        self.default = default
+        self.by_type = by_type or {}
+        self.by_contact = by_contact or {}
+
+    def prob(self, contact, action_type):
+        per_contact = self.by_contact.get(contact)
+        if per_contact and action_type in per_contact:
+            return per_contact[action_type]
+        return self.by_type.get(action_type, self.default)
+
+    @classmethod
+    def random(cls, contacts, rng, low=0.05, high=0.8):
+        """Draw an independent acceptance probability for every (contact, type) arm."""
+        by_contact = {c: {atype: float(rng.uniform(low, high)) for atype, _ in ACTION_TYPES}
+                      for c in contacts}
+        return cls(by_contact=by_contact)
+
+
+def synthetic_candidates(n_contacts, rng, min_actions=1, max_actions=4):
+    """{contact: [candidate action, ...]} shaped like apply_rules output."""
+    candidates = {}
+    for i in range(n_contacts):
+        contact = f"contact_{i:04d}"
+        k = int(rng.integers(min_actions, max_actions + 1))
+        picks = rng.choice(len(ACTION_TYPES), size=k, replace=False)
+        actions = [{'type': ACTION_TYPES[j][0], 'contact': contact, 'priority': ACTION_TYPES[j][1],
+                    'reason': 'simulated', 'details': []} for j in picks]
+        actions.sort(key=lambda a: a['priority'])
+        candidates[contact] = actions
+    return candidates
+
+
+def simulate_policy(candidates_by_contact, acceptance, episodes=20000, policy='rl',
+                    epsilon=0.2, seed=0):
+    """
+    Replay `episodes` feedback rounds entirely in memory.
+
+    Each episode picks a contact, re-weights its candidates by the tracker's
+    current sensitivity (with apply_rules' reweight_by_sensitivity), lets the policy choose one
+    action, samples accept/dismiss from the acceptance model and feeds the
+    result back through StateTracker.record_feedback.
+
+    policy: 'rl' for select_action_with_rl, or a ContextualBandit policy name.
+    Returns a dict of throughput and policy metrics.
+    """
+    if policy != 'rl' and policy not in POLICIES:
+        raise ValueError(f"Unknown policy '{policy}'.")
+    np_rng = np.random.default_rng(seed)
+    py_rng = random.Random(seed)
+    tracker = StateTracker(backend='memory')
+    bandit = ContextualBandit(policy=policy, epsilon=epsilon, seed=seed) if policy != 'rl' else None
+
+    contacts = [c for c, cands in candidates_by_contact.items() if cands]
+    contact_order = np_rng.integers(0, len(contacts), size=episodes)
+    draws = np_rng.random(episodes)
+    # Best achievable acceptance probability per contact, for regret
+    best_prob = {c: max(acceptance.prob(c, a['type']) for a in candidates_by_contact[c]) for c in contacts}
+
+    accepted = 0
+    regret = 0.0
+    start = time.perf_counter()
+    for step in range(episodes):
+        contact = contacts[contact_order[step]]
+        cands = reweight_by_sensitivity(candidates_by_contact[contact], tracker.get_contact_sensitivity(contact))
+        if bandit is None:
+            chosen = select_action_with_rl(cands, contact, tracker, epsilon=epsilon, rng=py_rng)
+        else:
+            chosen = bandit.select_batch({contact: cands})[contact]
+        p = acceptance.prob(contact, chosen['type'])
+        feedback = 'accepted' if draws[step] < p else 'dismissed'
+        action_id = tracker.add_action(chosen)
+        tracker.record_feedback(action_id, feedback)
+        if bandit is not None:
+            bandit.update(contact, chosen['type'], feedback)
+        accepted += feedback == 'accepted'
+        regret += best_prob[contact] - p
+    elapsed = time.perf_counter() - start
+
+    return {
+        'policy': policy,
+        'episodes': episodes,
+        'seconds': elapsed,
+        'episodes_per_second': episodes / elapsed if elapsed > 0 else float('inf'),
+        'acceptance_rate': accepted / episodes if episodes else 0.0,
+        'optimal_acceptance_rate': float(np.mean([best_prob[contacts[i]] for i in contact_order])) if episodes else 0.0,
+        'cumulative_regret': regret,
+        'mean_regret': regret / episodes if episodes else 0.0,
+    }
+
+
+def print_simulation_report(results):
+    print("\n" + "="*70)
+    print("🎲 OFFLINE POLICY SIMULATION")
+    print("="*70)
+    for r in results:
+        print(f"{r['policy']:<15} : {r['episodes_per_second']:>9.0f} episodes/s  "
+              f"accept={r['acceptance_rate']:.3f} (optimal {r['optimal_acceptance_rate']:.3f})  "
+              f"regret={r['cumulative_regret']:.1f} ({r['mean_regret']:.4f}/episode)")
+    print("="*70 + "\n")
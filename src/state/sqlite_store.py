@@ -0,0 +1,184 @@
+import os
+import sqlite3
+from datetime import datetime
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS actions (
+    id INTEGER PRIMARY KEY,
+    contact TEXT NOT NULL,
+    type TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    feedback TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_actions_contact_type ON actions (contact, type);
+CREATE INDEX IF NOT EXISTS idx_actions_feedback ON actions (feedback);
+
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    action_id INTEGER NOT NULL REFERENCES actions (id),
+    contact TEXT NOT NULL,
+    type TEXT NOT NULL,
+    feedback TEXT NOT NULL,
+    recorded_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_feedback_action ON feedback (action_id);
+CREATE INDEX IF NOT EXISTS idx_feedback_contact_type ON feedback (contact, type);
+
+CREATE TABLE IF NOT EXISTS sensitivity (
+    contact TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (contact, type)
+);
+
+CREATE TABLE IF NOT EXISTS action_stats (
+    contact TEXT NOT NULL,
+    type TEXT NOT NULL,
+    accepted INTEGER NOT NULL DEFAULT 0,
+    dismissed INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (contact, type)
+);
+"""
+
+
+class SQLiteStateStore:
+    """
+    StateTracker storage backed by a local SQLite database.
+
+    Implements the same interface as ActionJournal (load / append / sync /
+    compact / close / begin / commit), but each op touches only the rows it
+    changes, and aggregate queries run against indexed tables instead of the
+    nested dicts.
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        directory = os.path.dirname(db_file)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # isolation_level=None: we manage transactions explicitly with begin/commit
+        self.conn = sqlite3.connect(db_file, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._batch_depth = 0
+
+    def is_empty(self):
+        return self.conn.execute("SELECT 1 FROM actions LIMIT 1").fetchone() is None
+
+    def has_action(self, action_id):
+        return self.conn.execute("SELECT 1 FROM actions WHERE id = ?", (action_id,)).fetchone() is not None
+
+    def load(self):
+        actions = [dict(row) for row in self.conn.execute(
+            "SELECT id, contact, type, timestamp, feedback FROM actions ORDER BY id")]
+        sensitivity = {}
+        for row in self.conn.execute("SELECT contact, type, value FROM sensitivity"):
+            sensitivity.setdefault(row['contact'], {})[row['type']] = row['value']
+        action_stats = {}
+        for row in self.conn.execute("SELECT contact, type, accepted, dismissed FROM action_stats"):
+            action_stats.setdefault(row['contact'], {})[row['type']] = {
+                'accepted': row['accepted'], 'dismissed': row['dismissed']}
+        snapshot = {'actions': actions, 'sensitivity': sensitivity,
+                    'action_stats': action_stats, 'journal_version': 1}
+        return snapshot, []
+
+    def begin(self):
+        if self._batch_depth == 0:
+            self.conn.execute("BEGIN")
+        self._batch_depth += 1
+
+    def commit(self):
+        self._batch_depth -= 1
+        if self._batch_depth == 0:
+            self.conn.execute("COMMIT")
+
+    def rollback(self):
+        if self._batch_depth > 0:
+            self._batch_depth = 0
+            self.conn.execute("ROLLBACK")
+
+    def append(self, op):
+        self.begin()
+        try:
+            if op['op'] == 'add':
+                a = op['action']
+                self.conn.execute(
+                    "INSERT INTO actions (id, contact, type, timestamp, feedback) VALUES (?, ?, ?, ?, ?)",
+                    (a['id'], a['contact'], a['type'], a['timestamp'], a['feedback']))
+            elif op['op'] == 'feedback':
+                updated = self.conn.execute("UPDATE actions SET feedback = ? WHERE id = ?", (op['feedback'], op['id']))
+                if updated.rowcount == 0:
+                    raise KeyError(f"No action with id {op['id']}")
+                self.conn.execute(
+                    "INSERT INTO feedback (action_id, contact, type, feedback, recorded_at) VALUES (?, ?, ?, ?, ?)",
+                    (op['id'], op['contact'], op['type'], op['feedback'], datetime.now().isoformat()))
+                if op.get('sensitivity') is not None:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO sensitivity (contact, type, value) VALUES (?, ?, ?)",
+                        (op['contact'], op['type'], op['sensitivity']))
+                if op.get('stats') is not None:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO action_stats (contact, type, accepted, dismissed) VALUES (?, ?, ?, ?)",
+                        (op['contact'], op['type'], op['stats']['accepted'], op['stats']['dismissed']))
+        except Exception:
+            self.rollback()
+            raise
+        self.commit()
+
+    def sync(self):
+        # Commits are durable on their own; nothing is buffered outside a transaction
+        pass
+
+    def compact(self, state):
+        """Replace the table contents with `state` in one transaction."""
+        self.begin()
+        try:
+            for table in ('actions', 'sensitivity', 'action_stats'):
+                self.conn.execute(f"DELETE FROM {table}")
+            self.conn.executemany(
+                "INSERT INTO actions (id, contact, type, timestamp, feedback) VALUES (?, ?, ?, ?, ?)",
+                [(a['id'], a['contact'], a['type'], a['timestamp'], a.get('feedback')) for a in state['actions']])
+            self.conn.executemany(
+                "INSERT INTO sensitivity (contact, type, value) VALUES (?, ?, ?)",
+                [(c, t, v) for c, per_type in state['sensitivity'].items() for t, v in per_type.items()])
+            self.conn.executemany(
+                "INSERT INTO action_stats (contact, type, accepted, dismissed) VALUES (?, ?, ?, ?)",
+                [(c, t, s['accepted'], s['dismissed'])
+                 for c, per_type in state['action_stats'].items() for t, s in per_type.items()])
+        except Exception:
+            self.rollback()
+            raise
+        self.commit()
+
+    @property
+    def pending_ops(self):
+        return 0
+
+    def close(self):
+        self.conn.close()
+
+    # ---- Aggregate queries ----
+
+    def sensitivity_rows(self):
+        return [dict(row) for row in self.conn.execute(
+            "SELECT contact, type AS action_type, value AS sensitivity "
+            "FROM sensitivity ORDER BY contact, type")]
+
+    def stats_rows(self):
+        return [dict(row) for row in self.conn.execute(
+            "SELECT contact, type AS action_type, accepted, dismissed, "
+            "CAST(accepted AS REAL) / NULLIF(accepted + dismissed, 0) AS acceptance_rate "
+            "FROM action_stats ORDER BY contact, type")]
+
+    def feedback_totals(self):
+        row = self.conn.execute(
+            "SELECT SUM(feedback = 'accepted') AS accepted, "
+            "SUM(feedback = 'dismissed') AS dismissed, "
+            "SUM(feedback IS NULL OR feedback NOT IN ('accepted', 'dismissed')) AS pending "
+            "FROM actions").fetchone()
+        return {k: int(row[k] or 0) for k in ('accepted', 'dismissed', 'pending')}
@@ -1,52 +1,153 @@
-import json
 import os
+from contextlib import contextmanager
 from datetime import datetime
+from src.state.journal import ActionJournal, journal_path_for
+from src.state.sqlite_store import SQLiteStateStore
+
+BACKENDS = ('json', 'sqlite', 'memory')
+
+class MemoryStore:
+    """No-op storage for throwaway trackers (simulations, backtests)."""
+    pending_ops = 0
+
+    def load(self):
+        return {'journal_version': 1}, []
+
+    def append(self, op):
+        pass
+
+    def begin(self):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def sync(self):
+        pass
+
+    def compact(self, state):
+        pass
+
+    def close(self):
+        pass
 
 class StateTracker:
-    def __init__(self, state_file="output/actions_log.json"):
+    """
+    Actions, feedback and adaptive sensitivities for one user.
+
+    With the default 'json' backend, changes are appended to a JSONL journal
+    next to the state file rather than rewriting the whole JSON on every call;
+    the journal is replayed on startup and folded into the snapshot every
+    `compact_every` ops (or on `save()`). The 'sqlite' backend keeps the same
+    state in indexed tables in `sqlite_file` and imports an existing JSON
+    state file the first time it is opened. The 'memory' backend never
+    touches disk.
+    """
+    def __init__(self, state_file="output/actions_log.json", journal_file=None,
+                 fsync_every=32, compact_every=500, backend='json', sqlite_file=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown state backend '{backend}'. Expected one of {BACKENDS}.")
         self.state_file = state_file
+        self.backend = backend
+        self.compact_every = compact_every if backend == 'json' else 0
+        if backend == 'sqlite':
+            self.store = SQLiteStateStore(sqlite_file or os.path.splitext(state_file)[0] + ".db")
+        elif backend == 'memory':
+            self.store = MemoryStore()
+        else:
+            self.store = ActionJournal(state_file, journal_file, fsync_every=fsync_every)
         self.actions = []
         self.sensitivity = {}       # nested: {contact: {action_type: sensitivity}}
         self.action_stats = {}       # nested: {contact: {action_type: {'accepted': int, 'dismissed': int}}}
+        self._by_id = {}             # action id -> action dict (same objects as in self.actions)
+        self._next_id = 1
         self.load()
 
     def load(self):
-        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
-        if os.path.exists(self.state_file):
-            try:
-                with open(self.state_file, 'r') as f:
-                    content = f.read().strip()
-                    if not content:
-                        self.actions = []
-                        self.sensitivity = {}
-                        self.action_stats = {}
-                        return
-                    f.seek(0)
-                    data = json.load(f)
-                    self.actions = data.get('actions', [])
-                    self.sensitivity = data.get('sensitivity', {})
-                    self.action_stats = data.get('action_stats', {})
-            except json.JSONDecodeError:
-                print(f"Warning: {self.state_file} is corrupt. Starting fresh.")
-                self.actions = []
-                self.sensitivity = {}
-                self.action_stats = {}
-        else:
-            self.actions = []
-            self.sensitivity = {}
-            self.action_stats = {}
+        directory = os.path.dirname(self.state_file) if self.backend != 'memory' else None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.backend == 'sqlite' and self.store.is_empty() and (
+                os.path.exists(self.state_file) or os.path.exists(journal_path_for(self.state_file))):
+            self._import_json_state()
+        snapshot, ops = self.store.load()
+        self.actions = snapshot.get('actions', [])
+        self.sensitivity = snapshot.get('sensitivity', {})
+        self.action_stats = snapshot.get('action_stats', {})
+        self._by_id = {act['id']: act for act in self.actions}
+        self._next_id = max(self._by_id, default=0) + 1
+        for op in ops:
+            self._apply(op)
+        if self.actions and 'journal_version' not in snapshot:
+            # Legacy full-JSON state file: rewrite it once as a journal snapshot
+            self.save()
+
+    def _import_json_state(self):
+        legacy = StateTracker(self.state_file, compact_every=0)
+        self.store.compact({
+            'actions': legacy.actions,
+            'sensitivity': legacy.sensitivity,
+            'action_stats': legacy.action_stats
+        })
+        legacy.close()
 
     def save(self):
-        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
-        with open(self.state_file, 'w') as f:
-            json.dump({
-                'actions': self.actions,
-                'sensitivity': self.sensitivity,
-                'action_stats': self.action_stats
-            }, f, indent=2)
+        """Write a full snapshot (and truncate the journal for the json backend)."""
+        self.store.compact({
+            'actions': self.actions,
+            'sensitivity': self.sensitivity,
+            'action_stats': self.action_stats
+        })
+
+    def flush(self):
+        """Make sure every journaled change is on disk."""
+        self.store.sync()
+
+    def close(self):
+        self.store.close()
+
+    @contextmanager
+    def batch(self):
+        """Group many add_action/record_feedback calls into one transaction / fsync."""
+        self.store.begin()
+        try:
+            yield self
+        except Exception:
+            self.store.rollback()
+            if self.backend != 'memory':
+                # Bring actions, ids and stats back in line with what the store kept
+                self.load()
+            raise
+        self.store.commit()
+
+    def _apply(self, op):
+        if op['op'] == 'add':
+            self._apply_add(op['action'])
+        elif op['op'] == 'feedback':
+            act = self._by_id.get(op['id'])
+            if act is not None:
+                self._apply_feedback(act, op['feedback'])
+
+    def _apply_add(self, new_action):
+        self.actions.append(new_action)
+        self._by_id[new_action['id']] = new_action
+        self._next_id = max(self._next_id, new_action['id'] + 1)
+
+    def _apply_feedback(self, act, feedback):
+        act['feedback'] = feedback
+        self._update_sensitivity(act['contact'], act['type'], feedback)
+        self._update_action_stats(act['contact'], act['type'], feedback)
+
+    def _log(self, op):
+        self.store.append(op)
+        if self.compact_every and self.store.pending_ops >= self.compact_every:
+            self.save()
 
     def add_action(self, action):
-        action_id = len(self.actions) + 1
+        action_id = self._next_id
         new_action = {
             'id': action_id,
             'contact': action['contact'],
@@ -54,19 +155,24 @@ class StateTracker:
             'timestamp': datetime.now().isoformat(),
             'feedback': None
         }
-        self.actions.append(new_action)
-        self.save()
+        self._apply_add(new_action)
+        self._log({'op': 'add', 'action': new_action})
         return action_id
 
     def record_feedback(self, action_id, feedback):
-        for act in self.actions:
-            if act['id'] == action_id:
-                act['feedback'] = feedback
-                self._update_sensitivity(act['contact'], act['type'], feedback)
-                self._update_action_stats(act['contact'], act['type'], feedback)
-                self.save()
-                return True
-        return False
+        act = self._by_id.get(action_id)
+        if act is None or (self.backend == 'sqlite' and not self.store.has_action(action_id)):
+            return False
+        self._apply_feedback(act, feedback)
+        contact, atype = act['contact'], act['type']
+        self._log({'op': 'feedback', 'id': action_id, 'feedback': feedback,
+                   'contact': contact, 'type': atype,
+                   'sensitivity': self.sensitivity.get(contact, {}).get(atype),
+                   'stats': self.action_stats.get(contact, {}).get(atype)})
+        return True
+
+    def get_action(self, action_id):
+        return self._by_id.get(action_id)
 
     def _update_sensitivity(self, contact, action_type, feedback):
         if contact not in self.sensitivity:
@@ -98,4 +204,37 @@ class StateTracker:
             return 0, 0
 
     def get_contact_sensitivity(self, contact):
-        return self.sensitivity.get(contact, {})
\ No newline at end of file
+        return self.sensitivity.get(contact, {})
+
+    # ---- Aggregate views (SQL for the sqlite backend, dict walks otherwise) ----
+
+    def sensitivity_rows(self):
+        """[{contact, action_type, sensitivity}, ...]"""
+        if self.backend == 'sqlite':
+            return self.store.sensitivity_rows()
+        return [{'contact': contact, 'action_type': atype, 'sensitivity': val}
+                for contact, per_type in sorted(self.sensitivity.items())
+                for atype, val in sorted(per_type.items())]
+
+    def stats_rows(self):
+        """[{contact, action_type, accepted, dismissed, acceptance_rate}, ...]"""
+        if self.backend == 'sqlite':
+            return self.store.stats_rows()
+        rows = []
+        for contact, per_type in sorted(self.action_stats.items()):
+            for atype, counts in sorted(per_type.items()):
+                total = counts['accepted'] + counts['dismissed']
+                rows.append({'contact': contact, 'action_type': atype,
+                             'accepted': counts['accepted'], 'dismissed': counts['dismissed'],
+                             'acceptance_rate': counts['accepted'] / total if total else None})
+        return rows
+
+    def feedback_totals(self):
+        """{'accepted': n, 'dismissed': n, 'pending': n} over all recorded actions."""
+        if self.backend == 'sqlite':
+            return self.store.feedback_totals()
+        totals = {'accepted': 0, 'dismissed': 0, 'pending': 0}
+        for act in self.actions:
+            key = act['feedback'] if act['feedback'] in ('accepted', 'dismissed') else 'pending'
+            totals[key] += 1
+        return totals
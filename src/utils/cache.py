@@ -0,0 +1,55 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, ttl=300.0, max_entries=16):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class AsyncSingleFlight:
+    """
+    Deduplicate concurrent async work: while a call for `key` is in flight,
+    later callers await the same task instead of starting another one.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+
+    async def do(self, key, coro_fn):
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(coro_fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(key, None))
+        # shield: one caller being cancelled must not cancel the shared run
+        return await asyncio.shield(task)
@@ -1,6 +1,14 @@
 import yaml
 
+DEFAULT_USER_NAME = "Rahul"
+
 def load_config(config_path="config/config.yaml"):
     with open(config_path, 'r') as f:
         config = yaml.safe_load(f)
-    return config
\ No newline at end of file
+    return config
+
+def get_user_name(config):
+    """Name of the person whose chat logs are analysed (config['user']['name'])."""
+    if config and config.get('user', {}).get('name'):
+        return config['user']['name']
+    return DEFAULT_USER_NAME
\ No newline at end of file
@@ -0,0 +1,31 @@
+import glob
+import hashlib
+import json
+import os
+from src.utils.config import load_config
+
+def files_fingerprint(paths):
+    """Cheap content fingerprint from (path, size, mtime) of each file; no file is read."""
+    h = hashlib.sha1()
+    for path in sorted(paths):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            continue
+        h.update(f"{path}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+def data_fingerprint(raw_data_path):
+    return files_fingerprint(glob.glob(os.path.join(raw_data_path, "*.csv")))
+
+def config_fingerprint(config):
+    return hashlib.sha1(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+def pipeline_fingerprint(config_path="config/config.yaml", config=None):
+    """Fingerprint of everything a pipeline run reads: the config and the raw CSVs."""
+    if config is None:
+        config = load_config(config_path)
+    h = hashlib.sha1()
+    h.update(config_fingerprint(config).encode())
+    h.update(data_fingerprint(config['data']['raw_data_path']).encode())
+    return h.hexdigest()
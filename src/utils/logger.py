@@ -1,10 +1,148 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_lock = threading.Lock()
+_queue_handler = None
+_listener = None
+_output_handlers = []
+_settings = {'json_output': os.environ.get('LOG_FORMAT', '').lower() == 'json', 'log_file': None}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message (with any traceback) and `extra=` fields."""
+
+    RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        # Anything passed through `extra=` becomes a structured field
+        for key, value in vars(record).items():
+            if key not in self.RESERVED and not key.startswith('_'):
+                entry[key] = value
+        return json.dumps(entry, default=str)
+
+
+class _EnqueueHandler(logging.handlers.QueueHandler):
+    """
+    A QueueHandler that enqueues the record untouched. The stock prepare()
+    formats the message (and traceback) on the calling thread so the record
+    can be pickled; the queue never leaves this process, so that is left to
+    the listener's handlers.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def _build_output_handlers():
+    formatter = JsonFormatter() if _settings['json_output'] else logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler(sys.stderr)]
+    if _settings['log_file']:
+        os.makedirs(os.path.dirname(_settings['log_file']) or ".", exist_ok=True)
+        handlers.append(logging.FileHandler(_settings['log_file'], encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def _start_listener():
+    """Start the background writer; callers hold _lock."""
+    global _listener, _output_handlers
+    _output_handlers = _build_output_handlers()
+    _listener = logging.handlers.QueueListener(_queue_handler.queue, *_output_handlers,
+                                               respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()        # drains everything already queued
+        _listener = None
+    for handler in _output_handlers:
+        handler.close()
+
+
+def _ensure_queue_handler():
+    """
+    One QueueHandler on the root logger, created on first use. Records are
+    only enqueued on the calling thread; formatting and I/O happen on the
+    listener's thread.
+    """
+    global _queue_handler
+    if _queue_handler is None:
+        _queue_handler = _EnqueueHandler(queue.SimpleQueue())
+        logging.getLogger().addHandler(_queue_handler)
+        _start_listener()
+        atexit.register(shutdown_logging)
+    return _queue_handler
+
+
+def _after_fork_in_child():
+    # The listener thread does not survive fork(): give the child its own queue and writer
+    global _lock, _listener
+    _lock = threading.Lock()
+    if _queue_handler is not None:
+        _queue_handler.queue = queue.SimpleQueue()
+        _listener = None
+        _start_listener()
+        # Pool workers leave through os._exit, which skips atexit; multiprocessing finalizers still run
+        import multiprocessing.util
+        multiprocessing.util.Finalize(None, shutdown_logging, exitpriority=-100)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
 
 def setup_logger(name, level=logging.INFO):
+    """
+    Named logger writing through the shared background listener.
+    Safe to call any number of times for the same name: no handler is added
+    per call, so repeated imports never duplicate lines.
+    """
+    with _lock:
+        _ensure_queue_handler()
     logger = logging.getLogger(name)
-    handler = logging.StreamHandler()
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-    handler.setFormatter(formatter)
-    logger.addHandler(handler)
     logger.setLevel(level)
-    return logger
\ No newline at end of file
+    return logger
+
+
+def configure_logging(json_output=None, log_file=None):
+    """
+    Switch the listener's output between text and JSON lines (LOG_FORMAT=json
+    sets the default) and optionally also write to log_file. A no-op when
+    nothing changes.
+    """
+    with _lock:
+        _ensure_queue_handler()
+        settings = {'json_output': _settings['json_output'] if json_output is None else bool(json_output),
+                    'log_file': log_file}
+        if settings == _settings:
+            return
+        _settings.update(settings)
+        _stop_listener()
+        _start_listener()
+
+
+def configure_logging_from_config(config):
+    logging_config = config.get('logging', {}) if config else {}
+    configure_logging(json_output=logging_config.get('json'), log_file=logging_config.get('file'))
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread (also runs at exit)."""
+    with _lock:
+        _stop_listener()
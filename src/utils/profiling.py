@@ -0,0 +1,291 @@
+import contextvars
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+try:
+    import resource
+except ImportError:     # Windows
+    resource = None
+
+METRIC_PREFIX = "relationship_pipeline"
+
+_active = contextvars.ContextVar('active_profiler', default=None)
+
+
+def count_rows(obj):
+    """Rows in an artifact: len() of frames, lists and dicts, 0 for None/False, else 1."""
+    if obj is None or obj is False:
+        return 0
+    try:
+        return len(obj)
+    except TypeError:
+        return 1
+
+
+def _max_rss_bytes():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class SpanStats:
+    """Aggregated measurements for one (kind, name)."""
+
+    __slots__ = ('kind', 'name', 'calls', 'wall', 'cpu', 'rows_in', 'rows_out', 'peak_memory', 'cache_hits')
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.rows_in = 0
+        self.rows_out = 0
+        self.peak_memory = None
+        self.cache_hits = 0
+
+    def as_dict(self):
+        return {'kind': self.kind, 'name': self.name, 'calls': self.calls,
+                'wall_seconds': self.wall, 'cpu_seconds': self.cpu,
+                'rows_in': self.rows_in, 'rows_out': self.rows_out,
+                'peak_memory_bytes': self.peak_memory, 'cache_hits': self.cache_hits}
+
+
+class Span:
+    """Handle yielded by Profiler.span; set rows_out before the block ends."""
+
+    __slots__ = ('rows_in', 'rows_out', 'cache_hit')
+
+    def __init__(self, rows_in=0):
+        self.rows_in = rows_in
+        self.rows_out = 0
+        self.cache_hit = False
+
+
+class Profiler:
+    """
+    Wall time, CPU time, rows in/out and (with trace_memory) peak traced
+    memory for named spans: pipeline stages, anomaly detectors and rules.
+
+    Activate it around a run (`with profiler.activate():`); instrumented code
+    looks it up through current_profiler(), so nothing has to be passed down.
+    profile_stage runs cProfile or tracemalloc (profile_mode) around every
+    span with that name and writes the result next to the reports.
+    """
+
+    def __init__(self, output_dir="output/profiling", trace_memory=False, profile_stage=None,
+                 profile_mode="cprofile"):
+        if profile_mode not in ('cprofile', 'tracemalloc'):
+            raise ValueError(f"Unknown profile_mode '{profile_mode}' (expected cprofile or tracemalloc)")
+        self.output_dir = output_dir
+        self.trace_memory = trace_memory
+        self.profile_stage = profile_stage
+        self.profile_mode = profile_mode
+        self.stats = {}
+        self._peaks = []            # tracemalloc peak carried up to enclosing spans
+        self._cprofile = None       # one profile accumulated over every call of profile_stage
+        self._snapshot = None       # (peak, tracemalloc snapshot) of its most memory-hungry call
+        self.run_wall = None
+        self._started = None
+        self._finished = None
+        self._started_tracemalloc = False
+
+    @classmethod
+    def from_config(cls, config):
+        """A Profiler when config['profiling']['enabled'] is set, else None."""
+        params = dict(config.get('profiling', {})) if config else {}
+        if not params.pop('enabled', False):
+            return None
+        return cls(**params)
+
+    @contextmanager
+    def activate(self):
+        token = _active.set(self)
+        self._started = time.time()
+        start_wall = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        try:
+            yield self
+        finally:
+            self.run_wall = time.perf_counter() - start_wall
+            self._finished = time.time()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+            _active.reset(token)
+
+    @contextmanager
+    def span(self, name, kind='stage', rows_in=0):
+        stats = self.stats.get((kind, name))
+        if stats is None:
+            stats = self.stats[(kind, name)] = SpanStats(kind, name)
+        span = Span(rows_in)
+        deep = self.profile_stage == name
+        started_tracemalloc = deep and self.profile_mode == 'tracemalloc' and not tracemalloc.is_tracing()
+        if started_tracemalloc:
+            tracemalloc.start()
+        tracing = tracemalloc.is_tracing() and (self.trace_memory or deep)
+        if tracing:
+            # reset_peak hides the enclosing spans' peaks, so each span passes its own up the stack
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            self._peaks.append(0)
+        cprof = None
+        if deep and self.profile_mode == 'cprofile':
+            cprof = self._cprofile = self._cprofile or cProfile.Profile()
+            cprof.enable()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield span
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            if cprof is not None:
+                cprof.disable()
+            if tracing:
+                peak = max(tracemalloc.get_traced_memory()[1], self._peaks.pop())
+                stats.peak_memory = max(stats.peak_memory or 0, peak - base)
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+                if deep and self.profile_mode == 'tracemalloc' and (
+                        self._snapshot is None or peak - base > self._snapshot[0]):
+                    self._snapshot = (peak - base, tracemalloc.take_snapshot())
+            if started_tracemalloc:
+                tracemalloc.stop()
+            stats.calls += 1
+            stats.wall += wall
+            stats.cpu += cpu
+            stats.rows_in += span.rows_in or 0
+            stats.rows_out += span.rows_out or 0
+            stats.cache_hits += span.cache_hit
+
+    def _write_deep_profile(self):
+        name = self.profile_stage
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(os.path.join(self.output_dir, f"{name}.prof"))
+            out = io.StringIO()
+            pstats.Stats(self._cprofile, stream=out).sort_stats('cumulative').print_stats(30)
+            with open(os.path.join(self.output_dir, f"{name}.cprofile.txt"), 'w') as f:
+                f.write(out.getvalue())
+            logger.info(f"cProfile output for {name} written to {self.output_dir}")
+        if self._snapshot is not None:
+            top = self._snapshot[1].statistics('lineno')[:30]
+            with open(os.path.join(self.output_dir, f"{name}.tracemalloc.txt"), 'w') as f:
+                f.write(f"# Largest allocations during the call with the highest peak ({self._snapshot[0]} B)\n")
+                f.write("\n".join(str(stat) for stat in top) + "\n")
+            logger.info(f"tracemalloc output for {name} written to {self.output_dir}")
+        elif self._cprofile is None:
+            logger.warning(f"Nothing was profiled: no span named '{name}' ran")
+
+    def report(self):
+        spans = sorted(self.stats.values(), key=lambda s: (s.kind, -s.wall))
+        return {
+            'started_at': self._started,
+            'finished_at': self._finished,
+            'wall_seconds': self.run_wall,
+            'max_rss_bytes': _max_rss_bytes(),
+            'spans': [s.as_dict() for s in spans],
+        }
+
+    def prometheus_text(self):
+        """The report in the Prometheus text exposition format (for node_exporter's textfile collector)."""
+        report = self.report()
+        lines = []
+
+        def metric(name, help_text, samples):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} gauge")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f"{METRIC_PREFIX}_{name}{{{label_text}}} {value}" if label_text
+                             else f"{METRIC_PREFIX}_{name} {value}")
+
+        spans = report['spans']
+        for key, name, help_text in [
+            ('wall_seconds', 'span_wall_seconds', "Wall-clock time spent in the span during the last run."),
+            ('cpu_seconds', 'span_cpu_seconds', "CPU time spent in the span during the last run."),
+            ('calls', 'span_calls', "Times the span ran during the last run."),
+            ('rows_in', 'span_rows_in', "Rows (or items) passed into the span."),
+            ('rows_out', 'span_rows_out', "Rows (or items) produced by the span."),
+            ('cache_hits', 'span_cache_hits', "Times the span was served from the artifact cache."),
+            ('peak_memory_bytes', 'span_peak_memory_bytes', "Peak traced memory above the span's starting point."),
+        ]:
+            samples = [({'kind': s['kind'], 'name': s['name']}, s[key]) for s in spans if s[key] is not None]
+            if samples:
+                metric(name, help_text, samples)
+        if report['wall_seconds'] is not None:
+            metric('run_wall_seconds', "Wall-clock time of the last run.", [({}, report['wall_seconds'])])
+        if report['max_rss_bytes'] is not None:
+            metric('max_rss_bytes', "Peak resident set size of the process.", [({}, report['max_rss_bytes'])])
+        if report['finished_at'] is not None:
+            metric('last_run_timestamp_seconds', "Unix time the last run finished.", [({}, report['finished_at'])])
+        return "\n".join(lines) + "\n"
+
+    def write_reports(self, run_name="pipeline"):
+        """
+        Write <run_name>.json and <run_name>.prom to output_dir, plus the
+        cProfile/tracemalloc output for profile_stage; returns the two report paths.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.profile_stage:
+            self._write_deep_profile()
+        json_path = os.path.join(self.output_dir, f"{run_name}.json")
+        prom_path = os.path.join(self.output_dir, f"{run_name}.prom")
+        for path, text in [(json_path, json.dumps(self.report(), indent=2)), (prom_path, self.prometheus_text())]:
+            # Atomic, so a scraper never sees a half-written file
+            tmp_path = f"{path}.tmp.{os.getpid()}"
+            with open(tmp_path, 'w') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        return json_path, prom_path
+
+
+def current_profiler():
+    """The Profiler activated for this run, or None when profiling is off."""
+    return _active.get()
+
+
+@contextmanager
+def span(name, kind='stage', rows_in=0):
+    """Profiler.span on the active profiler; yields a throwaway Span when profiling is off."""
+    profiler = _active.get()
+    if profiler is None:
+        yield Span(rows_in)
+        return
+    with profiler.span(name, kind, rows_in) as s:
+        yield s
+
+
+def profiled(kind, name=None, count_result=count_rows):
+    """
+    Decorator: record each call as a span. rows_in is the length of the first
+    argument (a DataFrame for detectors), rows_out is count_result(result).
+    """
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profiler = _active.get()
+            if profiler is None:
+                return fn(*args, **kwargs)
+            with profiler.span(span_name, kind, count_rows(args[0]) if args else 0) as s:
+                result = fn(*args, **kwargs)
+                s.rows_out = int(count_result(result))
+                return result
+        return wrapper
+    return decorator
@@ -1,5 +1,6 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 import sys
 import os
@@ -7,10 +8,12 @@ import os
 # Add project root to path so we can import src modules
 sys.path.append(os.path.dirname(__file__))
 
-from src.pipeline import run_pipeline
-from src.state.tracker import StateTracker
-from src.automation.notifier import print_actions, print_feedback_summary
-from src.utils.config import load_config
+from src.pipeline import run_pipeline_with_artifacts
+from src.state.service import state_service_from_config
+from src.automation.templates import render_all
+from src.analysis.views import (latest_scores, query_contacts, top_n, score_histogram,
+                                contact_series, trend_summary, paginate_rows)
+from src.utils.fingerprint import pipeline_fingerprint
 
 st.set_page_config(page_title="Relationship Automation AI", layout="wide")
 st.title("🤖 Relationship Automation AI")
@@ -21,115 +24,197 @@ st.sidebar.header("Configuration")
 config_path = st.sidebar.text_input("Config file path", "config/config.yaml")
 run_button = st.sidebar.button("🚀 Run Pipeline")
 
+@st.cache_resource(show_spinner=False, max_entries=4)
+def cached_pipeline(config_path, fingerprint):
+    """
+    Pipeline artifacts for one (config, raw data) fingerprint. Reruns caused by
+    tab switches or widgets hit this cache instead of recomputing anything.
+    """
+    return run_pipeline_with_artifacts(config_path, verbose=False, simulate_feedback=False)
+
+SORT_LABELS = {
+    'Score': 'score',
+    'Messages/day': 'freq',
+    'Avg Sentiment': 'avg_sentiment',
+    'Reciprocity': 'reciprocity',
+    'Streak (days)': 'current_streak',
+    'Contact': 'contact',
+}
+
+# Server-side views: computed once per fingerprint (and query) and cached, so the
+# browser only ever receives one page of rows and fixed-size charts.
+@st.cache_data(show_spinner=False, max_entries=4)
+def latest_scores_cached(fingerprint, _scores_df):
+    return latest_scores(_scores_df)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def scores_page(fingerprint, _latest, search, min_score, max_score, sort_by, ascending, page, page_size,
+                trend=None, trends=None):
+    return query_contacts(_latest, search=search, min_score=min_score, max_score=max_score,
+                          trend=trend, trends=trends, sort_by=sort_by, ascending=ascending,
+                          page=page, page_size=page_size)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def contact_series_cached(fingerprint, _scores_df, contact):
+    return contact_series(_scores_df, contact, max_points=200)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def response_percentiles_cached(fingerprint, _response_sketches):
+    percentile_df = _response_sketches.percentiles()
+    hour_columns = [c for c in percentile_df.columns if c.startswith('p')]
+    percentile_df[hour_columns] = (percentile_df[hour_columns] / 3600).round(2)
+    return percentile_df.rename(columns={'contact': 'Contact', 'replies': 'Replies',
+                                         **{c: f"{c} (h)" for c in hour_columns}})
+
+def page_selector(total, page_size, noun, key):
+    """A page number input when the rows don't fit on one page; returns the page (1 otherwise)."""
+    n_pages = max(1, -(-total // page_size))
+    if n_pages == 1:
+        return 1
+    return st.number_input(f"Page (of {n_pages}, {total} {noun})", 1, n_pages, 1, key=key)
+
+def format_scores(page_df):
+    display_df = page_df[['contact', 'score', 'freq', 'avg_sentiment', 'reciprocity', 'current_streak']].copy()
+    display_df.columns = ['Contact', 'Score', 'Messages/day', 'Avg Sentiment', 'Reciprocity', 'Streak (days)']
+    display_df['Score'] = display_df['Score'].round(3)
+    display_df['Messages/day'] = display_df['Messages/day'].round(2)
+    display_df['Avg Sentiment'] = display_df['Avg Sentiment'].round(2)
+    display_df['Reciprocity'] = display_df['Reciprocity'].round(2)
+    return display_df
+
 # Initialize session state for results
-if "pipeline_run" not in st.session_state:
-    st.session_state.pipeline_run = False
-if "df" not in st.session_state:
-    st.session_state.df = None
-if "scores_df" not in st.session_state:
-    st.session_state.scores_df = None
-if "actions" not in st.session_state:
-    st.session_state.actions = None
-if "tracker" not in st.session_state:
-    st.session_state.tracker = None
-if "contact_anomalies" not in st.session_state:
-    st.session_state.contact_anomalies = None
-
-# Run pipeline when button clicked
+if "fingerprint" not in st.session_state:
+    st.session_state.fingerprint = None
+
+# Run pipeline when button clicked (a no-op if data and config are unchanged)
 if run_button:
     with st.spinner("Running pipeline... This may take a moment."):
-        config = load_config(config_path)
-        df, scores_df, actions, tracker = run_pipeline(config_path)
-        # Collect anomalies again for display (pipeline already has them, but we can recompute quickly)
-        from src.analysis.anomalies import detect_response_time_anomalies, detect_inactivity_periods
-        contact_anomalies = {}
-        for contact in df['contact'].unique():
-            contact_df = df[df['contact'] == contact]
-            resp_anom = detect_response_time_anomalies(df, contact, config['thresholds']['max_response_time_std_multiplier'])
-            inact = detect_inactivity_periods(df, contact, config['thresholds']['inactivity_days'], pd.Timestamp.now())
-            contact_anomalies[contact] = {
-                'response_time_anomalies': resp_anom,
-                'inactivity': inact
-            }
-        st.session_state.df = df
-        st.session_state.scores_df = scores_df
-        st.session_state.actions = actions
-        st.session_state.tracker = tracker
-        st.session_state.contact_anomalies = contact_anomalies
-        st.session_state.pipeline_run = True
-        st.success("Pipeline executed successfully!")
+        st.session_state.fingerprint = pipeline_fingerprint(config_path)
+        artifacts = cached_pipeline(config_path, st.session_state.fingerprint)
+        if artifacts is None:
+            st.session_state.fingerprint = None
+            st.error("No data loaded.")
+        else:
+            st.success("Pipeline executed successfully!")
 
 # If results exist, display them
-if st.session_state.pipeline_run:
-    scores_df = st.session_state.scores_df
-    actions = st.session_state.actions
-    tracker = st.session_state.tracker
-    contact_anomalies = st.session_state.contact_anomalies
+if st.session_state.fingerprint is not None:
+    fingerprint = st.session_state.fingerprint
+    artifacts = cached_pipeline(config_path, fingerprint)
+    scores_df = artifacts['scores_df']
+    trends = artifacts['trends']
+    actions = artifacts['actions']
+    contact_anomalies = artifacts['contact_anomalies']
+    response_sketches = artifacts['response_sketches']
+    state_service = state_service_from_config(artifacts['config'])
 
-    # Tabs for different views
-    tab1, tab2, tab3, tab4 = st.tabs(["📊 Scores", "📈 Trends", "⚡ Actions", "🔁 Feedback"])
+    page_size = st.sidebar.selectbox("Rows per page", [25, 50, 100, 250], index=1)
+    # Only the selected view is computed on each rerun (st.tabs would build them all)
+    view = st.radio("View", ["📊 Scores", "📈 Trends", "⏱️ Response Times", "⚡ Actions", "🔁 Feedback"],
+                    horizontal=True, label_visibility="collapsed")
 
-    with tab1:
+    if view == "📊 Scores":
         st.subheader("Latest Relationship Scores")
-        # Get latest scores per contact
-        latest = scores_df.sort_values('week_start').groupby('contact').last().reset_index()
-        latest = latest.sort_values('score', ascending=False)
-        # Format for display
-        display_df = latest[['contact', 'score', 'freq', 'avg_sentiment', 'reciprocity', 'current_streak']].copy()
-        display_df.columns = ['Contact', 'Score', 'Messages/day', 'Avg Sentiment', 'Reciprocity', 'Streak (days)']
-        display_df['Score'] = display_df['Score'].round(3)
-        display_df['Messages/day'] = display_df['Messages/day'].round(2)
-        display_df['Avg Sentiment'] = display_df['Avg Sentiment'].round(2)
-        display_df['Reciprocity'] = display_df['Reciprocity'].round(2)
-        st.dataframe(display_df, use_container_width=True)
-
-        # Optional: bar chart of scores
-        fig, ax = plt.subplots(figsize=(10, 5))
-        ax.barh(display_df['Contact'], display_df['Score'], color='skyblue')
-        ax.set_xlabel('Score')
-        ax.set_title('Relationship Health Scores')
-        st.pyplot(fig)
-
-    with tab2:
-        st.subheader("Trend Analysis")
-        from src.analysis.patterns import detect_trends
-        trends = detect_trends(scores_df)
-        increasing = [c for c, t in trends.items() if t == 'increasing']
-        decreasing = [c for c, t in trends.items() if t == 'decreasing']
-        stable = [c for c, t in trends.items() if t == 'stable']
-        col1, col2, col3 = st.columns(3)
+        latest = latest_scores_cached(fingerprint, scores_df)
+        col1, col2, col3, col4 = st.columns([3, 2, 2, 1])
         with col1:
-            st.markdown("**🔺 Increasing**")
-            for c in increasing:
-                st.write(f"- {c}")
+            search = st.text_input("Search contact", "")
         with col2:
-            st.markdown("**🔻 Decreasing**")
-            for c in decreasing:
-                st.write(f"- {c}")
+            sort_label = st.selectbox("Sort by", list(SORT_LABELS))
         with col3:
-            st.markdown("**➖ Stable**")
-            for c in stable:
-                st.write(f"- {c}")
+            min_score, max_score = st.slider("Score range", 0.0, 1.0, (0.0, 1.0), 0.05)
+        with col4:
+            ascending = st.checkbox("Ascending", value=False)
+        page_df, total = scores_page(fingerprint, latest, search, min_score, max_score,
+                                     SORT_LABELS[sort_label], ascending, 1, page_size)
+        page = page_selector(total, page_size, "contacts", key="scores_page")
+        if page > 1:
+            page_df, total = scores_page(fingerprint, latest, search, min_score, max_score,
+                                         SORT_LABELS[sort_label], ascending, page, page_size)
+        st.dataframe(format_scores(page_df), use_container_width=True)
+
+        # Charts stay the same size however many contacts there are
+        col1, col2 = st.columns(2)
+        with col1:
+            top = top_n(latest, n=min(20, len(latest)))
+            fig, ax = plt.subplots(figsize=(6, 5))
+            ax.barh(top['contact'][::-1], top['score'][::-1], color='skyblue')
+            ax.set_xlabel('Score')
+            ax.set_title(f'Top {len(top)} Relationship Health Scores')
+            st.pyplot(fig)
+        with col2:
+            counts, edges = score_histogram(latest)
+            fig, ax = plt.subplots(figsize=(6, 5))
+            ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge', color='skyblue', edgecolor='white')
+            ax.set_xlabel('Score')
+            ax.set_ylabel('Contacts')
+            ax.set_title('Score Distribution')
+            st.pyplot(fig)
+
+    elif view == "📈 Trends":
+        st.subheader("Trend Analysis")
+        summary = trend_summary(trends)
+        col1, col2, col3 = st.columns(3)
+        col1.metric("🔺 Increasing", summary['increasing'])
+        col2.metric("🔻 Decreasing", summary['decreasing'])
+        col3.metric("➖ Stable", summary['stable'])
+        trend_filter = st.selectbox("Show contacts", ['decreasing', 'increasing', 'stable'])
+        latest = latest_scores_cached(fingerprint, scores_df)
+        trend_df, total = scores_page(fingerprint, latest, None, None, None, 'score', True, 1, page_size,
+                                      trend=trend_filter, trends=trends)
+        page = page_selector(total, page_size, f"{trend_filter} contacts", key="trends_page")
+        if page > 1:
+            trend_df, total = scores_page(fingerprint, latest, None, None, None, 'score', True, page, page_size,
+                                          trend=trend_filter, trends=trends)
+        st.caption(f"Showing {len(trend_df)} of {total} {trend_filter} contacts (lowest scores first)")
+        st.dataframe(format_scores(trend_df), use_container_width=True)
 
         # Plot score over time for selected contact
         st.subheader("Score Over Time")
-        selected_contact = st.selectbox("Select contact", scores_df['contact'].unique())
-        contact_scores = scores_df[scores_df['contact'] == selected_contact].sort_values('week_start')
-        fig2, ax2 = plt.subplots(figsize=(10, 4))
-        ax2.plot(contact_scores['week_start'], contact_scores['score'], marker='o')
-        ax2.set_xlabel('Week')
-        ax2.set_ylabel('Score')
-        ax2.set_title(f'{selected_contact} - Score Trend')
-        plt.xticks(rotation=45)
-        st.pyplot(fig2)
-
-    with tab3:
+        contact_search = st.text_input("Find contact", "")
+        matches = [c for c in latest['contact'] if contact_search.lower() in c.lower()][:200]
+        if matches:
+            selected_contact = st.selectbox("Select contact", matches)
+            x, y = contact_series_cached(fingerprint, scores_df, selected_contact)
+            fig2, ax2 = plt.subplots(figsize=(10, 4))
+            ax2.plot(x, y, marker='o' if len(y) <= 60 else None)
+            ax2.set_xlabel('Week')
+            ax2.set_ylabel('Score')
+            ax2.set_title(f'{selected_contact} - Score Trend')
+            plt.xticks(rotation=45)
+            st.pyplot(fig2)
+        else:
+            st.write("No matching contacts.")
+
+    elif view == "⏱️ Response Times":
+        st.subheader("Reply Time Percentiles")
+        st.write("How long each contact usually takes to reply, from a compact per-contact sketch "
+                 "that is updated incrementally as new messages arrive.")
+        percentile_df = response_percentiles_cached(fingerprint, response_sketches)
+        search = st.text_input("Search contact", "", key="response_search")
+        if search:
+            percentile_df = percentile_df[percentile_df['Contact'].str.contains(search, case=False, regex=False)]
+        percentile_df = percentile_df.sort_values('p95 (h)', ascending=False)
+        total = len(percentile_df)
+        page = page_selector(total, page_size, "contacts", key="response_page")
+        page_df = percentile_df.iloc[(page - 1) * page_size:page * page_size]
+        st.caption(f"{len(page_df)} of {total} contacts (slowest p95 first)")
+        st.dataframe(page_df, use_container_width=True)
+
+    elif view == "⚡ Actions":
         st.subheader("Automated Actions")
         if not actions:
             st.info("No actions generated.")
         else:
-            for i, action in enumerate(actions):
+            # Fewer per page: each action renders an expander with buttons
+            actions_per_page = 25
+            page = page_selector(len(actions), actions_per_page, "actions", key="actions_page")
+            start = (page - 1) * actions_per_page
+            page_actions = actions[start:start + actions_per_page]
+            messages = render_all(page_actions)
+            for i, (action, msg) in enumerate(zip(page_actions, messages), start):
                 with st.expander(f"{i+1}. {action['type'].replace('_',' ').title()} for {action['contact']}"):
+                    st.write(msg)
                     st.write(f"**Reason:** {action['reason']}")
                     if action.get('details'):
                         st.write(f"**Details:** {', '.join(str(d) for d in action['details'][:2])}")
@@ -140,45 +225,50 @@ if st.session_state.pipeline_run:
                         if anom['inactivity']:
                             days = anom['inactivity'][-1][2]
                             st.write(f"⏳ Inactivity: {days} days since last message")
-                    # Simulate feedback buttons (in real app, you'd store user response)
+                    # Feedback goes through the single-writer state service, so it is safe
+                    # alongside the Telegram bot writing to the same state file
                     col1, col2 = st.columns(2)
                     with col1:
                         if st.button(f"✅ Accept", key=f"accept_{i}"):
-                            # In a real app, you'd record feedback to tracker
+                            state_service.record_action_feedback(action, 'accepted')
                             st.success("Feedback recorded (accepted)")
                     with col2:
                         if st.button(f"❌ Dismiss", key=f"dismiss_{i}"):
+                            state_service.record_action_feedback(action, 'dismissed')
                             st.info("Feedback recorded (dismissed)")
 
-    with tab4:
+    else:
         st.subheader("Feedback & Adaptation")
         st.write("The system learns from your feedback. Below are the current sensitivity multipliers per contact and action type.")
-        sens = tracker.sensitivity
-        if sens:
-            # Convert to DataFrame for display
-            rows = []
-            for contact, actions_dict in sens.items():
-                for atype, val in actions_dict.items():
-                    rows.append({'Contact': contact, 'Action Type': atype, 'Sensitivity': round(val, 2)})
-            sens_df = pd.DataFrame(rows)
+        with state_service.reading() as live_tracker:
+            sens_rows = live_tracker.sensitivity_rows()
+            stats_rows = live_tracker.stats_rows()
+            totals = live_tracker.feedback_totals()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Accepted", totals['accepted'])
+        col2.metric("Dismissed", totals['dismissed'])
+        col3.metric("Pending", totals['pending'])
+        if sens_rows:
+            page = page_selector(len(sens_rows), page_size, "rows", key="sensitivity_page")
+            sens_df, total = paginate_rows(sens_rows, page=page, page_size=page_size)
+            sens_df = sens_df.rename(columns={
+                'contact': 'Contact', 'action_type': 'Action Type', 'sensitivity': 'Sensitivity'})
+            sens_df['Sensitivity'] = sens_df['Sensitivity'].round(2)
+            st.caption(f"{len(sens_df)} of {total} rows")
             st.dataframe(sens_df, use_container_width=True)
         else:
             st.write("No feedback recorded yet.")
 
-        # Show action stats (accepted/dismissed counts)
+        # Show action stats (accepted/dismissed counts), lowest acceptance first
         st.subheader("Action Statistics")
-        stats = tracker.action_stats
-        if stats:
-            rows2 = []
-            for contact, actions_dict in stats.items():
-                for atype, counts in actions_dict.items():
-                    rows2.append({
-                        'Contact': contact,
-                        'Action Type': atype,
-                        'Accepted': counts['accepted'],
-                        'Dismissed': counts['dismissed']
-                    })
-            stats_df = pd.DataFrame(rows2)
+        if stats_rows:
+            stats_rows = sorted(stats_rows, key=lambda r: (r['acceptance_rate'] is None, r['acceptance_rate'] or 0))
+            page = page_selector(len(stats_rows), page_size, "rows", key="stats_page")
+            stats_df, total = paginate_rows(stats_rows, page=page, page_size=page_size)
+            stats_df = stats_df.rename(columns={
+                'contact': 'Contact', 'action_type': 'Action Type', 'accepted': 'Accepted',
+                'dismissed': 'Dismissed', 'acceptance_rate': 'Acceptance Rate'})
+            st.caption(f"{len(stats_df)} of {total} rows")
             st.dataframe(stats_df, use_container_width=True)
         else:
             st.write("No action statistics yet.")
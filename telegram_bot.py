@@ -1,49 +1,132 @@
-import logging
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from telegram import Update
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, ContextTypes
 import sys
 import os
 sys.path.append(os.path.dirname(__file__))
 
 from src.pipeline import run_pipeline
-from src.state.tracker import StateTracker
-from src.automation.actions import generate_action_message
+from src.state.service import state_service_from_config
+from src.automation.templates import render_all
+from src.automation.dispatch import NotificationDispatcher, TelegramTransport
+from src.utils.cache import TTLCache, AsyncSingleFlight
+from src.utils.config import load_config
+from src.utils.fingerprint import pipeline_fingerprint
+from src.utils.logger import setup_logger, configure_logging_from_config
 
 # Enable logging
-logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
-logger = logging.getLogger(__name__)
+logger = setup_logger(__name__)
 
 # Your bot token from BotFather
 TOKEN = "YOUR_BOT_TOKEN_HERE"
+CONFIG_PATH = "config/config.yaml"
+
+FEEDBACK_CODES = {'a': 'accepted', 'd': 'dismissed'}
+
+_config = load_config(CONFIG_PATH)
+configure_logging_from_config(_config)
+_bot_config = _config.get('telegram', {})
+
+def bot_state_service():
+    """
+    Button presses are queued to the single-writer state service, which coalesces
+    bursts into one flush instead of rewriting the state file per press.
+    """
+    return state_service_from_config(_config)
+# The pipeline is CPU-bound and synchronous; run it off the event loop
+pipeline_executor = ThreadPoolExecutor(max_workers=_bot_config.get('executor_workers', 2),
+                                       thread_name_prefix="pipeline")
+# Results keyed by config + raw data fingerprint, so repeat /run calls are served from memory
+result_cache = TTLCache(ttl=_bot_config.get('cache_ttl_seconds', 300))
+pipeline_flight = AsyncSingleFlight()
+_dispatcher = None
+
+def bot_dispatcher(bot):
+    """One dispatcher for the bot's lifetime, so overlapping /run calls share each chat's rate limit."""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = NotificationDispatcher.from_config(TelegramTransport(bot), _config)
+    return _dispatcher
+
+async def current_fingerprint(config_path=CONFIG_PATH):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pipeline_executor, pipeline_fingerprint, config_path)
+
+async def get_pipeline_result(fingerprint, config_path=CONFIG_PATH):
+    """
+    Pipeline result for the data and config identified by `fingerprint`.
+    Served from the cache when fresh; concurrent callers share one in-flight run.
+    """
+    loop = asyncio.get_running_loop()
+    cached = result_cache.get(fingerprint)
+    if cached is not None:
+        return cached
+
+    async def compute():
+        run = functools.partial(run_pipeline, config_path, verbose=False, simulate_feedback=False)
+        result = await loop.run_in_executor(pipeline_executor, run)
+        if result is not None:
+            result_cache.set(fingerprint, result)
+        return result
+
+    return await pipeline_flight.do(fingerprint, compute)
+
+def encode_feedback_callback(action_id, feedback_code):
+    """Compact callback payload, e.g. 'fb:42:a' (Telegram allows at most 64 bytes)."""
+    return f"fb:{action_id}:{feedback_code}"
+
+def parse_feedback_callback(data):
+    """Return (action_id, feedback) from a callback payload, or None if it is not ours."""
+    parts = data.split(':')
+    if len(parts) != 3 or parts[0] != 'fb' or parts[2] not in FEEDBACK_CODES or not parts[1].isdigit():
+        return None
+    return int(parts[1]), FEEDBACK_CODES[parts[2]]
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text("Welcome! Use /run to execute the relationship automation pipeline.")
 
 async def run(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    await update.message.reply_text("Running pipeline... This may take a moment.")
+    start_time = time.perf_counter()
     try:
-        # Run the pipeline (you may want to pass a custom config path)
-        df, scores_df, actions, tracker = run_pipeline("config/config.yaml")
+        fingerprint = await current_fingerprint(CONFIG_PATH)
+        cache_hit = result_cache.get(fingerprint) is not None
+        if not cache_hit:
+            await update.message.reply_text("Running pipeline... This may take a moment.")
+        result = await get_pipeline_result(fingerprint, CONFIG_PATH)
+        if result is None:
+            await update.message.reply_text("No data loaded.")
+            return
+        df, scores_df, actions, tracker = result
+        logger.info(f"/run answered in {time.perf_counter() - start_time:.3f}s "
+                    f"({'cached' if cache_hit else 'computed'})")
         if not actions:
             await update.message.reply_text("No actions generated.")
             return
 
-        # Send each action as a separate message with inline feedback buttons
-        for action in actions:
-            msg = generate_action_message(action)
-            # Create inline keyboard: Accept / Dismiss
-            keyboard = [
-                [
-                    InlineKeyboardButton("✅ Accept", callback_data=f"accept_{action['contact']}_{action['type']}"),
-                    InlineKeyboardButton("❌ Dismiss", callback_data=f"dismiss_{action['contact']}_{action['type']}")
-                ]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
+        # Register the actions once (cached results keep their ids) so buttons can carry the id
+        await bot_state_service().register_actions_async(actions)
+
+        # Queue each action with inline feedback buttons; the dispatcher sends them in
+        # priority order under the rate limit and folds low-priority ones into a digest
+        dispatcher = bot_dispatcher(context.bot)
+        chat_id = update.effective_chat.id
+        for action, msg in zip(actions, render_all(actions)):
+            # Accept / Dismiss
+            buttons = [[
+                ("✅ Accept", encode_feedback_callback(action['id'], 'a')),
+                ("❌ Dismiss", encode_feedback_callback(action['id'], 'd')),
+            ]]
             # Add extra info
             extra = f"\n🧠 Reason: {action['reason']}"
             if action.get('details'):
                 extra += f"\n📝 Details: {', '.join(str(d) for d in action['details'][:2])}"
-            await update.message.reply_text(msg + extra, reply_markup=reply_markup)
+            dispatcher.enqueue(chat_id, msg + extra, priority=action.get('priority', 5), buttons=buttons)
+        stats = await dispatcher.drain()
+        logger.info(f"Dispatched {stats['sent']} messages ({stats['digested_actions']} actions in "
+                    f"{stats['digests']} digests, {stats['retries']} retries, {stats['failed']} failed)")
 
     except Exception as e:
         logger.exception("Error running pipeline")
@@ -52,21 +135,40 @@ async def run(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    data = query.data.split('_')
-    feedback = data[0]          # accept or dismiss
-    contact = data[1]
-    action_type = '_'.join(data[2:])  # in case action type has underscores
+    parsed = parse_feedback_callback(query.data)
+    if parsed is None:
+        await query.edit_message_text(text="Unknown button.")
+        return
+    action_id, feedback = parsed
+    state_service = bot_state_service()
+    recorded = await state_service.record_feedback_async(action_id, feedback)
+    if not recorded:
+        await query.edit_message_text(text="This suggestion is no longer available.")
+        return
+    with state_service.reading() as tracker:
+        action = tracker.get_action(action_id) or {}
+    await query.edit_message_text(
+        text=f"Feedback recorded: {feedback} for {action.get('contact', '?')} - {action.get('type', '?')}")
 
-    # Here you would need to map this feedback to a specific action ID.
-    # For simplicity, we'll just acknowledge.
-    await query.edit_message_text(text=f"Feedback recorded: {feedback} for {contact} - {action_type}")
-
-def main():
-    app = Application.builder().token(TOKEN).build()
+def build_application(token=TOKEN, request=None, concurrent_updates=True):
+    """
+    The bot's Application. Updates are processed concurrently: a /run waiting on
+    the pipeline must not hold up other chats or button presses, concurrent /run
+    calls can share one in-flight pipeline run, and bursts of button presses
+    reach the state service together and are written in one flush.
+    request: a telegram.request.BaseRequest to use instead of HTTP (benchmarks).
+    """
+    builder = Application.builder().token(token).concurrent_updates(concurrent_updates)
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    app = builder.build()
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("run", run))
     app.add_handler(CallbackQueryHandler(button_handler))
-    app.run_polling()
+    return app
+
+def main():
+    build_application().run_polling()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,29 @@
+import os
+import shutil
+import pytest
+import yaml
+from src.utils.config import load_config
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def sandbox_config(tmp_path):
+    """
+    (config path, config): the repo's config with a copy of data/raw and
+    every output (state, caches, partitions, sketches) under tmp_path.
+    """
+    config = load_config(os.path.join(REPO_ROOT, "config", "config.yaml"))
+    raw = tmp_path / "raw"
+    shutil.copytree(os.path.join(REPO_ROOT, "data", "raw"), raw)
+    out = tmp_path / "output"
+    config['data'].update(raw_data_path=str(raw), dedup_index=str(out / "dedup_index.pkl"))
+    config['state'].update(state_file=str(out / "actions_log.json"), sqlite_file=str(out / "state.db"))
+    config['pipeline']['cache_dir'] = None
+    config['profiling']['output_dir'] = str(out / "profiling")
+    config['partitions']['dir'] = str(out / "partitions")
+    config['sketches']['file'] = str(out / "response_sketches.json")
+    config['simulation']['seed'] = 0
+    path = tmp_path / "config.yaml"
+    path.write_text(yaml.safe_dump(config), encoding='utf-8')
+    return str(path), config
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.analysis.features_advanced import add_keyword_flags, extract_advanced_features
+from src.analysis.sketches import TDigest, ResponseTimeSketches
+from src.preprocessing.message_store import commitment_mask
+
+QUANTILES = np.array([0.5, 0.95])
+
+
+def _reply_times(n=20000, seed=0):
+    # Reply latencies are heavy-tailed: mostly minutes, sometimes days
+    return np.random.default_rng(seed).lognormal(7, 1.5, n)
+
+
+def _rank_error(values, estimates):
+    """How far, in quantile terms, each estimate lands from the quantile it stands for."""
+    return np.abs(np.searchsorted(np.sort(values), estimates) / len(values) - QUANTILES)
+
+
+def test_tdigest_quantiles_match_numpy():
+    values = _reply_times()
+    digest = TDigest.from_values(values)
+
+    estimates = digest.quantile(QUANTILES)
+    assert digest.count == len(values)
+    assert np.all(_rank_error(values, estimates) < 0.005)
+    np.testing.assert_allclose(estimates, np.quantile(values, QUANTILES), rtol=0.05)
+
+
+def test_merged_file_digests_match_one_digest():
+    values = _reply_times()
+    single = TDigest.from_values(values)
+    merged = TDigest()
+    for file_values in np.array_split(values, 7):
+        merged.merge(TDigest.from_values(file_values))
+
+    assert merged.count == single.count
+    assert np.all(_rank_error(values, merged.quantile(QUANTILES)) < 0.005)
+    np.testing.assert_allclose(merged.quantile(QUANTILES), single.quantile(QUANTILES), rtol=0.02)
+
+
+def test_empty_tdigest_has_no_quantiles():
+    assert np.isnan(TDigest().quantile(0.5))
+
+
+def _messages(n=2000, seed=1):
+    rng = np.random.default_rng(seed)
+    timestamps = pd.Timestamp('2026-01-01') + pd.to_timedelta(np.sort(rng.uniform(0, 90, n)), unit='D')
+    response = _reply_times(n, seed)
+    response[rng.random(n) < 0.2] = np.nan
+    return pd.DataFrame({'timestamp': timestamps, 'contact': rng.choice(['Mom', 'Rahul', 'Anjali'], n),
+                         'response_time_seconds': response})
+
+
+def test_incremental_sketches_match_a_rebuild(tmp_path):
+    df = _messages()
+    path = str(tmp_path / "sketches.json")
+    sketches = ResponseTimeSketches(path).update(df, pd.Timestamp('2026-02-15'))
+    sketches.save()
+    # A later run loads the saved digests and folds in only the newer replies
+    incremental = ResponseTimeSketches.load(path).update(df, pd.Timestamp('2026-04-15'))
+    rebuilt = ResponseTimeSketches().update(df, pd.Timestamp('2026-04-15'))
+
+    a, b = incremental.percentiles(), rebuilt.percentiles()
+    replies = df.groupby('contact')['response_time_seconds'].count()
+    assert a['replies'].tolist() == b['replies'].tolist() == replies.tolist()
+    for p in ('p50', 'p95'):
+        assert a[p].to_numpy() == pytest.approx(b[p].to_numpy(), rel=0.05)
+
+
+def test_advanced_features_from_keyword_flags_match_the_text():
+    rng = np.random.default_rng(2)
+    words = ['exam tomorrow', 'so tired lol', 'Happy birthday!!', 'meeting at the office', 'miss you',
+             'dinner this weekend?', 'hospital visit', 'ok', '']
+    n = 300
+    df = pd.DataFrame({'timestamp': pd.Timestamp('2026-01-01') + pd.to_timedelta(np.arange(n), unit='h'),
+                       'contact': rng.choice(['Mom', 'Rahul'], n), 'sentiment': rng.uniform(-1, 1, n),
+                       'message': rng.choice(words, n)})
+    df['sender'] = np.where(rng.random(n) < 0.5, df['contact'], 'Me')
+    df['commitments'] = [['meet'] if 'meeting' in m else [] for m in df['message']]
+
+    from_text = extract_advanced_features(df, user_name='Me')
+    numeric = add_keyword_flags(df).drop(columns=['message', 'commitments'])
+    numeric['has_commitment'] = commitment_mask(df)
+    assert extract_advanced_features(numeric, user_name='Me') == from_text
+    assert from_text['Mom']['topic_counts'] and from_text['Mom']['life_events']['exam'] > 0
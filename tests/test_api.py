@@ -0,0 +1,125 @@
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from urllib.parse import quote
+import pandas as pd
+import pytest
+from src.api.index import contact_index_from_config
+from src.api.server import start_server
+from src.decision_engine.engine import summarize_contacts
+from src.decision_engine.prioritization import prioritize_contacts
+from src.pipeline import build_pipeline_graph
+from src.preprocessing.loader import load_all_data
+from src.state.tracker import StateTracker
+
+
+@pytest.fixture
+def api(sandbox_config):
+    _, config = sandbox_config
+    config['api']['refresh_seconds'] = 0
+    index = contact_index_from_config(config, config['user']['name'], state=StateTracker(backend='memory')).load()
+    server = start_server(index, port=0)
+    base = "http://%s:%d" % server.server_address[:2]
+
+    def request(path, payload=None):
+        data = None if payload is None else json.dumps(payload).encode()
+        try:
+            with urllib.request.urlopen(urllib.request.Request(base + path, data=data)) as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as e:
+            return e.code, json.load(e)
+
+    yield config, index, request
+    server.shutdown()
+    server.server_close()
+
+
+def test_queries_match_the_pipeline(api):
+    config, index, request = api
+    graph = build_pipeline_graph(config=config, tracker=StateTracker(backend='memory'), use_cache=False)
+    artifacts = graph.get_many('df', 'scores_df')
+    contacts_info, _ = summarize_contacts(artifacts['df'], artifacts['scores_df'], graph.ctx.as_of)
+    scores = {c['contact']: c['latest_score'] for c in contacts_info}
+
+    assert request("/health") == (200, {'status': 'ok', 'contacts': len(scores),
+                                         'evaluations': index.scheduler.evaluations})
+    assert request("/contacts") == (200, {'contacts': sorted(scores)})
+    for contact, score in scores.items():
+        status, details = request(f"/contacts/{quote(contact)}")
+        assert status == 200
+        assert details['score'] == pytest.approx(score)
+        assert details['last_message'] == artifacts['df'].loc[artifacts['df']['contact'] == contact,
+                                                              'timestamp'].max().isoformat()
+        assert all(a['contact'] == contact for a in details['candidate_actions'])
+    status, urgent = request("/urgent?n=3")
+    assert status == 200
+    assert [c['contact'] for c in urgent['contacts']] == [c['contact'] for c in prioritize_contacts(contacts_info)][:3]
+    status, actions = request("/actions")
+    assert status == 200
+    assert {a['contact'] for a in actions['actions']} == set(index.scheduler.actions)
+
+
+def test_errors_are_reported_as_json(api):
+    _, index, request = api
+    assert request("/contacts/Nobody")[0] == 404
+    assert request("/nowhere")[0] == 404
+    assert request("/urgent?n=lots") == (400, {'error': "n must be an integer"})
+    assert request("/elsewhere", {'messages': []})[0] == 404
+    assert request("/ingest", {'messages': [{'timestamp': "2026-03-20 10:00", 'sender': "Mom"}]}) == (
+        400, {'error': "Message is missing receiver, message"})
+    assert request("/ingest", {'messages': [{'timestamp': "soon", 'sender': "Mom", 'receiver': "Rahul",
+                                             'message': "hi"}]}) == (400, {'error': "Unparseable timestamp: soon"})
+    # Rejected batches write nothing
+    assert not os.path.exists(index.ingest_path)
+
+
+def test_ingested_messages_update_only_their_contacts(api):
+    config, index, request = api
+    raw = config['data']['raw_data_path']
+    before = request("/contacts/Mom")[1]
+    evaluations = index.scheduler.evaluations
+    # Repeated queries answer from the index without evaluating anyone again
+    for path in ("/contacts/Mom", "/urgent", "/actions"):
+        request(path)
+    assert index.scheduler.evaluations == evaluations
+
+    messages = [{'timestamp': "2026-03-20 10:00", 'sender': "Mom", 'receiver': "Rahul", 'platform': "WhatsApp",
+                 'message': "Are you coming home, this weekend?"},
+                {'timestamp': "2026-03-20 10:05", 'sender': "Rahul", 'receiver': "Neha",
+                 'message': "Hi Neha\nlong time"}]
+    assert request("/ingest", {'messages': messages}) == (200, {'ingested': 2, 'contacts': ["Mom", "Neha"]})
+    assert index.scheduler.evaluations == evaluations + 2
+
+    after = request("/contacts/Mom")[1]
+    assert after['last_message'] == pd.Timestamp("2026-03-20 10:00").isoformat()
+    assert after['weekly_scores'] != before['weekly_scores']
+    assert "Neha" in request("/contacts")[1]['contacts']
+    # Later pipeline runs read the same messages from the raw data directory
+    df = load_all_data(raw)
+    assert df.loc[df['receiver'] == "Neha", 'message'].tolist() == ["Hi Neha long time"]
+    assert "Are you coming home, this weekend?" in df.loc[df['sender'] == "Mom", 'message'].tolist()
+
+
+def test_queries_keep_answering_while_messages_arrive(api):
+    _, _, request = api
+    failures = []
+
+    def query():
+        for _ in range(20):
+            for path in ("/urgent?n=5", "/contacts/Mom", "/actions"):
+                status, _ = request(path)
+                if status != 200:
+                    failures.append((path, status))
+
+    readers = [threading.Thread(target=query) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for i in range(10):
+        assert request("/ingest", {'messages': [{'timestamp': f"2026-03-21 10:{i:02d}", 'sender': "Mom",
+                                                 'receiver': "Rahul", 'message': f"Message {i}"}]})[0] == 200
+    for reader in readers:
+        reader.join()
+    assert failures == []
+    assert request("/contacts/Mom")[1]['last_message'] == pd.Timestamp("2026-03-21 10:09").isoformat()
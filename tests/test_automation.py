@@ -0,0 +1,94 @@
+import asyncio
+import pytest
+from src.automation.dispatch import DIGEST_HEADER, FakeTransport, NotificationDispatcher
+
+
+def _sends(transport, chat_id):
+    return [(at, text, buttons) for at, chat, text, buttons in transport.sent if chat == chat_id]
+
+
+def test_each_chat_is_paced_by_its_own_bucket():
+    rate, burst, n = 20.0, 2, 6
+    transport = FakeTransport(latency=0)
+    dispatcher = NotificationDispatcher(transport, rate_per_second=rate, burst=burst, max_concurrency=4)
+    for i in range(n):
+        for chat_id in ('a', 'b'):
+            dispatcher.enqueue(chat_id, f"Action {i}", priority=1)
+    stats = asyncio.run(dispatcher.drain())
+
+    assert stats['sent'] == 2 * n and stats['failed'] == 0
+    for chat_id in ('a', 'b'):
+        times = [at for at, _, _ in _sends(transport, chat_id)]
+        assert len(times) == n
+        # The burst goes out at once, then one message per 1/rate seconds
+        assert times[burst - 1] - times[0] < 0.5 / rate
+        for k in range(burst, n):
+            assert times[k] - times[0] >= (k - burst + 1) / rate * 0.9
+    # The two chats were paced side by side, not one after the other
+    assert stats['seconds'] < (2 * (n - burst)) / rate
+
+    # The buckets outlive a drain: a second one straight after gets no fresh burst
+    dispatcher.enqueue('a', "Later", priority=1)
+    dispatcher.enqueue('a', "Later still", priority=1)
+    assert asyncio.run(dispatcher.drain())['seconds'] >= 1 / rate * 0.9
+
+
+def test_transient_failures_are_retried():
+    transport = FakeTransport(latency=0, failure_rate=0.3, seed=3)
+    dispatcher = NotificationDispatcher(transport, rate_per_second=1000, burst=1000, max_retries=10,
+                                        backoff_base=0.001)
+    for i in range(50):
+        dispatcher.enqueue(i % 5, f"Action {i}", priority=1)
+    stats = asyncio.run(dispatcher.drain())
+
+    assert stats['sent'] == 50 and stats['failed'] == 0
+    assert stats['retries'] == transport.attempts - 50 > 0
+    assert sorted(text for _, _, text, _ in transport.sent) == sorted(f"Action {i}" for i in range(50))
+
+
+def test_gives_up_after_max_retries():
+    transport = FakeTransport(latency=0, failure_rate=1.0)
+    dispatcher = NotificationDispatcher(transport, rate_per_second=1000, burst=1000, max_retries=2,
+                                        backoff_base=0.001)
+    dispatcher.enqueue('a', "Never delivered")
+    stats = asyncio.run(dispatcher.drain())
+    assert (stats['sent'], stats['failed'], stats['retries'], transport.attempts) == (0, 1, 2, 3)
+
+
+def test_low_priority_actions_are_sent_as_digests():
+    transport = FakeTransport(latency=0)
+    dispatcher = NotificationDispatcher(transport, rate_per_second=1000, burst=1000, max_concurrency=1,
+                                        digest_min_priority=5, digest_max_items=3)
+    for i in range(7):
+        dispatcher.enqueue('a', f"Low {i}", priority=9 - i % 3, buttons=[[("Done", f"done:{i}")]])
+    dispatcher.enqueue('a', "Urgent", priority=1, buttons=[[("Done", "done:urgent")]])
+    stats = asyncio.run(dispatcher.drain())
+
+    sent = _sends(transport, 'a')
+    assert (stats['sent'], stats['digests'], stats['digested_actions']) == (4, 3, 7)
+    assert sent[0][1:] == ("Urgent", [[("Done", "done:urgent")]])
+    digests = [text.split("\n") for _, text, _ in sent[1:]]
+    assert [len(lines) - 1 for lines in digests] == [3, 3, 1]
+    assert all(lines[0] == DIGEST_HEADER for lines in digests)
+    # Most urgent first, numbered across the digests, each item keeping its numbered buttons
+    items = [line for lines in digests for line in lines[1:]]
+    assert items == ["1. Low 2", "2. Low 5", "3. Low 1", "4. Low 4", "5. Low 0", "6. Low 3", "7. Low 6"]
+    assert sent[1][2] == [[("Done #1", "done:2")], [("Done #2", "done:5")], [("Done #3", "done:1")]]
+
+
+@pytest.mark.parametrize('max_chars', [60, 200])
+def test_digests_fit_the_message_limit(max_chars):
+    transport = FakeTransport(latency=0)
+    dispatcher = NotificationDispatcher(transport, rate_per_second=1000, burst=1000, digest_min_priority=5,
+                                        digest_max_items=20, max_message_chars=max_chars)
+    texts = [f"Check in with contact {i} " + "about the trip " * (i % 4) for i in range(12)]
+    for text in texts:
+        dispatcher.enqueue('a', text, priority=6)
+    dispatcher.enqueue('a', "x" * 500, priority=1)
+    stats = asyncio.run(dispatcher.drain())
+
+    sent = [text for _, _, text, _ in transport.sent]
+    assert all(len(text) <= max_chars for text in sent)
+    assert stats['digested_actions'] == len(texts)
+    numbered = [line for text in sent if text.startswith(DIGEST_HEADER) for line in text.split("\n")[1:]]
+    assert [line.split(".")[0] for line in numbered] == [str(n) for n in range(1, len(texts) + 1)]
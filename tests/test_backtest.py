@@ -0,0 +1,30 @@
+from src.backtest import run_backtest, check_against_pipeline
+from src.state.tracker import StateTracker
+
+
+def _sample(report, n=6):
+    dates = sorted(report['as_of'].unique())
+    return dates[::max(1, len(dates) // n)][:n]
+
+
+def test_backtest_matches_pipeline_runs(sandbox_config):
+    config_path, _ = sandbox_config
+    state = StateTracker(backend='memory')
+    backtester, report = run_backtest(config_path, freq='12h', state=state)
+    sample = _sample(report)
+
+    assert len(sample) == 6
+    assert report['selected'].any()
+    assert check_against_pipeline(backtester, sample, config_path, None, state) == []
+
+
+def test_backtest_matches_pipeline_runs_with_feedback(sandbox_config):
+    # Sensitivities and bandit statistics from earlier feedback change the picks the same way
+    config_path, _ = sandbox_config
+    state = StateTracker(backend='memory')
+    for contact, action_type, feedback in [('Mom', 'reach_out', 'dismissed'), ('Mom', 'reach_out', 'dismissed'),
+                                           ('Dad', 'reach_out', 'accepted'), ('Anjali', 'catch_up', 'dismissed')]:
+        state.record_feedback(state.add_action({'contact': contact, 'type': action_type}), feedback)
+    backtester, report = run_backtest(config_path, freq='12h', state=state)
+
+    assert check_against_pipeline(backtester, _sample(report), config_path, None, state) == []
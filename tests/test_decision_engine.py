@@ -0,0 +1,51 @@
+import pytest
+from src.decision_engine.bandit import ContextualBandit
+from src.decision_engine.engine import collect_candidates, summarize_contacts
+from src.decision_engine.prioritization import prioritize_contacts
+from src.decision_engine.rules import reweight_by_sensitivity
+from src.pipeline import build_pipeline_graph
+from src.state.tracker import StateTracker
+
+
+def _candidates(graph, state):
+    artifacts = graph.get_many('df', 'scores_df', 'advanced_features', 'contact_types', 'contact_anomalies')
+    contacts_info, _ = summarize_contacts(artifacts['df'], artifacts['scores_df'], graph.ctx.as_of)
+    return collect_candidates(prioritize_contacts(contacts_info), graph.ctx.config, state,
+                              artifacts['advanced_features'], artifacts['contact_types'],
+                              artifacts['contact_anomalies'], as_of=graph.ctx.as_of)
+
+
+def test_feedback_sensitivity_reweights_the_rules_priorities(sandbox_config):
+    _, config = sandbox_config
+    graph = build_pipeline_graph(config=config, use_cache=False, as_of='2026-03-10')
+    neutral = _candidates(graph, StateTracker(backend='memory'))
+    contact, actions = next((c, a) for c, a in neutral.items() if len(a) > 1)
+
+    tracker = StateTracker(backend='memory')
+    for _ in range(3):
+        tracker.record_feedback(tracker.add_action(actions[0]), 'dismissed')
+    reweighted = _candidates(graph, tracker)
+
+    sensitivity = tracker.get_contact_sensitivity(contact)
+    assert sensitivity == {actions[0]['type']: pytest.approx(0.9 ** 3)}
+    assert reweighted[contact] == reweight_by_sensitivity(neutral[contact], sensitivity)
+    dismissed = next(a for a in reweighted[contact] if a['type'] == actions[0]['type'])
+    assert dismissed['priority'] == pytest.approx(actions[0]['priority'] * 0.9 ** 3)
+    assert {c: a for c, a in reweighted.items() if c != contact} == {c: a for c, a in neutral.items() if c != contact}
+
+
+def test_reweighting_keeps_the_candidates_sorted_and_untouched():
+    actions = [{'type': 'reach_out', 'priority': 2}, {'type': 'check_in', 'priority': 4}]
+    reweighted = reweight_by_sensitivity(actions, {'check_in': 0.25, 'share_meme': 2.0})
+    assert [(a['type'], a['priority']) for a in reweighted] == [('check_in', 1.0), ('reach_out', 2)]
+    assert actions[1]['priority'] == 4
+    assert reweight_by_sensitivity(actions, {}) == actions
+
+
+def test_bandit_seed_accepts_any_as_of():
+    config = {'bandit': {'seed': 7}}
+    for as_of in ('1969-07-20 20:17', '2026-03-10'):
+        a, b = (ContextualBandit.from_config(config, as_of=as_of) for _ in range(2))
+        assert a.rng.random() == b.rng.random()
+    assert (ContextualBandit.from_config(config, as_of='1969-07-20').rng.random()
+            != ContextualBandit.from_config(config, as_of='1969-07-21').rng.random())
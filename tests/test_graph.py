@@ -0,0 +1,132 @@
+import os
+import pandas as pd
+import pytest
+from src.graph import ArtifactStore, PipelineGraph, Stage
+from src.pipeline import PIPELINE_STAGES, build_pipeline_graph
+from src.state.tracker import StateTracker
+
+
+class Ctx:
+    def __init__(self, scale=1):
+        self.scale = scale
+
+
+def _stages(calls):
+    def counted(name, fn):
+        def run(ctx, **inputs):
+            calls.append(name)
+            return fn(ctx, **inputs)
+        return run
+
+    return [
+        Stage('source', counted('source', lambda ctx: {'numbers': pd.DataFrame({'x': [1, 2, 3], 'y': [4, 5, 6]})}),
+              outputs=['numbers'], persist=True),
+        Stage('scaled', counted('scaled', lambda ctx, numbers: {'scaled': numbers * ctx.scale}),
+              inputs=['numbers'], params=lambda ctx: {'scale': ctx.scale}, columns={'numbers': ['x']}),
+        Stage('total', counted('total', lambda ctx, scaled: {'total': int(scaled.sum().sum())}),
+              inputs=['scaled'], persist=True),
+        Stage('report', counted('report', lambda ctx, total: {'report': f"total={total}"}),
+              inputs=['total'], memoize=False),
+    ]
+
+
+def test_each_stage_runs_once_and_only_when_needed():
+    calls = []
+    graph = PipelineGraph(_stages(calls), Ctx())
+    assert graph.get('scaled').columns.tolist() == ['x']
+    assert calls == ['source', 'scaled']
+    assert graph.get_many('report', 'total') == {'report': "total=6", 'total': 6}
+    graph.get('report')
+    assert calls == graph.executed == ['source', 'scaled', 'total', 'report']
+
+
+def test_memoized_stages_are_reused_across_graphs():
+    calls = []
+    store = ArtifactStore()
+    PipelineGraph(_stages(calls), Ctx(), store).get('report')
+    calls.clear()
+
+    graph = PipelineGraph(_stages(calls), Ctx(), store)
+    assert graph.get('report') == "total=6"
+    # Only the stage that reads mutable state runs again
+    assert calls == graph.executed == ['report']
+    assert store.hits == 1 and store.misses == 3
+
+
+def test_changed_params_rerun_the_stage_and_everything_downstream():
+    calls = []
+    store = ArtifactStore()
+    PipelineGraph(_stages(calls), Ctx(), store).get('report')
+    calls.clear()
+
+    assert PipelineGraph(_stages(calls), Ctx(scale=10), store).get('report') == "total=60"
+    assert calls == ['scaled', 'total', 'report']
+    # The old key is still in the store
+    calls.clear()
+    assert PipelineGraph(_stages(calls), Ctx(), store).get('total') == 6
+    assert calls == []
+
+
+def test_persisted_stages_survive_a_new_process(tmp_path):
+    calls = []
+    cache_dir = str(tmp_path / "cache")
+    PipelineGraph(_stages(calls), Ctx(), ArtifactStore(cache_dir)).get('report')
+    assert len(os.listdir(cache_dir)) == 2
+    calls.clear()
+
+    # A fresh store stands in for a restarted process: only unpersisted stages rerun
+    graph = PipelineGraph(_stages(calls), Ctx(), ArtifactStore(cache_dir))
+    assert graph.get('report') == "total=6"
+    assert calls == ['report']
+    assert graph.get('scaled').columns.tolist() == ['x']
+    assert calls == ['report', 'scaled']
+
+
+def test_unreadable_pickles_are_recomputed(tmp_path):
+    cache_dir = tmp_path / "cache"
+    PipelineGraph(_stages([]), Ctx(), ArtifactStore(str(cache_dir))).get('total')
+    for path in cache_dir.iterdir():
+        path.write_bytes(b"not a pickle")
+    calls = []
+    assert PipelineGraph(_stages(calls), Ctx(), ArtifactStore(str(cache_dir))).get('total') == 6
+    assert calls == ['source', 'scaled', 'total']
+
+
+def test_graph_rejects_bad_wiring():
+    with pytest.raises(ValueError, match="produced by both"):
+        PipelineGraph([Stage('a', None, outputs=['x']), Stage('b', None, outputs=['x'])], Ctx())
+    with pytest.raises(ValueError, match="no stage produces"):
+        PipelineGraph([Stage('a', None, inputs=['missing'])], Ctx())
+    with pytest.raises(ValueError, match="Cycle"):
+        PipelineGraph([Stage('a', None, inputs=['b']), Stage('b', None, inputs=['a'])], Ctx()).get('a')
+    with pytest.raises(ValueError, match="did not produce"):
+        PipelineGraph([Stage('a', lambda ctx: {}, outputs=['x'])], Ctx()).get('x')
+
+
+def test_pipeline_reruns_only_the_decision_stages(sandbox_config, tmp_path):
+    _, config = sandbox_config
+    config['pipeline']['cache_dir'] = str(tmp_path / "cache")
+
+    def graph():
+        return build_pipeline_graph(config=config, tracker=StateTracker(backend='memory'), as_of='2026-03-10')
+
+    first = graph()
+    actions = first.get('actions')
+    assert set(first.executed) == {'load', 'preprocess', 'window', 'partitions', 'score', 'features', 'classify',
+                                   'sketches', 'anomalies', 'decide'}
+    second = graph()
+    assert second.get('actions') == actions
+    assert second.executed == ['decide']
+
+    # After a restart the persisted stages load from cache_dir instead of running
+    restarted = PipelineGraph(PIPELINE_STAGES, graph().ctx, ArtifactStore(config['pipeline']['cache_dir']))
+    assert restarted.get('actions') == actions
+    assert not {stage.name for stage in PIPELINE_STAGES if stage.persist} & set(restarted.executed)
+
+    # New messages change the load stage's key, and with it every stage downstream
+    raw = config['data']['raw_data_path']
+    with open(os.path.join(raw, sorted(os.listdir(raw))[0]), 'a', encoding='utf-8') as f:
+        f.write("2026-03-09 10:00,Mom,Rahul,whatsapp,Call me when you're free\n")
+    changed = graph()
+    changed.get('actions')
+    assert set(changed.executed) == set(first.executed)
@@ -0,0 +1,132 @@
+import os
+import pickle
+import numpy as np
+import pandas as pd
+from src.preprocessing import loader
+from src.preprocessing.dedup import SeenHashes
+from src.preprocessing.loader import load_all_data
+from src.preprocessing.partitions import PartitionedMessageStore
+
+HEADER = "timestamp,sender,receiver,platform,message\n"
+
+CHATS = {
+    # An export of the same chat taken later overlaps the first one
+    'export_1.csv': ["2026-02-01 09:00,Mom,Me,whatsapp,Good morning!",
+                     "2026-02-01 09:05,Me,Mom,whatsapp,morning :)",
+                     "2026-02-01 09:05,Me,Mom,whatsapp,ok",
+                     "2026-02-01 09:05,Me,Mom,whatsapp,ok"],
+    'export_2.csv': ["2026-02-01 09:05,Me,Mom,whatsapp,Morning  :) ",
+                     "2026-02-01 09:05,Me,Mom,whatsapp,ok",
+                     "2026-02-02 18:30,Mom,Me,whatsapp,Dinner on Sunday?"],
+}
+
+
+def _write_chats(raw_dir):
+    raw_dir.mkdir()
+    for name, lines in CHATS.items():
+        (raw_dir / name).write_text(HEADER + "\n".join(lines) + "\n", encoding='utf-8')
+    return str(raw_dir)
+
+
+def test_message_in_two_files_is_kept_once(tmp_path):
+    raw = _write_chats(tmp_path / "raw")
+    df = load_all_data(raw)
+
+    assert len(load_all_data(raw, deduplicate=False)) == 7
+    # Both "ok"s of the first export survive; the second export repeats one of them
+    assert len(df) == 5
+    assert (df['message'] == "ok").sum() == 2
+    assert df.attrs['duplicates_dropped'] == {'export_2.csv': 2}
+    assert df['message'].tolist()[-1] == "Dinner on Sunday?"
+
+
+def test_reloading_the_index_gives_the_same_result(tmp_path):
+    raw = _write_chats(tmp_path / "raw")
+    index = str(tmp_path / "dedup_index.pkl")
+    first = load_all_data(raw, dedup_index=index)
+    assert os.path.exists(index)
+
+    seen = SeenHashes(index)
+    assert set(seen.files) == {os.path.join(raw, name) for name in CHATS}
+    second = load_all_data(raw, dedup_index=index)
+    pd.testing.assert_frame_equal(second, first)
+    assert second.attrs == first.attrs
+
+
+def test_unreadable_index_falls_back_to_a_full_rebuild(tmp_path):
+    raw = _write_chats(tmp_path / "raw")
+    expected = load_all_data(raw)
+    for corrupt in (b"not a pickle", pickle.dumps(['wrong', 'type']),
+                    pickle.dumps({'x': 1}, protocol=pickle.HIGHEST_PROTOCOL)[:-3]):
+        index = tmp_path / "dedup_index.pkl"
+        index.write_bytes(corrupt)
+
+        df = load_all_data(raw, dedup_index=str(index))
+        pd.testing.assert_frame_equal(df, expected)
+        # The rebuilt index replaces the unreadable one
+        assert set(SeenHashes(str(index)).files) == {os.path.join(raw, name) for name in CHATS}
+
+
+def _partitioned_messages(n=600, seed=0):
+    rng = np.random.default_rng(seed)
+    timestamps = pd.Timestamp('2026-01-01') + pd.to_timedelta(np.sort(rng.uniform(0, 150, n)), unit='D')
+    contacts = rng.choice(['Mom', 'Rahul', 'Anjali'], n)
+    return pd.DataFrame({'timestamp': timestamps, 'sender': np.where(rng.random(n) < 0.5, contacts, 'Me'),
+                         'contact': contacts, 'sentiment': rng.uniform(-1, 1, n)})
+
+
+def _fingerprints(store):
+    return {file: meta['fingerprint'] for file, meta in store.partitions.items()}
+
+
+def test_appending_messages_rewrites_only_the_latest_partitions(tmp_path):
+    df = _partitioned_messages()
+    first = df[df['timestamp'] < '2026-04-10']
+    store = PartitionedMessageStore(str(tmp_path / "parts"))
+    assert store.write(first) == len(store.partitions) == 12
+
+    # The reopened store hashes only each contact's newest month and the new ones
+    written = PartitionedMessageStore(str(tmp_path / "parts")).write(df)
+    rebuilt = PartitionedMessageStore(str(tmp_path / "rebuilt"))
+    rebuilt.write(df)
+    reopened = PartitionedMessageStore(str(tmp_path / "parts"))
+    assert written == 6
+    assert _fingerprints(reopened) == _fingerprints(rebuilt)
+    pd.testing.assert_frame_equal(reopened.last_n('Mom', 50), rebuilt.last_n('Mom', 50))
+
+
+def test_changed_history_is_checked_again(tmp_path):
+    df = _partitioned_messages()
+    store = PartitionedMessageStore(str(tmp_path / "parts"))
+    store.write(df)
+    # Older rows gone (a contact's export replaced) and a contact dropped entirely
+    edited = df[~((df['contact'] == 'Rahul') & (df['timestamp'] < '2026-02-01')) & (df['contact'] != 'Anjali')]
+    store = PartitionedMessageStore(str(tmp_path / "parts"))
+    store.write(edited)
+    rebuilt = PartitionedMessageStore(str(tmp_path / "rebuilt"))
+    rebuilt.write(edited)
+    assert _fingerprints(PartitionedMessageStore(str(tmp_path / "parts"))) == _fingerprints(rebuilt)
+    assert store.contacts() == ['Mom', 'Rahul']
+
+    # Rows derived differently (e.g. another sentiment model) are all checked again
+    rescored = edited.assign(sentiment=edited['sentiment'] / 2)
+    store = PartitionedMessageStore(str(tmp_path / "parts"))
+    assert store.write(rescored, settings={'sentiment': 'v2'}) == len(rebuilt.partitions)
+
+
+def test_only_modified_files_are_parsed_again(tmp_path, monkeypatch):
+    raw = _write_chats(tmp_path / "raw")
+    index = str(tmp_path / "dedup_index.pkl")
+    load_all_data(raw, dedup_index=index)
+    parsed = []
+    original = loader.load_file
+    monkeypatch.setattr(loader, 'load_file', lambda path: parsed.append(os.path.basename(path)) or original(path))
+
+    unchanged = load_all_data(raw, dedup_index=index)
+    assert parsed == []
+    with open(os.path.join(raw, 'export_2.csv'), 'a', encoding='utf-8') as f:
+        f.write("2026-02-03 08:00,Me,Mom,whatsapp,See you Sunday\n")
+    updated = load_all_data(raw, dedup_index=index)
+    assert parsed == ['export_2.csv']
+    assert len(updated) == len(unchanged) + 1
+    pd.testing.assert_frame_equal(updated, load_all_data(raw))
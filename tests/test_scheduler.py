@@ -0,0 +1,87 @@
+import pandas as pd
+from src.backtest import Backtester
+from src.pipeline import build_pipeline_graph
+from src.scheduler import ContactScheduler, RawDataWatcher, DAY_NS
+from src.state.service import StateService
+
+HEADER = "timestamp,sender,receiver,platform,message\n"
+
+
+def _signature(actions):
+    return [(a['type'], a['reason'] if a['type'] != 'reach_out' else None, round(a['priority'], 9))
+            for a in actions]
+
+
+def _scheduler(config, raw_dir, state=None, **kwargs):
+    scheduler = ContactScheduler(config, config['user']['name'], state=state, **kwargs)
+    RawDataWatcher(raw_dir, scheduler).poll()
+    return scheduler
+
+
+def test_scheduler_picks_the_backtest_candidates(sandbox_config):
+    _, config = sandbox_config
+    raw = config['data']['raw_data_path']
+    scheduler = _scheduler(config, raw)
+    graph = build_pipeline_graph(config=config, use_cache=False)
+    df = graph.get('message_store').attach(graph.get('preprocessed_df'))
+    backtester = Backtester(df, config, config['user']['name'])
+
+    ticks = pd.date_range(df['timestamp'].min().floor('D'), df['timestamp'].max() + pd.Timedelta(days=10), freq='3h')
+    for now in ticks:
+        scheduler.run_pending(now)
+        if now.hour % 12:
+            continue
+        candidates, _, _ = backtester.evaluate(now)
+        for contact, actions in candidates.items():
+            assert _signature(scheduler.candidates.get(contact, [])) == _signature(actions), (now, contact)
+    # Contacts are only evaluated when due, not on every tick
+    assert scheduler.evaluations < len(ticks) * len(scheduler.histories) / 4
+
+
+def test_quiet_contact_sleeps_until_its_inactivity_threshold(sandbox_config, tmp_path):
+    _, config = sandbox_config
+    raw = tmp_path / "quiet"
+    raw.mkdir()
+    (raw / "mom.csv").write_text(HEADER + "2026-03-01 09:00,Mom,Rahul,whatsapp,Good morning\n"
+                                          "2026-03-01 09:05,Rahul,Mom,whatsapp,Morning!\n", encoding='utf-8')
+    scheduler = _scheduler(config, str(raw), max_interval=None)
+
+    scheduler.run_pending(pd.Timestamp('2026-03-01 12:00'))
+    evaluations = scheduler.evaluations
+    assert scheduler.run_pending(pd.Timestamp('2026-03-01 13:00')) == []
+    assert scheduler.evaluations == evaluations
+
+    # Next wake-ups: the streak break, then the day the gap exceeds inactivity_days
+    last = pd.Timestamp('2026-03-01 09:05')
+    assert scheduler.next_wakeup() == pd.Timestamp('2026-03-03')
+    scheduler.run_pending(pd.Timestamp('2026-03-03'))
+    threshold = config['thresholds']['inactivity_days']
+    assert scheduler.next_wakeup() == last + pd.Timedelta((threshold + 1) * DAY_NS)
+    actions = scheduler.run_pending(scheduler.next_wakeup())
+    assert [a['type'] for a in actions] == ['reach_out']
+
+
+def test_feedback_marks_the_contact_dirty(sandbox_config, tmp_path):
+    _, config = sandbox_config
+    state_file = str(tmp_path / "state.json")
+    service = StateService(state_file, flush_interval=0.001)
+    scheduler = _scheduler(config, config['data']['raw_data_path'], state=service.tracker)
+    service.on_feedback(scheduler.mark_dirty)
+    scheduler.run_pending(pd.Timestamp('2026-03-20'))
+    assert not scheduler.dirty
+
+    action_id = service.add_action({'contact': 'Mom', 'type': 'reach_out'})
+    assert not scheduler.dirty
+    service.record_feedback(action_id, 'dismissed')
+    assert scheduler.dirty == {'Mom'}
+    evaluations = scheduler.evaluations
+    scheduler.run_pending(pd.Timestamp('2026-03-20 00:01'))
+    assert scheduler.evaluations == evaluations + 1
+
+    # Feedback another process recorded is noticed when the state is reloaded
+    other = StateService(state_file, flush_interval=0.001)
+    other.record_feedback(other.add_action({'contact': 'Dad', 'type': 'reach_out'}), 'accepted')
+    other.stop()
+    service.refresh()
+    assert scheduler.dirty == {'Dad'}
+    service.stop()
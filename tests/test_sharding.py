@@ -0,0 +1,32 @@
+import pytest
+from src.pipeline import run_pipeline_with_artifacts
+from src.sharding import run_sharded_pipeline
+from src.state.tracker import StateTracker
+
+AS_OF = '2026-03-01'
+
+
+def _actions(actions):
+    return [(a['contact'], a['type'], a['reason'], round(a['priority'], 9), tuple(map(str, a['details'])),
+             a.get('message')) for a in actions]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_sharded_run_matches_single_process(sandbox_config, workers):
+    config_path, config = sandbox_config
+    # Earlier feedback reaches the shards as per-contact sensitivities
+    tracker = StateTracker(config['state']['state_file'])
+    for contact, feedback in [('Mom', 'dismissed'), ('Mom', 'dismissed'), ('Dad', 'accepted')]:
+        tracker.record_feedback(tracker.add_action({'contact': contact, 'type': 'reach_out'}), feedback)
+    tracker.close()
+
+    single = run_pipeline_with_artifacts(config_path, verbose=False, simulate_feedback=False, use_cache=False,
+                                         as_of=AS_OF)
+    sharded = run_sharded_pipeline(config_path, workers=workers, shards=3, verbose=False, simulate_feedback=False,
+                                   as_of=AS_OF)
+
+    assert single['actions']
+    assert _actions(sharded['actions']) == _actions(single['actions'])
+    assert sharded['scores_df'].equals(single['scores_df'])
+    assert sharded['advanced_features'] == single['advanced_features']
+    assert sharded['contact_types'] == single['contact_types']
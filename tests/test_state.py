@@ -0,0 +1,209 @@
+import copy
+import json
+import multiprocessing
+from src import pipeline
+from src.pipeline import run_pipeline
+from src.state.feedback import simulate_feedback_loop
+from src.state.journal import ActionJournal, journal_path_for
+from src.state.service import StateService
+from src.state.tracker import StateTracker
+
+
+def _state(tracker):
+    return tracker.actions, tracker.sensitivity, tracker.action_stats
+
+
+def _tracker_with_history(state_file):
+    tracker = StateTracker(str(state_file), compact_every=0)
+    ids = [tracker.add_action({'contact': contact, 'type': action_type})
+           for contact, action_type in [('Mom', 'reach_out'), ('Mom', 'follow_up'), ('Rahul', 'reach_out')]]
+    tracker.record_feedback(ids[0], 'accepted')
+    tracker.record_feedback(ids[1], 'dismissed')
+    tracker.record_feedback(ids[2], 'accepted')
+    return tracker
+
+
+def test_journal_appends_are_replayed(tmp_path):
+    journal = ActionJournal(str(tmp_path / "state.json"))
+    journal.load()
+    for n in range(3):
+        journal.append({'op': 'add', 'action': {'id': n + 1}})
+    journal.close()
+
+    snapshot, ops = ActionJournal(str(tmp_path / "state.json")).load()
+    assert snapshot == {}
+    assert [op['seq'] for op in ops] == [1, 2, 3]
+    assert [op['action']['id'] for op in ops] == [1, 2, 3]
+
+
+def test_tracker_state_survives_reopen(tmp_path):
+    tracker = _tracker_with_history(tmp_path / "state.json")
+    expected = _state(tracker)
+    tracker.close()
+
+    reopened = StateTracker(str(tmp_path / "state.json"), compact_every=0)
+    assert _state(reopened) == expected
+    assert reopened.get_action_stats('Mom', 'reach_out') == (1, 0)
+
+
+def test_compaction_keeps_state(tmp_path):
+    state_file = tmp_path / "state.json"
+    tracker = _tracker_with_history(state_file)
+    expected = _state(tracker)
+    tracker.save()
+    tracker.close()
+
+    assert (tmp_path / "state.journal.jsonl").read_text() == ""
+    assert json.loads(state_file.read_text())['last_seq'] == 6
+    reopened = StateTracker(str(state_file), compact_every=0)
+    assert _state(reopened) == expected
+
+
+def test_compaction_does_not_replay_ops_twice(tmp_path):
+    # A crash after the snapshot replace but before the journal truncate leaves old ops behind
+    state_file = tmp_path / "state.json"
+    tracker = _tracker_with_history(state_file)
+    expected = _state(tracker)
+    tracker.close()
+    journal_file = journal_path_for(str(state_file))
+    with open(journal_file) as f:
+        leftover = f.read()
+    StateTracker(str(state_file), compact_every=0).save()
+    with open(journal_file, 'w') as f:
+        f.write(leftover)
+
+    assert _state(StateTracker(str(state_file), compact_every=0)) == expected
+
+
+def test_torn_trailing_record_is_recovered(tmp_path):
+    state_file = tmp_path / "state.json"
+    tracker = _tracker_with_history(state_file)
+    tracker.save()
+    tracker.add_action({'contact': 'Rahul', 'type': 'follow_up'})
+    expected = _state(tracker)
+    tracker.close()
+    with open(journal_path_for(str(state_file)), 'a') as f:
+        f.write('{"op": "feedback", "id": 4, "feedb')
+
+    recovered = StateTracker(str(state_file), compact_every=0)
+    assert _state(recovered) == expected
+    # Writes after the recovery land on a clean tail and are replayed next time
+    action_id = recovered.add_action({'contact': 'Anjali', 'type': 'reach_out'})
+    recovered.record_feedback(action_id, 'accepted')
+    expected = _state(recovered)
+    recovered.close()
+
+    assert _state(StateTracker(str(state_file), compact_every=0)) == expected
+
+
+def _add_with_feedback(state_file, contact, n):
+    service = StateService(state_file, flush_interval=0.001)
+    for i in range(n):
+        action_id = service.add_action({'contact': contact, 'type': 'reach_out'})
+        service.record_feedback(action_id, 'accepted' if i % 2 else 'dismissed')
+    service.stop()
+
+
+def test_two_processes_keep_each_others_feedback(tmp_path):
+    state_file = str(tmp_path / "state.json")
+    other = multiprocessing.get_context('fork').Process(target=_add_with_feedback, args=(state_file, 'Mom', 40))
+    other.start()
+    _add_with_feedback(state_file, 'Rahul', 40)
+    other.join()
+    assert other.exitcode == 0
+
+    tracker = StateTracker(state_file)
+    assert len(tracker.actions) == 80
+    assert len({act['id'] for act in tracker.actions}) == 80
+    assert tracker.get_action_stats('Mom', 'reach_out') == (20, 20)
+    assert tracker.get_action_stats('Rahul', 'reach_out') == (20, 20)
+
+
+def test_pipeline_feedback_does_not_drop_another_writers(sandbox_config, monkeypatch):
+    config_path, config = sandbox_config
+    state_file = config['state']['state_file']
+    run_pipeline(config_path, verbose=False, use_cache=False)
+    # Another process (the bot) writes while the pipeline is between reading the state and writing its feedback
+    bot = StateService(state_file, flush_interval=0.001)
+    bot_action = bot.add_action({'contact': 'Mom', 'type': 'reach_out'})
+
+    def feedback_after_the_bot(*args, **kwargs):
+        bot.record_feedback(bot_action, 'accepted')
+        return simulate_feedback_loop(*args, **kwargs)
+
+    monkeypatch.setattr(pipeline, 'simulate_feedback_loop', feedback_after_the_bot)
+    _, _, actions, _ = run_pipeline(config_path, verbose=False, use_cache=False)
+    bot.stop()
+
+    tracker = StateTracker(state_file)
+    assert len(tracker.actions) == 2 * len(actions) + 1
+    assert tracker.get_action(bot_action)['feedback'] == 'accepted'
+    assert all(act['feedback'] in ('accepted', 'dismissed') for act in tracker.actions)
+
+
+def _sqlite_tracker(tmp_path):
+    return StateTracker(str(tmp_path / "state.json"), backend='sqlite', sqlite_file=str(tmp_path / "state.db"))
+
+
+def test_sqlite_backend_matches_json(tmp_path):
+    json_tracker = _tracker_with_history(tmp_path / "state.json")
+    json_tracker.add_action({'contact': 'Anjali', 'type': 'catch_up'})
+    sqlite_tracker = _sqlite_tracker(tmp_path / "db")
+    for act in json_tracker.actions:
+        action_id = sqlite_tracker.add_action(act)
+        if act['feedback']:
+            sqlite_tracker.record_feedback(action_id, act['feedback'])
+
+    reopened = _sqlite_tracker(tmp_path / "db")
+    assert _state(reopened)[1:] == _state(json_tracker)[1:]
+    assert reopened.sensitivity_rows() == json_tracker.sensitivity_rows()
+    assert reopened.stats_rows() == json_tracker.stats_rows()
+    assert reopened.feedback_totals() == json_tracker.feedback_totals() == {
+        'accepted': 2, 'dismissed': 1, 'pending': 1}
+
+
+def test_sqlite_imports_an_existing_json_state(tmp_path):
+    tracker = _tracker_with_history(tmp_path / "state.json")
+    expected = _state(tracker)
+    tracker.close()
+    assert _state(_sqlite_tracker(tmp_path)) == expected
+
+
+def test_feedback_other_than_accept_or_dismiss_counts_as_pending(tmp_path):
+    for tracker in (StateTracker(str(tmp_path / "state.json")), _sqlite_tracker(tmp_path / "db")):
+        tracker.record_feedback(tracker.add_action({'contact': 'Mom', 'type': 'reach_out'}), 'snoozed')
+        tracker.add_action({'contact': 'Mom', 'type': 'follow_up'})
+        assert tracker.feedback_totals() == {'accepted': 0, 'dismissed': 0, 'pending': 2}
+
+
+def test_sqlite_rollback_restores_the_tracker(tmp_path):
+    tracker = _sqlite_tracker(tmp_path)
+    kept = tracker.add_action({'contact': 'Mom', 'type': 'reach_out'})
+    tracker.record_feedback(kept, 'accepted')
+    expected = copy.deepcopy(_state(tracker))
+    try:
+        with tracker.batch():
+            rolled_back = tracker.add_action({'contact': 'Rahul', 'type': 'reach_out'})
+            tracker.record_feedback(rolled_back, 'dismissed')
+            tracker.record_feedback(kept, 'accepted')
+            raise RuntimeError("interrupted")
+    except RuntimeError:
+        pass
+
+    assert _state(tracker) == expected
+    assert tracker.record_feedback(rolled_back, 'accepted') is False
+    assert tracker.add_action({'contact': 'Anjali', 'type': 'reach_out'}) == rolled_back
+    assert _state(_sqlite_tracker(tmp_path)) == _state(tracker)
+    assert tracker.store.conn.execute("SELECT COUNT(*) FROM feedback").fetchone()[0] == 1
+
+
+def test_sqlite_feedback_for_an_unknown_action_is_refused(tmp_path):
+    tracker = _sqlite_tracker(tmp_path)
+    action_id = tracker.add_action({'contact': 'Mom', 'type': 'reach_out'})
+    # Another connection removed the row this tracker still has in memory
+    other = _sqlite_tracker(tmp_path)
+    other.store.conn.execute("DELETE FROM actions WHERE id = ?", (action_id,))
+
+    assert tracker.record_feedback(action_id, 'accepted') is False
+    assert tracker.get_action_stats('Mom', 'reach_out') == (0, 0)
+    assert tracker.store.conn.execute("SELECT COUNT(*) FROM feedback").fetchone()[0] == 0